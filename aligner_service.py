@@ -0,0 +1,224 @@
+import os
+import sys
+import shutil
+import logging
+import secrets
+import threading
+import uuid
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from metrics import span
+from config import (MFA_DICTIONARY, MFA_ACOUSTIC_MODEL, ALIGNER_SERVICE_HOST,
+                    ALIGNER_SERVICE_PORT, ALIGNER_SERVICE_AUTHKEY, ALIGNER_SERVICE_KEY_FILE,
+                    ALIGNER_SERVICE_DIR)
+from text_aligner import gather_corpus, distribute_textgrids
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('aligner_service')
+
+SERVICE_ADDRESS = (ALIGNER_SERVICE_HOST, ALIGNER_SERVICE_PORT)
+
+
+def create_authkey(key_file=ALIGNER_SERVICE_KEY_FILE):
+    """
+    Return the service's secret, generating a random one if none is configured.
+
+    A generated key is written to key_file with 0600 permissions, so only
+    the user running the service (and its clients) can read it.
+
+    Returns:
+        str: The secret
+    """
+    if ALIGNER_SERVICE_AUTHKEY:
+        return ALIGNER_SERVICE_AUTHKEY
+    authkey = secrets.token_hex(32)
+    os.makedirs(os.path.dirname(key_file) or ".", mode=0o700, exist_ok=True)
+    temp_path = f"{key_file}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(authkey)
+    os.replace(temp_path, key_file)
+    return authkey
+
+
+def read_authkey(key_file=ALIGNER_SERVICE_KEY_FILE):
+    """
+    Return the secret of the running service.
+
+    Returns:
+        str: ALIGNER_SERVICE_AUTHKEY if set, else the key the service wrote
+             to key_file, or None if there is none
+    """
+    if ALIGNER_SERVICE_AUTHKEY:
+        return ALIGNER_SERVICE_AUTHKEY
+    try:
+        with open(key_file, "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class AlignerService:
+    """
+    Long-lived MFA worker that aligns corpora without spawning `mfa` per job.
+
+    Only the start-up cost is amortised: MFA and its dependencies are
+    imported once, and every job is then run in-process through MFA's
+    command line entry point instead of a new `mfa` process. Each job is
+    still a full `mfa align`, so the dictionary and acoustic model are
+    loaded again per job, and the job's corpus files are removed when it
+    ends. Jobs are run one at a time; MFA parallelises within a job through
+    --num_jobs.
+
+    Args:
+        work_dir (str): Directory for job corpora and MFA's temp directory
+        mfa_cli (callable, optional): MFA's click command, imported from MFA if None
+    """
+
+    def __init__(self, work_dir=ALIGNER_SERVICE_DIR, mfa_cli=None):
+        self.work_dir = work_dir
+        self.temp_dir = os.path.join(work_dir, "mfa_temp")
+        self._lock = threading.Lock()
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+        if mfa_cli is None:
+            logger.info("Loading Montreal Forced Aligner")
+            from montreal_forced_aligner.command_line.mfa import mfa_cli
+        self._mfa_cli = mfa_cli
+        logger.info(
+            f"Aligner ready with dictionary {MFA_DICTIONARY} and acoustic model {MFA_ACOUSTIC_MODEL}")
+
+    def align(self, runs, num_jobs=1):
+        """
+        Align the txt/wav pairs of one or more runs.
+
+        Args:
+            runs (list): (input_path, output_path) tuples, one per run
+            num_jobs (int): Number of parallel MFA jobs
+
+        Returns:
+            dict: Maps each run's output_path to True if its TextGrid was produced
+        """
+        status = {output_path: False for _, output_path in runs}
+
+        # Every job gets its own corpus name, so MFA never reuses a stale
+        # corpus cache from an earlier job
+        job_id = uuid.uuid4().hex[:12]
+        corpus_dir = os.path.join(self.work_dir, "jobs", job_id, f"corpus_{job_id}")
+        aligned_dir = os.path.join(self.work_dir, "jobs", job_id, "aligned")
+        os.makedirs(aligned_dir, exist_ok=True)
+
+        try:
+            destinations = gather_corpus(runs, corpus_dir)
+            if not destinations:
+                logger.warning("No txt/wav pairs found for alignment job")
+                return status
+
+            args = [
+                "align",
+                "--num_jobs", str(num_jobs),
+                "--temp_directory", self.temp_dir,
+                corpus_dir,
+                MFA_DICTIONARY,
+                MFA_ACOUSTIC_MODEL,
+                aligned_dir
+            ]
+            logger.info(f"Running alignment job {job_id}: mfa {' '.join(args)}")
+
+            with self._lock:
+                self._mfa_cli.main(args=args, standalone_mode=False)
+
+            distribute_textgrids(destinations, aligned_dir, status)
+            logger.info(
+                f"✅ Alignment job {job_id} complete: {sum(status.values())}/{len(status)} runs aligned")
+
+        except Exception as e:
+            logger.error(f"Error during alignment job {job_id}: {str(e)}")
+        finally:
+            shutil.rmtree(os.path.join(self.work_dir, "jobs", job_id),
+                          ignore_errors=True)
+            # Per-corpus working files are of no use to later jobs
+            shutil.rmtree(os.path.join(self.temp_dir, f"corpus_{job_id}"),
+                          ignore_errors=True)
+
+        return status
+
+    def _handle(self, connection):
+        """Serve alignment requests from one client connection."""
+        try:
+            while True:
+                try:
+                    request = connection.recv()
+                except EOFError:
+                    break
+                runs = [tuple(run) for run in request.get("runs", [])]
+                status = self.align(runs, num_jobs=request.get("num_jobs", 1))
+                connection.send({"status": status})
+        except Exception as e:
+            logger.error(f"Error handling alignment request: {str(e)}")
+        finally:
+            connection.close()
+
+    def serve_forever(self, address=SERVICE_ADDRESS, authkey=None):
+        """
+        Accept alignment requests on a local socket until interrupted.
+
+        Only clients that know authkey are served; by default it is the
+        configured or a freshly generated secret (see create_authkey).
+        """
+        authkey = authkey or create_authkey()
+        with Listener(address, authkey=authkey.encode("utf-8")) as listener:
+            logger.info(f"Aligner service listening on {address[0]}:{address[1]}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Rejected aligner connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._handle, args=(connection,),
+                                 daemon=True).start()
+
+
+def request_alignment(runs, num_jobs=1, address=SERVICE_ADDRESS, authkey=None):
+    """
+    Send an alignment job to a running aligner service.
+
+    Args:
+        runs (list): (input_path, output_path) tuples, one per run
+        num_jobs (int): Number of parallel MFA jobs
+        address (tuple): Host and port of the service
+        authkey (str, optional): Shared secret of the service, read_authkey() by default
+
+    Returns:
+        dict: output_path -> bool per run, or None if the service is not reachable
+    """
+    authkey = authkey or read_authkey()
+    if authkey is None:
+        logger.info("Aligner service not available: no service key found")
+        return None
+
+    # Paths are resolved here since the service may run from another directory
+    absolute_runs = [(os.path.abspath(input_path), os.path.abspath(output_path))
+                     for input_path, output_path in runs]
+
+    try:
+        with span("mfa.service_request", runs=len(runs)), \
+                Client(address, authkey=authkey.encode("utf-8")) as connection:
+            connection.send({"runs": absolute_runs, "num_jobs": num_jobs})
+            response = connection.recv()
+    except (OSError, EOFError, AuthenticationError) as e:
+        logger.info(f"Aligner service not available: {str(e)}")
+        return None
+
+    status = response.get("status", {})
+    return {output_path: status.get(os.path.abspath(output_path), False)
+            for _, output_path in runs}
+
+
+if __name__ == "__main__":
+    try:
+        AlignerService().serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
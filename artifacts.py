@@ -0,0 +1,213 @@
+import os
+import mmap
+import base64
+import logging
+from collections.abc import MutableMapping
+from config import TRANSCRIBED_DIR
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('artifacts')
+
+ALIGNMENT_SUBDIR = "alignment"  # TextGrids live in <run dir>/alignment/
+
+
+class ArtifactStore:
+    """
+    The final directory of one run, transcribed/<filename>/, which stages write into directly.
+
+    Every file is written once in its archived location: the narration and
+    transcript at the top level, the image next to them and the TextGrids
+    in alignment/. Nothing is staged elsewhere and moved in afterwards.
+
+    Args:
+        filename (str): The run's unique filename
+        root (str): Directory that holds the run directories
+    """
+
+    def __init__(self, filename, root=TRANSCRIBED_DIR):
+        self.filename = filename
+        self.dir = os.path.join(root, filename)
+        self.alignment_dir = os.path.join(self.dir, ALIGNMENT_SUBDIR)
+
+    def path(self, name):
+        """
+        Return the final path of an artifact, creating the run directory.
+
+        Args:
+            name (str): File name, e.g. "<filename>.wav" or "alignment/<filename>.TextGrid"
+
+        Returns:
+            str: Path of the artifact inside the run directory
+        """
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def listing(self):
+        """
+        List the run's files by kind.
+
+        Returns:
+            dict: "transcription" (text and audio), "alignment" and "image"
+                  file names
+        """
+        files = {"transcription": [], "alignment": [], "image": []}
+        if os.path.isdir(self.dir):
+            for file in sorted(os.listdir(self.dir)):
+                extension = os.path.splitext(file)[1]
+                if extension in (".png", ".jpg"):
+                    files["image"].append(file)
+                elif extension in (".txt", ".wav", ".flac", ".mp3"):
+                    files["transcription"].append(file)
+        if os.path.isdir(self.alignment_dir):
+            files["alignment"] = sorted(os.listdir(self.alignment_dir))
+        return files
+
+
+def map_file(path):
+    """
+    Map a file into memory read-only, without copying it onto the heap.
+
+    Args:
+        path (str): Path of the file
+
+    Returns:
+        memoryview: The file contents, backed by the page cache
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        # The mapping stays valid after the file is closed
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class ArticleResult(MutableMapping):
+    """
+    Result of processing one article, holding paths instead of media bytes.
+
+    It reads like the result dict process_article always returned: keys are
+    present only when set, and "audio_base64" and "image_base64" are encoded
+    from the archived files each time they are read, so nothing holds a
+    base64 copy unless the caller does. A base64 key is absent while its
+    file is missing, e.g. after the run directory was cleaned up. The raw media is available through
+    audio() and image() as memory-mapped views. Keys outside the known
+    fields are kept in a plain dict.
+
+    Args:
+        include_base64 (bool): Whether the base64 keys are offered
+        **fields: Initial values, e.g. status="success"
+    """
+
+    __slots__ = ("filename", "status", "error", "summary", "picture_ideas",
+                 "audio_results", "image_results", "alignment_success", "transcribed_dir",
+                 "moved_files", "video_path", "render_error", "metrics",
+                 "include_base64", "extra")
+
+    FIELDS = __slots__[:-2]
+    BASE64_KEYS = ("audio_base64", "image_base64")
+
+    def __init__(self, include_base64=True, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, None)
+        self.include_base64 = include_base64
+        self.extra = {}
+        self.update(fields)
+
+    def _base64_path(self, key):
+        """Path of the file a base64 key is encoded from, or None if there is none."""
+        if not self.include_base64:
+            return None
+        if key == "audio_base64":
+            path = (self.audio_results or {}).get("wav_path")
+        else:
+            path = (self.image_results or {}).get("image_path")
+        return path if path is not None and os.path.isfile(path) else None
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        if key in self.extra:
+            return self.extra[key]
+        if key in self.BASE64_KEYS:
+            path = self._base64_path(key)
+            if path is not None:
+                try:
+                    return base64.b64encode(map_file(path)).decode("ascii")
+                except FileNotFoundError:
+                    # Removed since it was checked
+                    pass
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        # Without encoding anything, unlike Mapping's default
+        if key in self.FIELDS:
+            return getattr(self, key) is not None
+        if key in self.BASE64_KEYS and self._base64_path(key) is not None:
+            return True
+        return key in self.extra
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.FIELDS:
+            if getattr(self, key) is None:
+                raise KeyError(key)
+            setattr(self, key, None)
+        else:
+            del self.extra[key]
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        for key in self.BASE64_KEYS:
+            if key not in self.extra and self._base64_path(key) is not None:
+                yield key
+        yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={getattr(self, key)!r}" for key in ("filename", "status", "error")
+                           if getattr(self, key) is not None)
+        return f"ArticleResult({fields})"
+
+    def audio(self, kind="wav"):
+        """
+        Map the archived narration into memory.
+
+        Args:
+            kind (str): "wav", or "flac" or "mp3" for the full-band narration
+                        of the audio profile
+
+        Returns:
+            memoryview: The audio file contents
+        """
+        return map_file(self.audio_results[f"{kind}_path"])
+
+    def image(self):
+        """
+        Map the archived image into memory.
+
+        Returns:
+            memoryview: The image file contents
+        """
+        return map_file(self.image_results["image_path"])
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: A plain dict of the result, e.g. for JSON, with the base64
+                  keys encoded if they are offered
+        """
+        return dict(self.items())
@@ -1,40 +1,203 @@
 import os
+import wave
 import subprocess
-from elevenlabs import ElevenLabs
-from config import ELEVENLABS_API_KEY, ELEVEN_VOICE_ID, ELEVEN_MODEL_ID, TRANSCRIPTION_DIR
+import threading
+import contextlib
+import numpy as np
+from cache import BlobStore, content_key
+from metrics import span
+from profiling import profiled
+from config import (ELEVENLABS_API_KEY, ELEVEN_VOICE_ID, ELEVEN_MODEL_ID, TRANSCRIPTION_DIR,
+                    CACHE_DIR, AUDIO_CACHE_MAX_BYTES, AUDIO_PROFILES, AUDIO_PROFILE)
 
-# Initialize ElevenLabs client
-elevenlabs_client = ElevenLabs(
-    api_key=ELEVENLABS_API_KEY
-)
+WAV_SAMPLE_RATE = 16000  # Sample rate MFA expects
 
+# Shared by every generate_audio call in the process, created on first use
+_elevenlabs_client = None
+_elevenlabs_client_lock = threading.Lock()
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
 
-def generate_audio(summary, filename=None):
+
+def _get_elevenlabs_client():
+    """Return the process-wide ElevenLabs client, importing and creating it on first use."""
+    global _elevenlabs_client
+    with _elevenlabs_client_lock:
+        if _elevenlabs_client is None:
+            from elevenlabs import ElevenLabs
+            _elevenlabs_client = ElevenLabs(
+                api_key=ELEVENLABS_API_KEY
+            )
+        return _elevenlabs_client
+
+
+def _get_audio_cache():
+    """Return the process-wide TTS audio store, creating it on first use."""
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = BlobStore(os.path.join(CACHE_DIR, "audio"),
+                                     max_bytes=AUDIO_CACHE_MAX_BYTES)
+        return _audio_cache
+
+
+def _read_pcm(wav_path):
+    """Read the samples of a 16-bit mono WAV file into an int16 array."""
+    with wave.open(wav_path, "rb") as wav_file:
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype="<i2")
+
+
+@contextlib.contextmanager
+def _replacing(path):
+    """
+    Write a file under a temporary name and rename it over path when done.
+
+    The rename gives path a new inode, so a cached blob hardlinked at path
+    by an earlier run (see BlobStore.materialize) is never truncated or
+    overwritten. On error the temporary file is removed and path is untouched.
+
+    Yields:
+        str: The temporary path to write to
+    """
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _ffmpeg_input(output_format):
+    """ffmpeg input options for an ElevenLabs output format, e.g. "pcm_44100" or "mp3_44100_128"."""
+    codec, rate = output_format.split("_")[:2]
+    if codec == "pcm":
+        return ["-f", "s16le", "-ar", rate, "-ac", "1"]
+    return ["-f", codec]
+
+
+def _stream_transcode(response, output_format, source_filepath, wav_filepath):
+    """
+    Write the full-band audio and the 16 kHz mono WAV at once while the response streams in.
+
+    Each chunk is piped into ffmpeg as it arrives. MP3 chunks are also
+    appended to the source file as they are; raw PCM is encoded to FLAC by
+    the same ffmpeg process, so the render gets the full band losslessly.
+    ffmpeg's 16 kHz PCM output is written into the WAV as it is produced,
+    so neither the response nor the PCM is held in memory.
+
+    Args:
+        response (iterable): Audio chunks from ElevenLabs
+        output_format (str): The ElevenLabs output format of the chunks
+        source_filepath (str): Path to write the full-band MP3 or FLAC to
+        wav_filepath (str): Path to write the 16 kHz WAV to
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg fails, with its stderr
+    """
+    native_pcm = output_format.startswith("pcm_")
+    with _replacing(source_filepath) as temp_source, _replacing(wav_filepath) as temp_wav:
+        command = ["ffmpeg", "-y", "-loglevel", "error", *_ffmpeg_input(output_format),
+                   "-i", "pipe:0"]
+        if native_pcm:
+            command += ["-c:a", "flac", "-f", "flac", temp_source]
+        command += [
+            "-ar", str(WAV_SAMPLE_RATE),  # Set sample rate to 16 kHz
+            "-ac", "1",      # Convert to mono
+            "-acodec", "pcm_s16le",  # Ensure PCM 16-bit encoding
+            "-f", "s16le", "pipe:1"
+        ]
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+
+        # Read ffmpeg's output concurrently so neither pipe can fill up and block
+        stderr_chunks = []
+        errors = []
+
+        def write_wav(stream):
+            try:
+                with wave.open(temp_wav, "wb") as wav_file:
+                    wav_file.setnchannels(1)
+                    wav_file.setsampwidth(2)
+                    wav_file.setframerate(WAV_SAMPLE_RATE)
+                    for chunk in iter(lambda: stream.read(64 * 1024), b""):
+                        wav_file.writeframesraw(chunk)
+            except Exception as e:
+                errors.append(e)
+                # Keep draining so ffmpeg is not blocked on a full pipe
+                for _ in iter(lambda: stream.read(64 * 1024), b""):
+                    pass
+
+        def drain(stream):
+            for chunk in iter(lambda: stream.read(64 * 1024), b""):
+                stderr_chunks.append(chunk)
+
+        readers = [
+            threading.Thread(target=write_wav, args=(process.stdout,)),
+            threading.Thread(target=drain, args=(process.stderr,)),
+        ]
+        for reader in readers:
+            reader.start()
+
+        exited_early = False
+        try:
+            with contextlib.ExitStack() as stack:
+                source_file = None if native_pcm else stack.enter_context(
+                    open(temp_source, "wb"))
+                for chunk in response:
+                    if source_file is not None:
+                        source_file.write(chunk)
+                    try:
+                        process.stdin.write(chunk)
+                    except BrokenPipeError:
+                        # ffmpeg exited; its status and stderr say why
+                        exited_early = True
+                        break
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                exited_early = True
+            for reader in readers:
+                reader.join()
+            process.wait()
+
+        if process.returncode != 0 or exited_early:
+            raise subprocess.CalledProcessError(
+                process.returncode, "ffmpeg", stderr=b"".join(stderr_chunks))
+        if errors:
+            raise errors[0]
+
+
+@profiled("generate_audio")
+def generate_audio(summary, filename=None, output_dir=TRANSCRIPTION_DIR, use_cache=True,
+                   profile=AUDIO_PROFILE):
     """
     Generate audio from text using ElevenLabs.
 
+    Audio already generated for the same text, voice, model and output format
+    is taken from the audio cache instead of calling ElevenLabs again.
+    ElevenLabs is asked for full-band audio, which is kept for the render:
+    as FLAC with the "pcm" profile (raw 44.1 kHz PCM) or as the MP3 itself
+    with the "mp3" profile. While it streams in, ffmpeg derives the 16 kHz
+    mono WAV that alignment needs from it.
+
     Args:
         summary (str): The text to convert to speech
         filename (str, optional): Filename to save the audio. If None, a timestamp will be used.
+        output_dir (str): Directory to write the text and audio files into
+        use_cache (bool): Whether to look up and store the audio in the audio cache
+        profile (str): Name of the audio profile in AUDIO_PROFILES
 
     Returns:
-        dict: A dictionary containing audio bytes and file paths
+        dict: A dictionary containing the full-band audio file's bytes ("audio"),
+              file paths ("wav_path" and "flac_path" or "mp3_path") and the
+              16 kHz PCM samples as an int16 NumPy array ("pcm")
     """
     results = {}
 
     try:
-        # Generate audio using ElevenLabs
-        response = elevenlabs_client.text_to_speech.convert(
-            voice_id=ELEVEN_VOICE_ID,
-            output_format="mp3_44100_128",
-            text=summary,
-            model_id=ELEVEN_MODEL_ID,
-        )
-        audio_bytes = b"".join(response)
-        results["audio"] = audio_bytes
-
-        # Save the summary text and audio file
-        os.makedirs(TRANSCRIPTION_DIR, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
 
         # Use provided filename or a timestamp
         if not filename:
@@ -42,30 +205,57 @@ def generate_audio(summary, filename=None):
             filename = str(int(time.time()))
 
         # Save text
-        text_filepath = os.path.join(TRANSCRIPTION_DIR, f"{filename}.txt")
+        text_filepath = os.path.join(output_dir, f"{filename}.txt")
         with open(text_filepath, "w") as f:
             f.write(summary)
         results["text_path"] = text_filepath
 
-        # Save MP3
-        mp3_filepath = os.path.join(TRANSCRIPTION_DIR, f"{filename}.mp3")
-        with open(mp3_filepath, "wb") as f:
-            f.write(audio_bytes)
-        results["mp3_path"] = mp3_filepath
-
-        # Convert to WAV
-        wav_filepath = os.path.join(TRANSCRIPTION_DIR, f"{filename}.wav")
-        subprocess.run([
-            "ffmpeg", "-y", "-i", mp3_filepath,
-            "-ar", "16000",  # Set sample rate to 16 kHz
-            "-ac", "1",      # Convert to mono
-            "-acodec", "pcm_s16le",  # Ensure PCM 16-bit encoding
-            wav_filepath
-        ], check=True)
-        results["wav_path"] = wav_filepath
+        output_format = AUDIO_PROFILES[profile]["output_format"]
+        extension = AUDIO_PROFILES[profile]["extension"]
+
+        source_filepath = os.path.join(output_dir, f"{filename}.{extension}")
+        wav_filepath = os.path.join(output_dir, f"{filename}.wav")
+        files = {"wav": wav_filepath, extension: source_filepath}
+
+        cache_key = content_key(summary, ELEVEN_VOICE_ID,
+                                ELEVEN_MODEL_ID, output_format)
+        cached = _get_audio_cache().get(cache_key) if use_cache else None
+
+        if cached is not None:
+            # Reuse the stored audio files
+            with span("tts.cache_hit", characters=len(summary)):
+                for name, path in files.items():
+                    BlobStore.materialize(cached[name], path)
+        else:
+            # Generate audio using ElevenLabs
+            with span("tts", characters=len(summary), output_format=output_format) as call:
+                response = _get_elevenlabs_client().text_to_speech.convert(
+                    voice_id=ELEVEN_VOICE_ID,
+                    output_format=output_format,
+                    text=summary,
+                    model_id=ELEVEN_MODEL_ID,
+                )
+
+                # Keep the full-band audio and derive the WAV as the chunks
+                # arrive. The span covers the download too, ffmpeg's own CPU
+                # is its child_cpu_seconds.
+                with span("ffmpeg.transcode", streamed=True):
+                    _stream_transcode(response, output_format, source_filepath, wav_filepath)
+                call.set("audio_bytes", os.path.getsize(source_filepath))
+
+        pcm = _read_pcm(wav_filepath)
+        with open(source_filepath, "rb") as f:
+            results["audio"] = f.read()
+        results.update({f"{name}_path": path for name, path in files.items()})
+        results["pcm"] = pcm
+        results["sample_rate"] = WAV_SAMPLE_RATE
+        results["cache_hit"] = cached is not None
 
-        # Optionally remove the MP3 file
-        # os.remove(mp3_filepath)
+        if use_cache and cached is None:
+            try:
+                _get_audio_cache().put(cache_key, files)
+            except OSError as e:
+                print(f"Error storing audio in cache: {e}")
 
     except Exception as e:
         results["error"] = str(e)
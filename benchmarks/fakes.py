@@ -0,0 +1,250 @@
+"""
+Local stand-ins for the external services the pipeline calls.
+
+Gemini, ElevenLabs and Vertex AI are replaced by fake client modules placed
+in sys.modules; the stages import their clients on first use, so they pick
+the fakes up without any patching. MiniMax is served by a local HTTP server
+that speaks the same REST API, and MFA by a fake `mfa` executable put on
+PATH. Every fake waits `latency` seconds per call before answering, to stand
+in for the network and model time of the real service.
+"""
+import os
+import re
+import sys
+import json
+import stat
+import socket
+import time
+import types
+import threading
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def _ensure_package(name):
+    """Make a namespace parent such as google importable if it is not installed."""
+    if name not in sys.modules and importlib.util.find_spec(name) is None:
+        _module(name, __path__=[])
+
+
+def install_gemini(latency, summary, picture_ideas=3):
+    """Install a fake google.generativeai that returns a fixed JSON generation."""
+    payload = json.dumps({
+        "summary": summary,
+        "picture_ideas": [{"description": f"Picture idea {index + 1} for the article."}
+                          for index in range(picture_ideas)],
+    })
+
+    class GenerativeModel:
+        def __init__(self, model_name, system_instruction=None):
+            self.model_name = model_name
+
+        def generate_content(self, contents, generation_config=None):
+            time.sleep(latency)
+            return types.SimpleNamespace(text=payload)
+
+    _ensure_package("google")
+    _module("google.generativeai",
+            configure=lambda **kwargs: None,
+            GenerativeModel=GenerativeModel,
+            types=types.SimpleNamespace(GenerationConfig=lambda **kwargs: kwargs))
+
+
+def install_elevenlabs(latency, pcm_bytes, mp3_bytes, chunk_size=4096):
+    """
+    Install a fake elevenlabs client that streams fixed audio.
+
+    PCM output formats stream pcm_bytes (at the rate of the format the
+    fixtures were made for), anything else streams mp3_bytes, in
+    chunk_size pieces after latency seconds, like the real chunked response.
+    """
+    def convert(voice_id, output_format, text, model_id):
+        time.sleep(latency)
+        audio = pcm_bytes if output_format.startswith("pcm_") else mp3_bytes
+        for offset in range(0, len(audio), chunk_size):
+            yield audio[offset:offset + chunk_size]
+
+    class ElevenLabs:
+        def __init__(self, api_key=None):
+            self.text_to_speech = types.SimpleNamespace(convert=convert)
+
+    _module("elevenlabs", ElevenLabs=ElevenLabs)
+
+    # Drop a client built before the fake was installed
+    if "audio_generator" in sys.modules:
+        sys.modules["audio_generator"]._elevenlabs_client = None
+
+
+def install_vertex(latency, image_bytes):
+    """Install a fake vertexai whose image model returns image_bytes."""
+    class ImageGenerationModel:
+        @classmethod
+        def from_pretrained(cls, model_name):
+            return cls()
+
+        def generate_images(self, prompt, number_of_images=1, **kwargs):
+            time.sleep(latency)
+            image = types.SimpleNamespace(_image_bytes=image_bytes)
+            return types.SimpleNamespace(images=[image] * number_of_images)
+
+    _module("vertexai", __path__=[], init=lambda **kwargs: None)
+    _module("vertexai.preview", __path__=[])
+    _module("vertexai.preview.vision_models", ImageGenerationModel=ImageGenerationModel)
+
+
+class MiniMaxServer:
+    """
+    Local HTTP server implementing the MiniMax video generation API.
+
+    A submitted task reports "Queueing" for `queued` queries, "Processing"
+    for `polls` more and then "Success"; the download URL serves video_bytes
+    and honours Range requests. The first `dropped_downloads` downloads
+    close the connection halfway through the body. Use as a context manager;
+    base_url is set once the server is listening.
+    """
+
+    def __init__(self, latency, video_bytes, polls=2, queued=0, dropped_downloads=0):
+        self.latency = latency
+        self.video_bytes = video_bytes
+        self.polls = polls
+        self.queued = queued
+        self.dropped_downloads = dropped_downloads
+        self.base_url = None
+        self._queries = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def _status(self, task_id):
+        with self._lock:
+            count = self._queries.get(task_id, 0)
+            self._queries[task_id] = count + 1
+        if count < self.queued:
+            return {"task_id": task_id, "status": "Queueing"}
+        if count < self.queued + self.polls:
+            return {"task_id": task_id, "status": "Processing"}
+        return {"task_id": task_id, "status": "Success", "file_id": f"file-{task_id}"}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, body, content_type="application/json"):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                time.sleep(server.latency)
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == "/v1/video_generation":
+                    self._send({"task_id": f"task-{time.monotonic_ns()}"})
+                else:
+                    self.send_error(404)
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/v1/query/video_generation":
+                    self._send(server._status(query["task_id"][0]))
+                elif url.path == "/v1/files/retrieve":
+                    file_id = query["file_id"][0]
+                    self._send({"file": {"file_id": file_id,
+                                         "download_url": f"{server.base_url}/download/{file_id}"}})
+                elif url.path.startswith("/download/"):
+                    self._download()
+                else:
+                    self.send_error(404)
+
+            def _download(self):
+                body = server.video_bytes
+                start = 0
+                match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    self.send_response(206)
+                    self.send_header("Content-Range",
+                                     f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(len(body) - start))
+                self.end_headers()
+                with server._lock:
+                    drop = server.dropped_downloads > 0
+                    server.dropped_downloads -= drop
+                if drop:
+                    # Send half of what was promised, then hang up
+                    self.wfile.write(body[start:start + (len(body) - start) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                self.wfile.write(body[start:])
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+_MFA_SCRIPT = """#!{python}
+# Fake `mfa align` for benchmarks: waits, then aligns heuristically
+import sys, time, logging
+logging.disable(logging.INFO)
+sys.path.insert(0, {repo_dir!r})
+from heuristic_aligner import align_text_heuristic
+
+args = sys.argv[2:]
+positional = []
+while args:
+    arg = args.pop(0)
+    if arg in ("--temp_directory", "--num_jobs"):
+        args.pop(0)
+    elif not arg.startswith("--"):
+        positional.append(arg)
+corpus_dir, _dictionary, _acoustic_model, output_dir = positional
+time.sleep({latency!r})
+sys.exit(0 if align_text_heuristic(corpus_dir, output_dir) else 1)
+"""
+
+
+def install_mfa(bin_dir, repo_dir, latency):
+    """
+    Put a fake `mfa` executable first on PATH.
+
+    It accepts the `mfa align` command lines text_aligner builds, sleeps
+    latency seconds for model loading and writes heuristic TextGrids.
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    script_path = os.path.join(bin_dir, "mfa")
+    with open(script_path, "w") as f:
+        f.write(_MFA_SCRIPT.format(python=sys.executable, repo_dir=repo_dir, latency=latency))
+    os.chmod(script_path, os.stat(script_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    return script_path
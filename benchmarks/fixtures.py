@@ -0,0 +1,187 @@
+"""
+Synthetic inputs for the benchmarks.
+
+Everything is generated deterministically from a fixed seed, so results from
+different checkouts are measured on the same data.
+"""
+import io
+import os
+import wave
+import subprocess
+import numpy as np
+from PIL import Image, ImageDraw
+
+SAMPLE_RATE = 16000
+SEED = 1234
+
+# Word list for synthetic articles and transcripts
+_VOCABULARY = (
+    "the city council voted on tuesday to expand solar power across every public building "
+    "officials said the plan would cut energy costs by forty percent within five years "
+    "while residents asked how the project would be funded and when construction starts "
+    "engineers expect panels on schools libraries and stations before next summer"
+).split()
+
+
+def words(count, seed=SEED):
+    """Return count pseudo-random words from a small news vocabulary."""
+    rng = np.random.default_rng(seed)
+    return [_VOCABULARY[index] for index in rng.integers(0, len(_VOCABULARY), count)]
+
+
+def _sentences(word_count, seed=SEED):
+    body = words(word_count, seed)
+    return [" ".join(body[i:i + 15]).capitalize() + "." for i in range(0, len(body), 15)]
+
+
+def article_text(word_count=600):
+    """A synthetic article of roughly word_count words with a byline."""
+    sentences = _sentences(word_count)
+    paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return "By Jane Smith, Reuters\n\n" + "\n\n".join(paragraphs)
+
+
+def summary_text(word_count=75):
+    """A synthetic spoken summary, about 25 seconds of narration."""
+    return " ".join(_sentences(word_count, seed=SEED + 1))
+
+
+def speech_like_audio(transcript, sample_rate=SAMPLE_RATE, seed=SEED):
+    """
+    Synthesize 16-bit mono audio with one voiced burst per word.
+
+    Bursts are noisy harmonic tones with a length proportional to the word,
+    separated by short pauses and a longer one after each sentence, so the
+    aligners have real pauses to snap to.
+
+    Returns:
+        tuple: (int16 samples, word caption tuples (start_time, end_time, text)
+               of the bursts)
+    """
+    rng = np.random.default_rng(seed)
+    pieces = [np.zeros(int(0.2 * sample_rate))]
+    captions = []
+    position = len(pieces[0])
+    for word in transcript.split():
+        length = int((0.08 + 0.05 * len(word.strip(".,"))) * sample_rate)
+        t = np.arange(length) / sample_rate
+        pitch = rng.uniform(110, 220)
+        tone = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in (1, 2, 3))
+        envelope = np.sin(np.pi * np.arange(length) / length)
+        pieces.append((tone + 0.1 * rng.standard_normal(length)) * envelope * 6000)
+        captions.append((round(position / sample_rate, 3),
+                         round((position + length) / sample_rate, 3), word.strip(".,")))
+        pause = int((0.35 if word.endswith(".") else 0.06) * sample_rate)
+        pieces.append(np.zeros(pause))
+        position += length + pause
+    pieces.append(np.zeros(int(0.3 * sample_rate)))
+    pcm = np.clip(np.concatenate(pieces), -32768, 32767).astype("<i2")
+    return pcm, captions
+
+
+def write_wav(wav_path, pcm, sample_rate=SAMPLE_RATE):
+    """Write int16 samples as a mono WAV file."""
+    with wave.open(wav_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return wav_path
+
+
+def resample_pcm(pcm, rate, sample_rate=SAMPLE_RATE):
+    """Resample int16 samples to rate with ffmpeg, like an ElevenLabs pcm_<rate> response."""
+    process = subprocess.run([
+        os.environ.get("IMAGEIO_FFMPEG_EXE", "ffmpeg"), "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        "-ar", str(rate), "-f", "s16le", "pipe:1",
+    ], input=pcm.tobytes(), capture_output=True, check=True)
+    return process.stdout
+
+
+def encode_mp3(pcm, sample_rate=SAMPLE_RATE):
+    """Encode int16 samples to MP3 bytes with ffmpeg, like an ElevenLabs MP3 response."""
+    process = subprocess.run([
+        os.environ.get("IMAGEIO_FFMPEG_EXE", "ffmpeg"), "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        "-ar", "44100", "-b:a", "128k", "-f", "mp3", "pipe:1",
+    ], input=pcm.tobytes(), capture_output=True, check=True)
+    return process.stdout
+
+
+def png_bytes(size=1024):
+    """A square gradient PNG, standing in for a generated picture."""
+    ramp = np.linspace(0, 255, size, dtype=np.uint8)
+    rgb = np.stack([
+        np.tile(ramp, (size, 1)),
+        np.tile(ramp[:, None], (1, size)),
+        np.full((size, size), 128, dtype=np.uint8),
+    ], axis=-1)
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def write_corgi_gif(gif_path, size=(240, 200), frames=10, frame_ms=100):
+    """Write a small transparent animated GIF in place of the corgi asset."""
+    width, height = size
+    images = []
+    for index in range(frames):
+        image = Image.new("P", size, 0)
+        image.putpalette([0, 0, 0, 222, 140, 60, 255, 255, 255] + [0] * (253 * 3))
+        draw = ImageDraw.Draw(image)
+        bounce = int(10 * np.sin(2 * np.pi * index / frames))
+        draw.ellipse((20, 40 + bounce, width - 20, height - 10 + bounce), fill=1)
+        draw.ellipse((width - 90, 20 + bounce, width - 30, 80 + bounce), fill=2)
+        images.append(image)
+    images[0].save(gif_path, save_all=True, append_images=images[1:], duration=frame_ms,
+                   loop=0, transparency=0, disposal=2)
+    return gif_path
+
+
+def even_captions(transcript_words, word_duration=0.3, gap=0.05):
+    """Word caption tuples (start_time, end_time, text) at a steady speaking rate."""
+    captions = []
+    cursor = 0.2
+    for word in transcript_words:
+        captions.append((round(cursor, 3), round(cursor + word_duration, 3), word))
+        cursor += word_duration + gap
+    return captions
+
+
+def write_textgrid(textgrid_path, word_count):
+    """
+    Write an MFA-style long-format TextGrid with word_count words.
+
+    Returns:
+        list: The word captions written to the file
+    """
+    from heuristic_aligner import write_textgrid as write_mfa_textgrid
+
+    captions = even_captions(words(word_count))
+    write_mfa_textgrid(textgrid_path, captions, round(captions[-1][1] + 0.3, 3))
+    return captions
+
+
+def make_run_folder(folder, name, transcript, pcm, captions):
+    """
+    Lay out a processed article the way main.py leaves it in transcribed/.
+
+    The folder gets <name>.txt, <name>.wav, a picture <name>.png, and an
+    MFA-style alignment/<name>.TextGrid of the given word captions.
+
+    Returns:
+        str: The folder path
+    """
+    from heuristic_aligner import write_textgrid as write_mfa_textgrid
+
+    os.makedirs(os.path.join(folder, "alignment"), exist_ok=True)
+    with open(os.path.join(folder, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.write(transcript)
+    write_wav(os.path.join(folder, f"{name}.wav"), pcm)
+    with open(os.path.join(folder, f"{name}.png"), "wb") as f:
+        f.write(png_bytes())
+
+    write_mfa_textgrid(os.path.join(folder, "alignment", f"{name}.TextGrid"),
+                       captions, len(pcm) / SAMPLE_RATE)
+    return folder
@@ -0,0 +1,120 @@
+"""
+Import-time benchmark.
+
+Imports a module in fresh interpreters, the way a short-lived worker starts,
+and checks the median import time against a budget. It also fails if any of
+the heavy client libraries, which should only load when their stage first
+runs, were imported eagerly.
+
+Usage:
+    python benchmarks/import_time.py [--module main] [--runs 5] [--budget 0.5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "0.5"))  # Seconds
+
+# Dependencies that must not be loaded just by importing the pipeline
+HEAVY_MODULES = (
+    "google.generativeai",
+    "google.cloud.aiplatform",
+    "vertexai",
+    "grpc",
+    "elevenlabs",
+    "moviepy",
+    "pandas",
+)
+
+_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        dict: Import wall time in seconds, loaded module names, and the
+              slowest top-level imports reported by -X importtime
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+
+    # Lines look like "import time:  self [us] | cumulative | package"
+    top_level = []
+    for line in process.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        if name.startswith("  "):
+            continue  # Nested import, already counted in its parent
+        top_level.append((int(parts[1]) / 1e6, name.strip()))
+    result["slowest"] = sorted(top_level, reverse=True)[:10]
+    return result
+
+
+def run(module, runs, budget):
+    """
+    Measure the import several times and compare it to the budget.
+
+    Returns:
+        dict: Summary with the median time, whether it is within the budget
+              and which heavy modules were loaded
+    """
+    samples = [measure_import(module) for _ in range(runs)]
+    median = statistics.median(sample["seconds"] for sample in samples)
+    loaded = sorted({
+        heavy for sample in samples for heavy in HEAVY_MODULES
+        if heavy in sample["modules"]
+    })
+    return {
+        "module": module,
+        "runs": runs,
+        "median_seconds": median,
+        "min_seconds": min(sample["seconds"] for sample in samples),
+        "samples_seconds": [sample["seconds"] for sample in samples],
+        "budget_seconds": budget,
+        "within_budget": median <= budget,
+        "heavy_modules_loaded": loaded,
+        "slowest_imports": samples[0]["slowest"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to average over")
+    parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET,
+                        help="Maximum median import time in seconds")
+    args = parser.parse_args()
+
+    summary = run(args.module, args.runs, args.budget)
+    print(f"import {summary['module']}: median {summary['median_seconds']:.3f}s "
+          f"(min {summary['min_seconds']:.3f}s, budget {summary['budget_seconds']:.3f}s)")
+    for seconds, name in summary["slowest_imports"]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+    ok = summary["within_budget"] and not summary["heavy_modules_loaded"]
+    if summary["heavy_modules_loaded"]:
+        print(f"Heavy modules imported eagerly: {', '.join(summary['heavy_modules_loaded'])}")
+    if not summary["within_budget"]:
+        print("Import time is over budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,477 @@
+"""
+Per-stage benchmark suite.
+
+Runs every pipeline stage in isolation on synthetic fixtures, with Gemini,
+ElevenLabs, Vertex AI, MiniMax and MFA replaced by local stand-ins (see
+fakes.py), and writes the timings to a JSON file. Pass an earlier results
+file to --compare to see which stages got slower.
+
+Usage:
+    python benchmarks/run.py [--only parse render] [--repeat 5] [--latency 0.2]
+                             [--output results.json] [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import fakes  # noqa: E402
+import fixtures  # noqa: E402
+import import_time  # noqa: E402
+
+logger = logging.getLogger('benchmarks')
+
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+RESULTS_FORMAT_VERSION = 1
+BENCH_LATENCY = float(os.getenv("BENCH_LATENCY", "0"))  # Seconds per fake service call
+REGRESSION_THRESHOLD = 0.2  # Slowdown of a median, as a fraction, reported as a regression
+
+ARTICLE_WORDS = 600
+SUMMARY_WORDS = 75
+SMALL_TEXTGRID_WORDS = 80
+LARGE_TEXTGRID_WORDS = 50000
+ALIGN_BATCH_RUNS = 8
+VIDEO_BATCH_TASKS = 8
+# MiniMax poll intervals for the fake server, whose tasks finish after a few polls
+BENCH_POLL_INTERVALS = {status: (0.01, 0.05) for status in ("Preparing", "Queueing", "Processing")}
+
+
+class Benchmark:
+    """
+    One timed stage.
+
+    func(context) is the timed call; setup(context), if given, runs untimed
+    before every call. With number > 1 each sample times that many calls and
+    records the time per call.
+    """
+
+    def __init__(self, name, func, setup=None, number=1):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.number = number
+
+    def sample(self, context):
+        if self.setup:
+            self.setup(context)
+        start = time.perf_counter()
+        for _ in range(self.number):
+            self.func(context)
+        return (time.perf_counter() - start) / self.number
+
+
+BENCHMARKS = []
+
+
+def benchmark(name, setup=None, number=1):
+    """Register a stage benchmark."""
+    def register(func):
+        BENCHMARKS.append(Benchmark(name, func, setup, number))
+        return func
+    return register
+
+
+def _check(result, stage):
+    """Fail the benchmark if a stage returned its error dict or a falsy result."""
+    if not result or (isinstance(result, dict) and "error" in result):
+        error = result.get("error") if isinstance(result, dict) else result
+        raise RuntimeError(f"{stage} failed: {error}")
+    return result
+
+
+# Stages
+
+@benchmark("text.generate_content")
+def _bench_generate_content(context):
+    from text_generator import TextGenerator
+
+    result = TextGenerator(api_key="benchmark", use_cache=False).generate_content(
+        context["article"])
+    if result.summary.startswith("Error generating summary"):
+        raise RuntimeError(result.summary)
+
+
+def _generate_audio(context, profile):
+    from audio_generator import generate_audio
+
+    _check(generate_audio(context["summary"], "bench", output_dir=context["audio_dir"],
+                          use_cache=False, profile=profile), "generate_audio")
+
+
+@benchmark("audio.generate_audio[pcm]")
+def _bench_audio_pcm(context):
+    _generate_audio(context, "pcm")
+
+
+@benchmark("audio.generate_audio[mp3+transcode]")
+def _bench_audio_mp3(context):
+    _generate_audio(context, "mp3")
+
+
+@benchmark("image.generate_image")
+def _bench_generate_image(context):
+    from image_generator import generate_image
+
+    _check(generate_image("Solar panels on a city hall roof", "bench", max_retries=1,
+                          output_dir=context["images_dir"]), "generate_image")
+
+
+@benchmark("align.align_text_mfa")
+def _bench_align_text_mfa(context):
+    from text_aligner import align_text_mfa
+
+    _check(align_text_mfa(context["align_input"], output_path=context["align_output"],
+                          temp_dir=os.path.join(context["work_dir"], "mfa_temp")),
+           "align_text_mfa")
+
+
+@benchmark(f"align.align_runs_mfa[{ALIGN_BATCH_RUNS} runs]")
+def _bench_align_runs_mfa(context):
+    from text_aligner import align_runs_mfa
+
+    status = align_runs_mfa(context["align_batch"], num_jobs=2)
+    _check(all(status.values()), "align_runs_mfa")
+
+
+@benchmark("align.align_text_heuristic")
+def _bench_align_heuristic(context):
+    from heuristic_aligner import align_text_heuristic
+
+    _check(align_text_heuristic(context["align_input"], context["align_output"]),
+           "align_text_heuristic")
+
+
+def _remove_sidecars(context):
+    from parse import SIDECAR_SUFFIX
+
+    for textgrid_path in context["textgrids"].values():
+        if os.path.exists(textgrid_path + SIDECAR_SUFFIX):
+            os.remove(textgrid_path + SIDECAR_SUFFIX)
+
+
+def _parse(context, size):
+    from parse import parse_textgrid
+
+    _check(parse_textgrid(context["textgrids"][size]), "parse_textgrid")
+
+
+for _size in ("small", "large"):
+    benchmark(f"parse.parse_textgrid[{_size}]", setup=_remove_sidecars)(
+        lambda context, size=_size: _parse(context, size))
+    benchmark(f"parse.parse_textgrid[{_size},sidecar]")(
+        lambda context, size=_size: _parse(context, size))
+
+
+@benchmark("captions.group_captions[summary]", number=1000)
+def _bench_group_summary(context):
+    from captions import group_captions
+
+    group_captions(context["summary_captions"])
+
+
+@benchmark(f"captions.group_captions[{LARGE_TEXTGRID_WORDS} words]")
+def _bench_group_large(context):
+    from captions import group_captions
+
+    group_captions(context["large_captions"])
+
+
+def _render(context, engine, segments=1):
+    from movie import create_shorts_video
+
+    _check(create_shorts_video(context["run_folder"],
+                               os.path.join(context["work_dir"], f"shorts_{engine}.mp4"),
+                               engine=engine, segments=segments, profile=context["profile"]),
+           "create_shorts_video")
+
+
+@benchmark("render.create_shorts_video[moviepy]")
+def _bench_render_moviepy(context):
+    _render(context, "moviepy")
+
+
+@benchmark("render.create_shorts_video[moviepy,segments=2]")
+def _bench_render_segmented(context):
+    _render(context, "moviepy", segments=2)
+
+
+@benchmark("render.create_shorts_video[ffmpeg]")
+def _bench_render_ffmpeg(context):
+    _render(context, "ffmpeg")
+
+
+def _generate_videos(context, count):
+    import video_generator
+
+    prompts = [f"{context['summary'][:200]} ({index})" for index in range(count)]
+    results = video_generator.generate_videos(
+        prompts, output_dir=os.path.join(context["work_dir"], "videos"),
+        api_base=context["minimax_base"], api_key="benchmark",
+        poll_intervals=BENCH_POLL_INTERVALS)
+    for result in results:
+        _check(result, "generate_videos")
+
+
+@benchmark("video.minimax_generation")
+def _bench_minimax(context):
+    _generate_videos(context, 1)
+
+
+@benchmark(f"video.minimax_generation[{VIDEO_BATCH_TASKS} tasks]")
+def _bench_minimax_batch(context):
+    _generate_videos(context, VIDEO_BATCH_TASKS)
+
+
+# Setup
+
+def prepare(work_dir, latency, profile, stack):
+    """
+    Build the fixtures under work_dir and install the service stand-ins.
+
+    The process works from work_dir from here on, since the stages resolve
+    their cache, scratch and asset paths relative to the working directory.
+
+    Returns:
+        dict: The context passed to every benchmark
+    """
+    os.chdir(work_dir)
+    summary = fixtures.summary_text(SUMMARY_WORDS)
+    pcm, word_captions = fixtures.speech_like_audio(summary)
+    image = fixtures.png_bytes()
+
+    fakes.install_gemini(latency, summary)
+    fakes.install_elevenlabs(latency, fixtures.resample_pcm(pcm, 44100), fixtures.encode_mp3(pcm))
+    fakes.install_vertex(latency, image)
+    fakes.install_mfa(os.path.join(work_dir, "bin"), REPO_DIR, latency)
+    server = stack.enter_context(fakes.MiniMaxServer(latency, os.urandom(2 * 1024 * 1024),
+                                                     queued=1))
+
+    os.makedirs("assets", exist_ok=True)
+    fixtures.write_corgi_gif(os.path.join("assets", "corgi.gif"))
+    run_folder = fixtures.make_run_folder(os.path.join(work_dir, "transcribed", "bench"),
+                                          "bench", summary, pcm, word_captions)
+
+    align_input = os.path.join(work_dir, "align", "input")
+    os.makedirs(align_input)
+    with open(os.path.join(align_input, "bench.txt"), "w", encoding="utf-8") as f:
+        f.write(summary)
+    fixtures.write_wav(os.path.join(align_input, "bench.wav"), pcm)
+    align_batch = []
+    for index in range(ALIGN_BATCH_RUNS):
+        run_input = os.path.join(work_dir, "align", f"run_{index}")
+        os.makedirs(run_input)
+        with open(os.path.join(run_input, f"run_{index}.txt"), "w", encoding="utf-8") as f:
+            f.write(summary)
+        fixtures.write_wav(os.path.join(run_input, f"run_{index}.wav"), pcm)
+        align_batch.append((run_input, os.path.join(run_input, "alignment")))
+
+    os.makedirs("textgrids")
+    textgrids = {"small": os.path.join(work_dir, "textgrids", "small.TextGrid"),
+                 "large": os.path.join(work_dir, "textgrids", "large.TextGrid")}
+    fixtures.write_textgrid(textgrids["small"], SMALL_TEXTGRID_WORDS)
+    large_captions = fixtures.write_textgrid(textgrids["large"], LARGE_TEXTGRID_WORDS)
+
+    return {
+        "work_dir": work_dir,
+        "profile": profile,
+        "article": fixtures.article_text(ARTICLE_WORDS),
+        "summary": summary,
+        "minimax_base": server.base_url,
+        "audio_dir": os.path.join(work_dir, "audio"),
+        "images_dir": os.path.join(work_dir, "images"),
+        "run_folder": run_folder,
+        "align_input": align_input,
+        "align_output": os.path.join(work_dir, "align", "output"),
+        "align_batch": align_batch,
+        "textgrids": textgrids,
+        "summary_captions": word_captions,
+        "large_captions": large_captions,
+    }
+
+
+def measure(bench, context, repeat, warmup):
+    """
+    Time a benchmark.
+
+    Returns:
+        dict: Per-call samples and their statistics in seconds, or the error
+    """
+    try:
+        for _ in range(warmup):
+            bench.sample(context)
+        samples = [bench.sample(context) for _ in range(repeat)]
+    except Exception as e:
+        logger.error(f"{bench.name} failed: {str(e)}")
+        return {"error": str(e)}
+
+    return {
+        "samples": samples,
+        "number": bench.number,
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _ffmpeg_version():
+    try:
+        output = subprocess.run([os.environ.get("IMAGEIO_FFMPEG_EXE", "ffmpeg"), "-version"],
+                                capture_output=True, text=True).stdout
+        return output.splitlines()[0] if output else None
+    except OSError:
+        return None
+
+
+def environment():
+    """Describe the checkout and machine the results were measured on."""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": _ffmpeg_version(),
+    }
+
+
+def _format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f}ms"
+    return f"{seconds:8.3f}s "
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare the medians of two result sets.
+
+    Returns:
+        list: (name, baseline median, new median, ratio) of every regression
+    """
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name, {})
+        if "median" not in result or "median" not in previous:
+            continue
+        ratio = result["median"] / previous["median"] if previous["median"] else float("inf")
+        marker = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"  {name:<48} {_format_seconds(previous['median'])} -> "
+              f"{_format_seconds(result['median'])} "
+              f"({ratio:5.2f}x){marker}")
+        if marker:
+            regressions.append((name, previous["median"], result["median"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="*", default=None,
+                        help="Run only benchmarks whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed samples per benchmark")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per benchmark")
+    parser.add_argument("--latency", type=float, default=BENCH_LATENCY,
+                        help="Seconds each fake service waits per call")
+    parser.add_argument("--profile", default="preview", help="Render profile for render benchmarks")
+    parser.add_argument("--output", default=None, help="Results file, default benchmarks/results/")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Median slowdown, as a fraction, reported as a regression")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    parser.add_argument("--verbose", action="store_true", help="Keep the stages' INFO logging")
+    args = parser.parse_args()
+
+    names = [bench.name for bench in BENCHMARKS] + ["import.main"]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    selected = [bench for bench in BENCHMARKS
+                if args.only is None or any(part in bench.name for part in args.only)]
+    run_import = args.only is None or any(part in "import.main" for part in args.only)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "settings": {"repeat": args.repeat, "warmup": args.warmup, "latency": args.latency,
+                     "profile": args.profile},
+        "benchmarks": {},
+    }
+
+    if run_import:
+        summary = import_time.run("main", args.repeat, import_time.IMPORT_TIME_BUDGET)
+        samples = summary["samples_seconds"]
+        results["benchmarks"]["import.main"] = {
+            "samples": samples, "number": 1, "median": summary["median_seconds"],
+            "mean": statistics.fmean(samples), "min": min(samples), "max": max(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "heavy_modules_loaded": summary["heavy_modules_loaded"],
+        }
+        print(f"{'import.main':<50} {_format_seconds(summary['median_seconds'])}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="corgi_bench_") as work_dir, \
+            contextlib.ExitStack() as stack:
+        try:
+            context = prepare(work_dir, args.latency, args.profile, stack) if selected else None
+            for bench in selected:
+                result = measure(bench, context, args.repeat, args.warmup)
+                results["benchmarks"][bench.name] = result
+                if "error" in result:
+                    print(f"{bench.name:<50} error: {result['error']}")
+                else:
+                    print(f"{bench.name:<50} {_format_seconds(result['median'])} "
+                          f"(min {_format_seconds(result['min']).strip()}, "
+                          f"stdev {_format_seconds(result['stdev']).strip()})")
+        finally:
+            os.chdir(cwd)
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        commit = (results["environment"]["commit"] or "nogit")[:10]
+        output_path = os.path.join(RESULTS_DIR, f"{stamp}-{commit}.json")
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output_path}")
+
+    failed = any("error" in result for result in results["benchmarks"].values())
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare}:")
+        if compare(results, baseline, args.threshold):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
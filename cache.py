@@ -0,0 +1,345 @@
+import os
+import json
+import shutil
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('cache')
+
+
+def content_key(*parts):
+    """
+    Build a stable cache key from JSON-serializable parts.
+
+    Returns:
+        str: Hex SHA-256 digest of the parts
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False,
+                         separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-process least-recently-used cache"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a value if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class DiskCache:
+    """
+    On-disk JSON cache with a time-to-live and a total size budget.
+
+    Entries live in <directory>/<key[:2]>/<key>.json. The time-to-live
+    counts from the "created" timestamp stored in each entry and is checked
+    when the entry is read. The modification time only orders entries for
+    eviction: reads refresh it, so size-based eviction drops the least
+    recently used entries first.
+    """
+
+    def __init__(self, directory, ttl=None, max_bytes=None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """Yield (path, size, mtime) of every entry in the cache."""
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if not file.endswith(".json"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or an expired entry."""
+        entry = self.get_entry(key)
+        return entry[1] if entry is not None else None
+
+    def get_entry(self, key):
+        """Return (created timestamp, value), or None on a miss or an expired entry."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+            self.delete(key)
+            return None
+
+        if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self.delete(key)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["created"], entry["value"]
+
+    def set(self, key, value):
+        """Store a JSON-serializable value, then evict down to the size budget."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps({"created": time.time(), "value": value},
+                             ensure_ascii=False).encode("utf-8")
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(temp_path, path)
+            self._size += len(payload)
+
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self.evict()
+
+    def delete(self, key):
+        """Remove an entry if present."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drop the least recently used entries until the cache is under budget."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if self.max_bytes is None or total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._size = total
+
+
+class TieredCache:
+    """In-process LRU layer in front of a DiskCache"""
+
+    def __init__(self, directory, ttl=None, max_bytes=None, memory_entries=256):
+        self.memory = LRUCache(memory_entries)
+        self.disk = DiskCache(directory, ttl=ttl, max_bytes=max_bytes)
+        self.ttl = ttl
+
+    def get(self, key):
+        """Return the cached value from memory or disk, or None on a miss."""
+        hit = self.memory.get(key)
+        if hit is not None:
+            created, value = hit
+            if self.ttl is None or time.time() - created <= self.ttl:
+                return value
+            self.memory.delete(key)
+
+        entry = self.disk.get_entry(key)
+        if entry is None:
+            return None
+        self.memory.set(key, entry)
+        return entry[1]
+
+    def set(self, key, value):
+        """Store a value in both layers."""
+        self.memory.set(key, (time.time(), value))
+        self.disk.set(key, value)
+
+
+def link_or_copy(source_path, destination_path):
+    """Hardlink a file into place, falling back to a copy across filesystems."""
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        shutil.copy2(source_path, destination_path)
+
+
+def _file_digest(path):
+    """Hex SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed file store with a disk budget.
+
+    Each distinct file is stored once under blobs/, named by the hash of its
+    contents, and entries map a cache key to one or more named blobs. Files
+    are copied in, so a blob never shares an inode with the file it was made
+    from, and stored read-only. They are handed out as hardlinks, so a run
+    directory shares the blob's disk space; writers must replace such files
+    (write a new file and rename it over) rather than rewrite them in place.
+    Reads refresh a blob's modification time and eviction drops the least
+    recently used blobs first, together with the entries that refer to them;
+    hardlinked copies outlive eviction. The store's size is kept as a running
+    total, so the blobs are only listed once it goes over budget.
+    """
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.blobs_dir = os.path.join(directory, "blobs")
+        self.entries = DiskCache(os.path.join(directory, "entries"))
+        self._lock = threading.Lock()
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._blobs())
+
+    def _blobs(self):
+        """List (mtime, size, path) of every stored blob."""
+        blobs = []
+        for root, _, files in os.walk(self.blobs_dir):
+            for file in files:
+                if file.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+        return blobs
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def get(self, key):
+        """
+        Look up the files stored under a key.
+
+        Returns:
+            dict: Name -> blob path, or None if the entry or any of its blobs is missing
+        """
+        digests = self.entries.get(key)
+        if digests is None:
+            return None
+
+        paths = {}
+        for name, digest in digests.items():
+            path = self._blob_path(digest)
+            try:
+                os.utime(path)
+            except OSError:
+                return None
+            paths[name] = path
+        return paths
+
+    def put(self, key, files):
+        """
+        Store files under a key, adding each blob only if it is not stored yet.
+
+        Args:
+            key (str): Cache key
+            files (dict): Name -> path of the file to store
+        """
+        digests = {}
+        for name, path in files.items():
+            digest = _file_digest(path)
+            blob_path = self._blob_path(digest)
+            with self._lock:
+                if not os.path.exists(blob_path):
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    temp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+                    # A copy, not a link: the source is a live run file
+                    shutil.copyfile(path, temp_path)
+                    os.chmod(temp_path, 0o444)
+                    os.replace(temp_path, blob_path)
+                    self._size += os.path.getsize(blob_path)
+            digests[name] = digest
+        self.entries.set(key, digests)
+
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used blobs and their entries until the store is under budget."""
+        # Listed outside the lock so puts are only held up by the removals
+        blobs = sorted(self._blobs())
+        removed = set()
+        with self._lock:
+            total = sum(size for _, size, _ in blobs)
+            for _, size, path in blobs:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed.add(os.path.basename(path))
+                except OSError:
+                    pass
+            self._size = total
+        if removed:
+            self._drop_entries(removed)
+
+    def _drop_entries(self, digests):
+        """Delete the entries that refer to any of these blobs."""
+        for path, _, _ in self.entries._entries():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not digests.isdisjoint(entry["value"].values()):
+                self.entries.delete(os.path.basename(path)[:-len(".json")])
+
+    @staticmethod
+    def materialize(blob_path, destination_path):
+        """Place a stored blob at destination_path as a hardlink (or copy)."""
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+        link_or_copy(blob_path, destination_path)
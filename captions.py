@@ -0,0 +1,163 @@
+import functools
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+MAX_CHAR_COUNT = 25  # Maximum characters per caption group
+CAPTION_FONT_SIZE = 100
+CAPTION_COLOR = "white"
+CAPTION_STROKE_WIDTH = 3
+CAPTION_STROKE_COLOR = "black"
+CAPTION_CACHE_SIZE = 1024  # Distinct rasterized captions kept per process
+
+
+def group_captions(captions, max_chars=MAX_CHAR_COUNT):
+    """
+    Combine word captions into groups of at most max_chars characters.
+
+    Args:
+        captions (list): Word caption tuples (start_time, end_time, text)
+        max_chars (int): Maximum characters per group, including spaces
+
+    Returns:
+        list: Caption group tuples (start_time, end_time, text)
+    """
+    groups = []
+    current_text = ""
+    current_start = None
+    current_end = None
+
+    for start, end, text in captions:
+        # If we haven't started a new text group yet, initialize with this word
+        if current_text == "":
+            current_text = text
+            current_start = start
+            current_end = end
+        # If adding this word would keep us under the character limit, add it
+        elif len(current_text + " " + text) <= max_chars:
+            current_text += " " + text
+            current_end = end  # Update the end time to the end of the last word
+        # Otherwise, close the accumulated group and start a new one
+        else:
+            groups.append((current_start, current_end, current_text))
+            current_text = text
+            current_start = start
+            current_end = end
+
+    # Don't forget the last group of text if there is any
+    if current_text:
+        groups.append((current_start, current_end, current_text))
+
+    return groups
+
+
+@functools.lru_cache(maxsize=CAPTION_CACHE_SIZE)
+def render_caption(text, font_path=None, font_size=CAPTION_FONT_SIZE, color=CAPTION_COLOR,
+                   stroke_width=CAPTION_STROKE_WIDTH, stroke_color=CAPTION_STROKE_COLOR):
+    """
+    Rasterize a single-line caption into an RGBA buffer.
+
+    The layout matches MoviePy's TextClip with method="label", so captions
+    look the same as before. Results are cached per process, keyed by text
+    and style, and shared by every video rendered in it.
+
+    Returns:
+        numpy.ndarray: Read-only (height, width, 4) uint8 RGBA array
+    """
+    if font_path:
+        font = ImageFont.truetype(font_path, font_size)
+    else:
+        font = ImageFont.load_default(font_size)
+    ascent, descent = font.getmetrics()
+
+    measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), text, font=font, stroke_width=stroke_width, anchor="ls")
+    width = max(1, int(right - left))
+    # Same height rule as TextClip, which depends on the Pillow version
+    if hasattr(measure, "_multiline_spacing"):
+        height = ascent + descent + 2 * stroke_width
+    else:
+        height = max(1, int(bottom - top))
+
+    image = Image.new("RGBA", (width, height), color=(0, 0, 0, 0))
+    ImageDraw.Draw(image).multiline_text(
+        xy=(stroke_width, ascent + stroke_width),
+        text=text,
+        fill=color,
+        font=font,
+        stroke_width=stroke_width,
+        stroke_fill=stroke_color,
+        anchor="ls",
+    )
+
+    rgba = np.array(image)
+    rgba.setflags(write=False)
+    return rgba
+
+
+def alpha_blit(frame, rgba, x, y, opacity=1.0):
+    """
+    Alpha-blend an RGBA image onto an RGB frame in place.
+
+    Parts of the image outside the frame are clipped.
+
+    Args:
+        frame (numpy.ndarray): (height, width, 3) uint8 frame, modified in place
+        rgba (numpy.ndarray): (height, width, 4) uint8 image to draw
+        x (int): Left edge of the image in the frame
+        y (int): Top edge of the image in the frame
+        opacity (float): Extra opacity multiplier for the whole image
+
+    Returns:
+        numpy.ndarray: The frame
+    """
+    frame_height, frame_width = frame.shape[:2]
+    image_height, image_width = rgba.shape[:2]
+
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + image_width, frame_width)
+    bottom = min(y + image_height, frame_height)
+    if left >= right or top >= bottom:
+        return frame
+
+    source = rgba[top - y:bottom - y, left - x:right - x]
+    alpha = source[..., 3:4].astype(np.float32) * (opacity / 255.0)
+    target = frame[top:bottom, left:right]
+    blended = source[..., :3] * alpha + target * (1.0 - alpha)
+    target[...] = blended.astype(np.uint8)
+    return frame
+
+
+class CaptionTrack:
+    """
+    Timed caption groups drawn straight onto frames at a fixed height.
+
+    Each group is shown for start <= t < end, horizontally centered, with
+    its rasterized text taken from the render_caption cache.
+    """
+
+    def __init__(self, groups, frame_width, y, font_path=None, font_size=CAPTION_FONT_SIZE,
+                 stroke_width=CAPTION_STROKE_WIDTH):
+        self.groups = list(groups)
+        self.frame_width = frame_width
+        self.y = y
+        self.style = dict(font_path=font_path, font_size=font_size,
+                          stroke_width=stroke_width)
+        self.starts = np.array([start for start, _, _ in self.groups], dtype=np.float64)
+        self.ends = np.array([end for _, end, _ in self.groups], dtype=np.float64)
+
+    def active(self, t):
+        """Return the text of the caption group shown at time t, or None."""
+        index = int(np.searchsorted(self.starts, t, side="right")) - 1
+        if index < 0 or t >= self.ends[index]:
+            return None
+        return self.groups[index][2]
+
+    def draw(self, frame, t):
+        """Blit the caption shown at time t onto the frame in place."""
+        text = self.active(t)
+        if text is None:
+            return frame
+        rgba = render_caption(text, **self.style)
+        x = int((self.frame_width - rgba.shape[1]) / 2)
+        return alpha_blit(frame, rgba, x, self.y)
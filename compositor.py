@@ -0,0 +1,121 @@
+import numpy as np
+from PIL import Image
+from captions import alpha_blit
+
+
+def load_rgba(image_path, height):
+    """
+    Load an image as an RGBA array scaled to the given height.
+
+    The aspect ratio is kept and the same LANCZOS resampling is used, so the
+    result matches MoviePy's resized(height=...).
+    """
+    with Image.open(image_path) as image:
+        width = int(image.width * height / image.height)
+        image = image.convert("RGBA").resize(
+            (width, int(height)), Image.Resampling.LANCZOS)
+        return np.array(image)
+
+
+def resolve_position(position, frame_size, width, height):
+    """
+    Turn a MoviePy-style position such as ("center", "bottom") into the
+    top-left pixel (x, y) of a width x height image in the frame.
+    """
+    frame_width, frame_height = frame_size
+    horizontal, vertical = position
+    x = {"left": 0, "center": (frame_width - width) / 2,
+         "right": frame_width - width}.get(horizontal, horizontal)
+    y = {"top": 0, "center": (frame_height - height) / 2,
+         "bottom": frame_height - height}.get(vertical, vertical)
+    return int(x), int(y)
+
+
+class StaticImageLayer:
+    """
+    An image that stays put, apart from fading in from and out to black.
+
+    Matches MoviePy's FadeIn/FadeOut on an ImageClip: only the colors fade,
+    the image's own alpha is kept.
+    """
+
+    def __init__(self, rgba, x, y, duration, fade_in=0.0, fade_out=0.0):
+        self.rgba = rgba
+        self.x = x
+        self.y = y
+        self.duration = duration
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+
+    def static_range(self):
+        """Return the (start, end) time range in which the layer does not change."""
+        return self.fade_in, self.duration - self.fade_out
+
+    def _fading(self, t):
+        if t < self.fade_in:
+            return t / self.fade_in
+        if self.duration - t < self.fade_out:
+            return (self.duration - t) / self.fade_out
+        return 1.0
+
+    def draw(self, frame, t):
+        """Blit the layer as it looks at time t onto the frame in place."""
+        fading = self._fading(t)
+        rgba = self.rgba
+        if fading < 1.0:
+            rgba = rgba.copy()
+            rgba[..., :3] = (rgba[..., :3] * fading).astype(np.uint8)
+        return alpha_blit(frame, rgba, self.x, self.y)
+
+
+class ShortsCompositor:
+    """
+    Builds Shorts frames from a flat background, static layers and animated layers.
+
+    Static layers only change outside their static_range(). Within the time
+    range where all of them are static they are flattened once into a cached
+    base frame, so each frame only copies that base and draws the animated
+    layers (corgi, active caption) on top.
+    """
+
+    def __init__(self, size, duration, background_color, static_layers=(), dynamic_layers=()):
+        self.size = size
+        self.duration = duration
+        self.static_layers = list(static_layers)
+        self.dynamic_layers = list(dynamic_layers)
+
+        width, height = size
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[...] = background_color
+
+        ranges = [layer.static_range() for layer in self.static_layers]
+        self.static_start = max([start for start, _ in ranges], default=0.0)
+        self.static_end = min([end for _, end in ranges], default=duration)
+        self._base_frame = None
+
+    def base_frame(self, t):
+        """Return the background with all static layers drawn at time t."""
+        if self.static_start <= t < self.static_end:
+            if self._base_frame is None:
+                self._base_frame = self._compose_static(self.static_start)
+                self._base_frame.setflags(write=False)
+            return self._base_frame
+        return self._compose_static(t)
+
+    def _compose_static(self, t):
+        frame = self.background.copy()
+        for layer in self.static_layers:
+            layer.draw(frame, t)
+        return frame
+
+    def frame(self, t):
+        """Return the full RGB frame at time t."""
+        frame = self.base_frame(t).copy()
+        for layer in self.dynamic_layers:
+            layer.draw(frame, t)
+        return frame
+
+    def clip(self):
+        """Return a MoviePy VideoClip that renders with this compositor."""
+        from moviepy import VideoClip
+        return VideoClip(frame_function=self.frame, duration=self.duration)
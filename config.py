@@ -13,6 +13,7 @@ GOOGLE_APPLICATION_CREDENTIALS = os.getenv(
 GEMINI_KEY = os.environ.get('GEMINI_KEY')
 NVIDIA_KEY = os.environ.get('NVIDIA_KEY')
 MINIMAX_KEY = os.environ.get('MINIMAX_KEY')
+MINIMAX_API_BASE = os.getenv("MINIMAX_API_BASE", "https://api.minimaxi.chat")
 
 # Project Configuration
 PROJECT_ID = 'corgi-news'
@@ -22,12 +23,111 @@ LOCATION = 'us-central1'
 TRANSCRIPTION_DIR = "process_transcription"
 IMAGES_DIR = "images"
 ALIGNMENT_OUTPUT_DIR = "alignment_output"
+TRANSCRIBED_DIR = "transcribed"
+SCRATCH_DIR = "scratch"  # Per-run isolated working directories live here
+
+# Batch Configuration
+BATCH_MAX_WORKERS = 8  # Concurrency limit of each I/O-bound pipeline stage
+PIPELINE_PROCESS_WORKERS = os.cpu_count() or 1  # Process pool for CPU-bound stages
+PIPELINE_BATCH_WINDOW = 2.0  # Seconds the align stage waits to fill a batch
+
+# Cache Configuration
+CACHE_DIR = ".cache"
+TEXT_CACHE_TTL = 7 * 24 * 60 * 60  # Seconds a generated summary stays valid
+TEXT_CACHE_MAX_BYTES = 50 * 1024 * 1024
+TEXT_CACHE_MEMORY_ENTRIES = 256
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
 
 # Model Configuration
 ELEVEN_VOICE_ID = "JBFqnCBsd6RMkjVDRZzb"
 ELEVEN_MODEL_ID = "eleven_multilingual_v2"
 
+# Audio Profiles
+# Both ask ElevenLabs for full-band audio, which the render uses, and derive
+# the 16 kHz mono WAV that MFA needs from it with ffmpeg while it streams in.
+# "pcm" asks for raw 44.1 kHz PCM and keeps it losslessly as FLAC; "mp3" keeps the MP3.
+AUDIO_PROFILES = {
+    "pcm": {"output_format": "pcm_44100", "extension": "flac"},
+    "mp3": {"output_format": "mp3_44100_128", "extension": "mp3"},
+}
+AUDIO_PROFILE = os.getenv("AUDIO_PROFILE", "pcm")
+
+# Render Configuration
+# "moviepy" composites frames in Python; "ffmpeg" builds one ffmpeg filter graph
+RENDER_ENGINE = os.getenv("RENDER_ENGINE", "moviepy")
+# Render profiles: output resolution, frame rate and x264 settings. Layouts are
+# designed for 1080x1920 and drawn scaled to the profile's size. A crf replaces
+# the bitrate target; threads 0 lets x264 pick the thread count.
+RENDER_PROFILES = {
+    "final": {"size": (1080, 1920), "fps": 24, "codec": "libx264", "preset": "medium",
+              "bitrate": "5000k", "crf": None, "threads": 0},
+    "preview": {"size": (540, 960), "fps": 12, "codec": "libx264", "preset": "ultrafast",
+                "bitrate": None, "crf": 32, "threads": 0},
+}
+RENDER_PROFILE = os.getenv("RENDER_PROFILE", "final")
+# Parallel caption-aligned segments per MoviePy render, 1 renders in a single pass
+RENDER_SEGMENTS = int(os.getenv("RENDER_SEGMENTS", "1"))
+
+# Metrics Configuration
+# If set, the per-stage spans of every article and standalone render are
+# appended to this JSON-lines file. It is never rotated, so point it at a path
+# logrotate looks after for long-running services. If METRICS_PROMETHEUS_FILE
+# is set, the aggregated Prometheus text-format metrics are rewritten there
+# after each record.
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE", "")
+# Interface PrometheusExporter.serve binds to; set "0.0.0.0" to let other hosts scrape it
+METRICS_SERVE_HOST = os.getenv("METRICS_SERVE_HOST", "127.0.0.1")
+
+# Profiling Configuration
+# Comma-separated stages to profile ("all" for every one, "" for none), see
+# profiling.STAGE_NAMES. 1 in PROFILE_SAMPLE_RATE runs is profiled; the
+# profiles go to the run's transcribed/<filename>/profiles/ folder, or to
+# PROFILE_DIR for stages called outside of a pipeline run. PROFILER is
+# "cprofile" (.prof files for pstats/snakeviz, plus the same profile as
+# collapsed stacks for flame graphs) or "sampling" (collapsed stacks only,
+# with much less overhead).
+PROFILE_STAGES = os.getenv("PROFILE_STAGES", "")
+PROFILER = os.getenv("PROFILER", "cprofile")
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# MiniMax Video Generation Configuration
+MINIMAX_MODEL = os.getenv("MINIMAX_MODEL", "T2V-01")
+VIDEOS_DIR = os.getenv("VIDEOS_DIR", "videos")
+MINIMAX_MAX_CONNECTIONS = int(os.getenv("MINIMAX_MAX_CONNECTIONS", "16"))
+# Poll interval per task status as (first, longest) seconds. The interval
+# grows by MINIMAX_POLL_BACKOFF while a task keeps its status and starts
+# over when it changes, so queued tasks are polled rarely and running ones
+# are noticed soon after they finish.
+MINIMAX_POLL_INTERVALS = {
+    "Preparing": (2.0, 10.0),
+    "Queueing": (10.0, 60.0),
+    "Processing": (2.0, 8.0),
+}
+MINIMAX_POLL_BACKOFF = 1.5
+MINIMAX_TASK_TIMEOUT = int(os.getenv("MINIMAX_TASK_TIMEOUT", "1800"))  # Seconds per task
+MINIMAX_DOWNLOAD_RETRIES = 5  # Resumed attempts after a dropped download
+
 # MFA Configuration
 MFA_CONDA_ENV = "aligner"
 MFA_DICTIONARY = "english_us_arpa"
 MFA_ACOUSTIC_MODEL = "english_us_arpa"
+MFA_NUM_JOBS = os.cpu_count() or 1  # Parallel jobs for corpus-level alignment
+MFA_BATCH_SIZE = 16  # Runs gathered into one corpus before calling `mfa align`
+
+# Alignment Service Configuration
+# "service" sends jobs to a running aligner_service.py and falls back to a
+# one-off `mfa align` subprocess when it is not reachable; "mfa" always spawns;
+# "heuristic" estimates word timings from the audio without MFA (previews).
+ALIGNMENT_BACKEND = os.getenv("ALIGNMENT_BACKEND", "service")
+ALIGNER_SERVICE_HOST = "127.0.0.1"
+ALIGNER_SERVICE_PORT = int(os.getenv("ALIGNER_SERVICE_PORT", "6011"))
+# The service unpickles what clients send, so it only accepts clients that
+# know its secret. Unless ALIGNER_SERVICE_AUTHKEY is set, the service makes
+# a random one at startup and writes it to ALIGNER_SERVICE_KEY_FILE, readable
+# only by the user running it, where clients read it from.
+ALIGNER_SERVICE_AUTHKEY = os.getenv("ALIGNER_SERVICE_AUTHKEY", "")
+ALIGNER_SERVICE_KEY_FILE = os.getenv(
+    "ALIGNER_SERVICE_KEY_FILE", os.path.expanduser("~/.corgi-news/aligner_service.key"))
+ALIGNER_SERVICE_DIR = "aligner_service"  # Persistent MFA temp/work directory
@@ -0,0 +1,210 @@
+import os
+import shutil
+import logging
+import tempfile
+import subprocess
+from PIL import ImageFont
+from config import RENDER_PROFILES
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('ffmpeg_render')
+
+CAPTION_FALLBACK_FONT = "DejaVu Sans"  # Used by libass when no font file is given
+
+
+def _ass_time(seconds):
+    """Format seconds as an ASS timestamp, H:MM:SS.cc"""
+    centiseconds = int(round(max(seconds, 0) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def _ass_text(text):
+    """Escape caption text so libass does not read it as override tags."""
+    return (text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}")
+            .replace("\n", "\\N"))
+
+
+def write_ass(groups, ass_path, frame_size, y, font_name, font_size, stroke_width):
+    """
+    Write caption groups as an ASS subtitle file.
+
+    Captions are white with a black outline, horizontally centered, with the
+    top of the text y pixels from the top of the frame.
+
+    Args:
+        groups (list): Caption group tuples (start_time, end_time, text)
+        ass_path (str): Path to write the .ass file to
+        frame_size (tuple): (width, height) of the video
+        y (int): Distance from the top of the frame to the top of the captions
+        font_name (str): Font family name as known to libass
+        font_size (int): Font size in pixels
+        stroke_width (int): Outline width in pixels
+
+    Returns:
+        str: The path of the .ass file
+    """
+    width, height = frame_size
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "ScaledBorderAndShadow: yes",
+        "WrapStyle: 2",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, "
+        "BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, "
+        "BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Caption,{font_name},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,"
+        f"&H00000000,0,0,0,0,100,100,0,0,1,{stroke_width},0,8,0,0,{y},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for start, end, text in groups:
+        lines.append(f"Dialogue: 0,{_ass_time(start)},{_ass_time(end)},Caption,,0,0,0,,"
+                     f"{_ass_text(text)}")
+
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return ass_path
+
+
+def _font_family(font_path):
+    """Family name of a font file, for referring to it from the ASS style."""
+    if font_path:
+        try:
+            return ImageFont.truetype(font_path, 10).getname()[0]
+        except OSError as e:
+            logger.warning(f"Could not read font {font_path}: {str(e)}")
+    return CAPTION_FALLBACK_FONT
+
+
+def encoder_args(encoding):
+    """
+    ffmpeg output options for the video encoder settings of a render profile.
+
+    Args:
+        encoding (dict): Profile settings with "codec" and optional "preset",
+                         "bitrate", "crf" and "threads"
+
+    Returns:
+        list: ffmpeg command-line arguments
+    """
+    args = ["-c:v", encoding["codec"]]
+    if encoding.get("preset"):
+        args += ["-preset", encoding["preset"]]
+    if encoding.get("crf") is not None:
+        args += ["-crf", str(encoding["crf"])]
+    elif encoding.get("bitrate"):
+        args += ["-b:v", encoding["bitrate"]]
+    if encoding.get("threads") is not None:
+        args += ["-threads", str(encoding["threads"])]
+    return args + ["-pix_fmt", "yuv420p"]
+
+
+def build_filter_graph(duration, audio_duration, fps, trend_y, trend_height, fade_duration,
+                       corgi_initial_height, corgi_final_height, corgi_grow_duration,
+                       subtitles_name, fonts_dir=None):
+    """
+    Build the filter_complex that lays out a Shorts video.
+
+    Inputs are expected in the order background color, trend image, corgi
+    animation and audio. The graph scales the trend image once, loops that
+    frame and fades it onto the background, overlays the growing corgi
+    bottom-centered and burns in the captions from the subtitle file. The corgi is resampled to the output
+    frame rate and split in two: only the grow-in is scaled per frame, the
+    rest is scaled once to its final height and overlaid from then on. The
+    audio is resampled to 44.1 kHz stereo for the AAC encoder.
+
+    Returns:
+        str: The filter graph, with video output [video] and audio output [audio]
+    """
+    grow_height = (f"if(gt(t,{corgi_grow_duration}),{corgi_final_height},"
+                   f"trunc({corgi_initial_height}+t/{corgi_grow_duration}"
+                   f"*{corgi_final_height - corgi_initial_height}))")
+
+    subtitles = f"subtitles=filename={subtitles_name}"
+    if fonts_dir:
+        subtitles += f":fontsdir={fonts_dir}"
+
+    return ";".join([
+        # The image is decoded and scaled once, then repeated as a stream at the
+        # output frame rate. Fade in RGB so it fades from and to black, like
+        # MoviePy's FadeIn/FadeOut
+        f"[1:v]scale=-1:{trend_height}:flags=lanczos,format=rgb24,"
+        f"loop=loop=-1:size=1,settb=AVTB,setpts=N/{fps}/TB,trim=duration={duration:.6f},"
+        f"fade=t=in:st=0:d={fade_duration},"
+        f"fade=t=out:st={duration - fade_duration:.6f}:d={fade_duration}[trend]",
+        f"[0:v][trend]overlay=x='trunc((W-w)/2)':y={trend_y}:eof_action=pass[base]",
+        f"[2:v]fps={fps},format=rgba,split[corgi_grow][corgi_rest]",
+        f"[corgi_grow]trim=end={corgi_grow_duration},"
+        f"scale=w='trunc({grow_height}*iw/ih)':h='{grow_height}':eval=frame:flags=lanczos[grow]",
+        f"[corgi_rest]trim=start={corgi_grow_duration},"
+        f"scale=w='trunc({corgi_final_height}*iw/ih)':h={corgi_final_height}:flags=lanczos[corgi]",
+        "[base][grow]overlay=x='trunc((W-w)/2)':y='H-h':eval=frame:eof_action=pass[growing]",
+        "[growing][corgi]overlay=x='trunc((W-w)/2)':y='H-h':shortest=0:eof_action=pass,"
+        f"{subtitles},trim=duration={duration:.6f},format=yuv420p[video]",
+        f"[3:a]apad,atrim=0:{audio_duration:.6f}[audio]",
+    ])
+
+
+def render_ffmpeg(output_path, frame_size, duration, background_color, image_path,
+                  trend_y, trend_height, fade_duration, corgi_path,
+                  corgi_initial_height, corgi_final_height, corgi_grow_duration, audio_path,
+                  caption_groups, caption_y, font_path=None, font_size=100, stroke_width=3,
+                  fps=24, encoding=RENDER_PROFILES["final"], audio_duration=None):
+    """
+    Render a Shorts video with a single ffmpeg filter graph.
+
+    All compositing happens inside ffmpeg, with captions burned in from an
+    ASS file, so no Python code runs per frame. The audio is cut or padded
+    with silence to audio_duration, which defaults to the video duration.
+    encoding holds the encoder settings of a render profile (see encoder_args).
+
+    Returns:
+        str: Path to the created video file
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg fails
+    """
+    ffmpeg = os.environ.get("IMAGEIO_FFMPEG_EXE", "ffmpeg")
+    width, height = frame_size
+    color = "0x{:02x}{:02x}{:02x}".format(*background_color)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        write_ass(caption_groups, os.path.join(work_dir, "captions.ass"), frame_size,
+                  caption_y, _font_family(font_path), font_size, stroke_width)
+        fonts_dir = None
+        if font_path:
+            fonts_dir = "fonts"
+            os.makedirs(os.path.join(work_dir, fonts_dir))
+            shutil.copy(font_path, os.path.join(work_dir, fonts_dir))
+
+        command = [
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"color=c={color}:s={width}x{height}:r={fps}:d={duration:.6f}",
+            "-i", os.path.abspath(image_path),
+            "-stream_loop", "-1", "-i", os.path.abspath(corgi_path),
+            "-i", os.path.abspath(audio_path),
+            "-filter_complex", build_filter_graph(
+                duration, audio_duration or duration, fps, trend_y, trend_height, fade_duration,
+                corgi_initial_height, corgi_final_height, corgi_grow_duration,
+                "captions.ass", fonts_dir),
+            "-map", "[video]", "-map", "[audio]", "-r", str(fps),
+            *encoder_args(encoding),
+            "-c:a", "aac", "-ar", "44100", "-ac", "2",
+            os.path.abspath(output_path),
+        ]
+        # Run from the work dir so the subtitle and font paths need no filter-graph escaping
+        process = subprocess.run(command, cwd=work_dir, capture_output=True)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, ffmpeg, stderr=process.stderr)
+    return output_path
@@ -0,0 +1,254 @@
+import os
+import re
+import wave
+import logging
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('heuristic_aligner')
+
+FRAME_SECONDS = 0.01  # Energy envelope resolution
+SMOOTHING_FRAMES = 5  # Moving average over the envelope, bridges stop consonants
+DYNAMIC_RANGE_DB = 35  # Frames this far below the loudest frame count as silence
+NOISE_MARGIN_DB = 8  # Frames must also be this far above the noise floor
+PAUSE_SNAP_SECONDS = 0.25  # Word boundaries this close to a pause move onto it
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+_VOWEL_GROUP_PATTERN = re.compile(r"[aeiouy]+")
+
+
+def read_wav(wav_path):
+    """
+    Read a PCM WAV file into a mono float array.
+
+    Args:
+        wav_path (str): Path to the WAV file
+
+    Returns:
+        tuple: (samples as float32 in [-1, 1], sample rate)
+    """
+    with wave.open(wav_path, "rb") as wav_file:
+        sample_rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        frames = wav_file.readframes(wav_file.getnframes())
+
+    if sample_width != 2:
+        raise ValueError(
+            f"Only 16-bit PCM WAV files are supported, got {8 * sample_width}-bit")
+
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def tokenize_transcript(transcript):
+    """Split a transcript into lowercase words, the way MFA labels its word tier."""
+    return _WORD_PATTERN.findall(transcript.lower())
+
+
+def _word_weights(words):
+    """Relative spoken length of each word from its vowel groups and letter count."""
+    syllables = np.array([max(1, len(_VOWEL_GROUP_PATTERN.findall(word)))
+                          for word in words], dtype=np.float64)
+    letters = np.array([len(word) for word in words], dtype=np.float64)
+    return syllables + 0.1 * letters
+
+
+def _voiced_frames(samples, sample_rate):
+    """Boolean voice-activity mask over FRAME_SECONDS frames."""
+    frame_length = max(1, int(sample_rate * FRAME_SECONDS))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    kernel = np.ones(SMOOTHING_FRAMES) / SMOOTHING_FRAMES
+    rms = np.convolve(rms, kernel, mode="same")
+    level_db = 20 * np.log10(rms + 1e-9)
+
+    threshold = max(level_db.max() - DYNAMIC_RANGE_DB,
+                    np.percentile(level_db, 10) + NOISE_MARGIN_DB)
+    return level_db > threshold
+
+
+def _snap_to_pauses(targets, voiced, voiced_time):
+    """Move the interior word boundary nearest to each pause onto it, in place."""
+    if len(targets) < 3:
+        return
+
+    # Speech time at which each pause occurs (start of every later voiced run)
+    onsets = np.flatnonzero(voiced[1:] & ~voiced[:-1]) + 1
+    pauses = voiced_time[onsets - 1]
+    if not len(pauses):
+        return
+
+    interior = targets[1:-1]
+    nearest = np.clip(np.searchsorted(interior, pauses), 1, len(interior) - 1)
+    left_closer = (pauses - interior[nearest - 1]) < (interior[nearest] - pauses)
+    nearest = np.where(left_closer, nearest - 1, nearest)
+    if len(interior) == 1:
+        nearest = np.zeros_like(nearest)
+
+    close = np.abs(interior[nearest] - pauses) <= PAUSE_SNAP_SECONDS
+    snapped = interior.copy()
+    snapped[nearest[close]] = pauses[close]
+
+    # Keep boundaries strictly ordered, so no word collapses to nothing
+    if np.all(np.diff(np.concatenate(([targets[0]], snapped, [targets[-1]]))) > 0):
+        targets[1:-1] = snapped
+
+
+def estimate_word_timings(wav_path, transcript):
+    """
+    Estimate word start/end times from the audio energy envelope, without MFA.
+
+    Speech time (frames the voice-activity mask marks as voiced) is divided
+    between the words in proportion to their estimated length, then mapped
+    back to clock time. The word boundary nearest to each pause is moved
+    onto it, so pauses in the audio fall between words.
+
+    Args:
+        wav_path (str): Path to the 16-bit PCM WAV file
+        transcript (str): Text spoken in the audio
+
+    Returns:
+        list: List of caption tuples (start_time, end_time, text)
+    """
+    words = tokenize_transcript(transcript)
+    if not words:
+        return []
+
+    samples, sample_rate = read_wav(wav_path)
+    duration = len(samples) / sample_rate
+    voiced = _voiced_frames(samples, sample_rate)
+
+    weights = _word_weights(words)
+    boundaries = np.concatenate(([0.0], np.cumsum(weights) / weights.sum()))
+
+    if not voiced.any():
+        # No detectable speech, spread the words over the whole file
+        times = boundaries * duration
+        starts, ends = times[:-1], times[1:]
+    else:
+        voiced_time = np.cumsum(voiced) * FRAME_SECONDS
+        targets = boundaries * voiced_time[-1]
+        _snap_to_pauses(targets, voiced, voiced_time)
+        # First voiced frame after each word's share begins, and the frame
+        # in which its share is used up
+        start_frames = np.searchsorted(voiced_time, targets[:-1], side="right")
+        end_frames = np.searchsorted(voiced_time, targets[1:], side="left")
+        starts = start_frames * FRAME_SECONDS
+        ends = (end_frames + 1) * FRAME_SECONDS
+        ends[:-1] = np.minimum(ends[:-1], starts[1:])
+        ends = np.minimum(np.maximum(ends, starts + FRAME_SECONDS), duration)
+
+    return [(round(float(start), 3), round(float(end), 3), word)
+            for start, end, word in zip(starts, ends, words)]
+
+
+def write_textgrid(textgrid_path, captions, duration):
+    """
+    Write word timings as a long-format TextGrid with MFA's tier layout.
+
+    Gaps between words are filled with empty intervals, and an empty
+    "phones" tier is written after the "words" tier.
+
+    Args:
+        textgrid_path (str): Path of the TextGrid to write
+        captions (list): Caption tuples (start_time, end_time, text)
+        duration (float): Total duration of the audio in seconds
+    """
+    intervals = []
+    cursor = 0.0
+    for start, end, text in captions:
+        if start > cursor:
+            intervals.append((cursor, start, ""))
+        intervals.append((start, end, text))
+        cursor = end
+    if cursor < duration:
+        intervals.append((cursor, duration, ""))
+
+    lines = [
+        'File type = "ooTextFile"',
+        'Object class = "TextGrid"',
+        "",
+        "xmin = 0",
+        f"xmax = {duration}",
+        "tiers? <exists>",
+        "size = 2",
+        "item []:",
+    ]
+    for index, (name, tier_intervals) in enumerate(
+            [("words", intervals), ("phones", [(0.0, duration, "")])], start=1):
+        lines += [
+            f"    item [{index}]:",
+            '        class = "IntervalTier"',
+            f'        name = "{name}"',
+            "        xmin = 0",
+            f"        xmax = {duration}",
+            f"        intervals: size = {len(tier_intervals)}",
+        ]
+        for number, (start, end, text) in enumerate(tier_intervals, start=1):
+            text = text.replace('"', '""')
+            lines += [
+                f"        intervals [{number}]:",
+                f"            xmin = {start}",
+                f"            xmax = {end}",
+                f'            text = "{text}"',
+            ]
+
+    with open(textgrid_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def align_text_heuristic(input_path, output_path):
+    """
+    Write estimated TextGrids for every txt/wav pair in a directory.
+
+    A drop-in replacement for align_text_mfa when speed matters more than
+    accuracy, e.g. for draft and preview renders.
+
+    Args:
+        input_path (str): Path to the directory containing text and audio files
+        output_path (str): Directory to write the TextGrid files into
+
+    Returns:
+        bool: True if at least one pair was aligned and none failed
+    """
+    os.makedirs(output_path, exist_ok=True)
+    aligned = 0
+
+    try:
+        for file in sorted(os.listdir(input_path)):
+            stem, extension = os.path.splitext(file)
+            wav_path = os.path.join(input_path, f"{stem}.wav")
+            if extension != ".txt" or not os.path.exists(wav_path):
+                continue
+
+            with open(os.path.join(input_path, file), "r", encoding="utf-8") as f:
+                transcript = f.read()
+
+            captions = estimate_word_timings(wav_path, transcript)
+            with wave.open(wav_path, "rb") as wav_file:
+                duration = wav_file.getnframes() / wav_file.getframerate()
+
+            write_textgrid(os.path.join(output_path, f"{stem}.TextGrid"),
+                           captions, duration)
+            aligned += 1
+
+        if not aligned:
+            logger.warning(f"No txt/wav pairs found in {input_path}")
+            return False
+
+        logger.info(
+            f"✅ Heuristic alignment of {aligned} files saved in {output_path}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error during heuristic alignment: {str(e)}")
+        return False
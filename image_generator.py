@@ -62,9 +62,9 @@ import os
 import time
 import logging
 import ssl
-import grpc
-from google.api_core.exceptions import GoogleAPIError, RetryError, ServiceUnavailable
-from vertexai.preview.vision_models import ImageGenerationModel
+import threading
+from metrics import span
+from profiling import profiled
 from config import GOOGLE_APPLICATION_CREDENTIALS, PROJECT_ID, LOCATION, IMAGES_DIR
 
 # Set up logging
@@ -72,8 +72,74 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('image_generator')
 
+IMAGE_MODEL_NAME = "imagen-3.0-generate-002"
 
-def generate_image(img_prompt, filename=None, max_retries=1, retry_delay=2):
+
+class ImageModelPool:
+    """
+    Process-wide, thread-safe cache of Vertex AI image model handles.
+
+    Vertex AI is initialized once, on first use, and each model handle (with
+    its underlying channel) is shared by every call and retry attempt. A handle
+    is only rebuilt after a transport-level failure has marked it unhealthy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._models = {}
+
+    def _init_vertexai(self):
+        """Authenticate and initialize Vertex AI, once per process."""
+        if self._initialized:
+            return
+        # Set environment variable for authentication
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
+        from vertexai import init
+        init(project=PROJECT_ID, location=LOCATION)
+        self._initialized = True
+        logger.info("Initialized Vertex AI")
+
+    def get(self, model_name=IMAGE_MODEL_NAME):
+        """
+        Return a healthy handle for the model, creating it if needed.
+
+        Args:
+            model_name (str): Name of the pretrained image model
+
+        Returns:
+            ImageGenerationModel: The shared model handle
+        """
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                self._init_vertexai()
+                from vertexai.preview.vision_models import ImageGenerationModel
+                model = ImageGenerationModel.from_pretrained(model_name)
+                self._models[model_name] = model
+                logger.info(f"Loaded image model {model_name}")
+            return model
+
+    def invalidate(self, model, model_name=IMAGE_MODEL_NAME):
+        """
+        Mark a handle unhealthy after a transport error, so the next get() rebuilds it.
+
+        Only the given handle is dropped; if another thread already replaced
+        it, the newer handle is kept.
+        """
+        with self._lock:
+            if self._models.get(model_name) is model:
+                del self._models[model_name]
+                logger.warning(
+                    f"Dropped image model handle for {model_name} after a transport error")
+
+
+image_model_pool = ImageModelPool()
+
+
+@profiled("generate_image")
+def generate_image(img_prompt, filename=None, max_retries=1, retry_delay=2,
+                   output_dir=IMAGES_DIR):
     """
     Generate an image from the img_prompt using Vertex AI with enhanced error handling.
 
@@ -82,10 +148,15 @@ def generate_image(img_prompt, filename=None, max_retries=1, retry_delay=2):
         filename (str, optional): Filename to save the image. If None, a timestamp will be used.
         max_retries (int): Maximum number of retry attempts for transient errors
         retry_delay (int): Seconds to wait between retry attempts
+        output_dir (str): Directory to save the generated image into
 
     Returns:
         dict: A dictionary containing image bytes and file path or error details
     """
+    # Imported on first use, the Google client libraries are slow to load
+    import grpc
+    from google.api_core.exceptions import GoogleAPIError, ServiceUnavailable
+
     results = {}
     logger.info(f"Generating image from prompt: {img_prompt[:100]}...")
 
@@ -94,31 +165,26 @@ def generate_image(img_prompt, filename=None, max_retries=1, retry_delay=2):
         filename = str(int(time.time()))
 
     # Ensure the images directory exists
-    os.makedirs(IMAGES_DIR, exist_ok=True)
-    image_filepath = os.path.join(IMAGES_DIR, f"{filename}.png")
-
-    # Set environment variable for authentication
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
+    os.makedirs(output_dir, exist_ok=True)
+    image_filepath = os.path.join(output_dir, f"{filename}.png")
 
     for attempt in range(max_retries):
+        image_model = None
         try:
-            # Initialize Vertex AI for this attempt
-            from vertexai import init
-            init(project=PROJECT_ID, location=LOCATION)
-
-            # Create a fresh model instance for each attempt
-            image_model = ImageGenerationModel.from_pretrained(
-                "imagen-3.0-generate-002")
-
-            # Generate images from Vertex AI
-            response = image_model.generate_images(
-                prompt=img_prompt,
-                number_of_images=1,
-                language="en",
-                aspect_ratio="1:1",
-                safety_filter_level="block_some",
-                person_generation="allow_adult",
-            )
+            # Reuse the process-wide model handle
+            image_model = image_model_pool.get()
+
+            # Generate images from Vertex AI, one span per attempt
+            with span("vertex.generate_image", model=IMAGE_MODEL_NAME,
+                      characters=len(img_prompt), retry=int(attempt > 0)):
+                response = image_model.generate_images(
+                    prompt=img_prompt,
+                    number_of_images=1,
+                    language="en",
+                    aspect_ratio="1:1",
+                    safety_filter_level="block_some",
+                    person_generation="allow_adult",
+                )
 
             if not response or not response.images:
                 raise ValueError("Received empty response from Vertex AI")
@@ -147,6 +213,8 @@ def generate_image(img_prompt, filename=None, max_retries=1, retry_delay=2):
             logger.error(error_msg)
             results["error"] = error_msg
             results["error_type"] = "ssl_error"
+            if image_model is not None:
+                image_model_pool.invalidate(image_model)
 
             # SSL errors might be temporary, worth retrying
             time.sleep(retry_delay)
@@ -156,6 +224,8 @@ def generate_image(img_prompt, filename=None, max_retries=1, retry_delay=2):
             logger.error(error_msg)
             results["error"] = error_msg
             results["error_type"] = "network_error"
+            if image_model is not None:
+                image_model_pool.invalidate(image_model)
 
             # Network errors are good candidates for retry
             time.sleep(retry_delay)
@@ -1,211 +1,301 @@
-import threading
-import os
-import shutil
+import time
 import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from text_generator import TextGenerator
 from audio_generator import generate_audio
 from image_generator import generate_image
-from text_aligner import align_text_mfa
-from utils import generate_timestamp_filename, encode_to_base64
-from config import TRANSCRIPTION_DIR, ALIGNMENT_OUTPUT_DIR, IMAGES_DIR
+from text_aligner import align_runs
+from pipeline import Pipeline, Stage
+from artifacts import ArtifactStore, ArticleResult
+from metrics import summarize, record
+import profiling
+from profiling import sample_run, run_context
+from utils import generate_timestamp_filename, run_sync
+from config import (BATCH_MAX_WORKERS, MFA_BATCH_SIZE, PIPELINE_PROCESS_WORKERS,
+                    PIPELINE_BATCH_WINDOW)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('article_processor')
 
+# Shared by every pipeline run in the process, created on first use
+_process_pool = None
+_process_pool_lock = threading.Lock()
 
-def process_article(article_text):
-    """
-    Process an article by generating a summary, audio, and image.
-    Then align the text with the audio and move all processed files to archive.
 
-    Args:
-        article_text (str): The full article text to process
+def _get_process_pool():
+    """Return the process-wide pool for CPU-bound and batch stages, creating it on first use."""
+    global _process_pool
+    with _process_pool_lock:
+        # A pool whose worker died stays broken, replace it
+        if _process_pool is None or getattr(_process_pool, "_broken", False):
+            # Workers get this process's profiling settings, whatever their start method
+            _process_pool = ProcessPoolExecutor(max_workers=PIPELINE_PROCESS_WORKERS,
+                                                initializer=profiling.configure,
+                                                initargs=profiling.settings())
+        return _process_pool
+
+
+def _new_run(include_base64=True):
+    """
+    Create the identifiers and artifact store for one article.
 
     Returns:
-        dict: A dictionary containing the processing results
+        dict: The run's filename, the artifact store its stages write into,
+              whether its stages are profiled (see profiling.sample_run) and
+              whether base64 copies of its audio and image are returned
     """
     # Generate a unique filename for this processing run
     filename = generate_timestamp_filename()
+    return {
+        "filename": filename,
+        "artifacts": ArtifactStore(filename),
+        "profile": sample_run(),
+        "include_base64": include_base64,
+    }
 
-    # Create transcribed directory if it doesn't exist
-    transcribed_dir = "transcribed"
-    os.makedirs(transcribed_dir, exist_ok=True)
-
-    logger.info(f"Starting article processing with filename: {filename}")
 
-    # Create text generator instance
-    text_generator = TextGenerator()
+def _profile_dirs(*runs):
+    """Directories that profiles of the given runs' stages are written to."""
+    return [run["artifacts"].dir for run in runs if run["profile"]]
 
-    # Generate content (summary and picture ideas)
-    generation_result = text_generator.generate_content(article_text)
-    summary = generation_result.summary
-    picture_ideas = generation_result.picture_ideas
 
-    if not summary:
-        logger.error("Summary generation failed")
-        return {"error": "Summary generation failed"}
+# Pipeline stages. Each is called with the run and the results of its deps.
 
-    # Dictionary to store results from both threads
-    results = {
-        "summary": summary,
-        "picture_ideas": [idea.description for idea in picture_ideas]
+def _text_stage(run, article):
+    """Generate the summary and picture ideas."""
+    with run_context(_profile_dirs(run)):
+        generation_result = TextGenerator().generate_content(article)
+    if not generation_result.summary:
+        raise ValueError("Summary generation failed")
+    return {
+        "summary": generation_result.summary,
+        "picture_ideas": [idea.description for idea in generation_result.picture_ideas]
     }
 
-    # Process audio and image generation concurrently
-    threads = []
 
-    audio_thread = threading.Thread(
-        target=lambda: results.update(
-            {"audio_results": generate_audio(summary, filename)})
-    )
+# Media bytes the generators return; later stages and results use the files instead
+_AUDIO_BLOBS = ("audio", "pcm")
+_IMAGE_BLOBS = ("image",)
 
-    # Use the first picture idea for image generation if available
-    image_prompt = picture_ideas[0].description if picture_ideas else summary
 
-    image_thread = threading.Thread(
-        target=lambda: results.update(
-            {"image_results": generate_image(image_prompt, filename)})
-    )
+def _audio_stage(run, text):
+    """Generate the narration audio into the run's directory."""
+    with run_context(_profile_dirs(run)):
+        audio = generate_audio(text["summary"], run["filename"],
+                               output_dir=run["artifacts"].dir)
+    return {key: value for key, value in audio.items() if key not in _AUDIO_BLOBS}
 
-    threads.append(audio_thread)
-    threads.append(image_thread)
 
-    # Start all threads
-    for thread in threads:
-        thread.start()
+def _image_stage(run, text):
+    """Generate the article image into the run's directory."""
+    # Use the first picture idea for image generation if available
+    image_prompt = text["picture_ideas"][0] if text["picture_ideas"] else text["summary"]
+    with run_context(_profile_dirs(run)):
+        image = generate_image(image_prompt, run["filename"],
+                               output_dir=run["artifacts"].dir)
+    return {key: value for key, value in image.items() if key not in _IMAGE_BLOBS}
+
+
+def _align_stage(jobs):
+    """Align a batch of runs with one aligner invocation."""
+    # The aligners only read each run's .txt/.wav pairs from its directory
+    runs = [(run["artifacts"].dir, run["artifacts"].alignment_dir)
+            for run, _ in jobs]
+    # One profile of the batch's aligner call goes to every sampled run
+    try:
+        with run_context(_profile_dirs(*[run for run, _ in jobs])):
+            status = align_runs(runs)
+    except Exception as e:
+        # A failed alignment must not cost the runs their other results
+        logger.error(f"Alignment of {len(runs)} runs failed: {str(e)}")
+        status = {}
+    return [status.get(run["artifacts"].alignment_dir, False) for run, _ in jobs]
+
+
+def _archive_stage(run, text, audio, image, align):
+    """
+    Collect the stage results of the run and the files its stages wrote
+    into transcribed/<filename>/.
 
-    # Wait for all threads to complete
-    for thread in threads:
-        thread.join()
+    Returns:
+        ArticleResult: The run's results
+    """
+    artifacts = run["artifacts"]
+    results = ArticleResult(include_base64=run["include_base64"], **text)
+    results["audio_results"] = audio
+    results["image_results"] = image
 
     # Check for errors
-    if "error" in results.get("audio_results", {}) or "error" in results.get("image_results", {}):
+    if "error" in audio or "error" in image:
         results["status"] = "partial_success"
         logger.warning("Some components failed during processing")
     else:
         results["status"] = "success"
         logger.info("All components processed successfully")
 
-    # Run MFA alignment
-    logger.info("Starting text-audio alignment with MFA")
-    alignment_success = align_text_mfa(input_path=TRANSCRIPTION_DIR)
-    results["alignment_success"] = alignment_success
+    results["alignment_success"] = align
+    results["filename"] = run["filename"]
+    results["transcribed_dir"] = artifacts.dir
+    # Kept under its old name: the files are written in place, nothing is moved
+    results["moved_files"] = artifacts.listing()
+    return results
 
-    # Create a subdirectory with the filename to keep files organized
-    destination_dir = os.path.join(transcribed_dir, filename)
-    os.makedirs(destination_dir, exist_ok=True)
 
-    # Dictionary to track moved files
-    moved_files = {
-        "transcription": [],
-        "alignment": [],
-        "image": []
-    }
+def _render_stage(run):
+    """Render the short for an archived run."""
+    from movie import create_shorts_video
+    with run_context(_profile_dirs(run)):
+        video_path = create_shorts_video(run["artifacts"].dir)
+    if video_path is None:
+        raise RuntimeError("Video rendering failed")
+    return video_path
+
+
+def build_article_pipeline(max_workers=BATCH_MAX_WORKERS, align_batch_size=MFA_BATCH_SIZE,
+                           render=False):
+    """
+    Build the article stage graph: text -> {audio, image} -> align -> archive -> render.
+
+    Args:
+        max_workers (int): Concurrency limit of each I/O-bound stage
+        align_batch_size (int): Maximum number of runs aligned in one aligner call
+        render (bool): Whether to render the short video as the last stage
+
+    Returns:
+        Pipeline: The article pipeline
+    """
+    stages = [
+        Stage("text", _text_stage, deps=("article",), concurrency=max_workers),
+        Stage("audio", _audio_stage, deps=("text",), concurrency=max_workers),
+        Stage("image", _image_stage, deps=("text",), concurrency=max_workers),
+        Stage("align", _align_stage, after=("audio",), kind="batch",
+              batch_size=align_batch_size, batch_window=PIPELINE_BATCH_WINDOW),
+        Stage("archive", _archive_stage, deps=("text", "audio", "image", "align"),
+              concurrency=max_workers),
+    ]
+    if render:
+        stages.append(Stage("render", _render_stage, after=("archive",), kind="cpu"))
+    return Pipeline(stages, process_workers=PIPELINE_PROCESS_WORKERS)
+
+
+def _collect_results(run, outcome, render):
+    """Turn one run's stage outcomes into the process_article result."""
+    metrics = summarize(outcome["spans"])
+    if isinstance(outcome["text"], Exception):
+        logger.error("Summary generation failed")
+        return ArticleResult(error="Summary generation failed", metrics=metrics)
+
+    results = outcome["archive"]
+    if isinstance(results, Exception):
+        return ArticleResult(error=str(results), status="failed", filename=run["filename"],
+                             metrics=metrics)
+
+    if render:
+        if isinstance(outcome["render"], Exception):
+            results["render_error"] = str(outcome["render"])
+        else:
+            results["video_path"] = outcome["render"]
+    results["metrics"] = metrics
+    return results
+
 
-    # 1. Move contents from transcription directory
-    if os.path.exists(TRANSCRIPTION_DIR) and os.path.isdir(TRANSCRIPTION_DIR):
-        try:
-            # Get list of files in the transcription directory
-            files = os.listdir(TRANSCRIPTION_DIR)
-
-            if files:
-                logger.info(
-                    f"Moving {len(files)} files from {TRANSCRIPTION_DIR} to {destination_dir}")
-
-                for file in files:
-                    source_path = os.path.join(TRANSCRIPTION_DIR, file)
-                    destination_path = os.path.join(destination_dir, file)
-
-                    # Move the file (shutil.move handles both files and directories)
-                    shutil.move(source_path, destination_path)
-                    moved_files["transcription"].append(file)
-
-                logger.info(
-                    f"Successfully moved all transcription files to {destination_dir}")
-            else:
-                logger.warning(
-                    f"No files found in {TRANSCRIPTION_DIR} to move")
-
-        except Exception as e:
-            logger.error(
-                f"Error moving files from {TRANSCRIPTION_DIR} to {destination_dir}: {str(e)}")
-            results["file_movement_error_transcription"] = str(e)
-
-    # 2. Move alignment output
-    if os.path.exists(ALIGNMENT_OUTPUT_DIR) and os.path.isdir(ALIGNMENT_OUTPUT_DIR):
-        try:
-            # Create an alignment subdirectory
-            alignment_dest_dir = os.path.join(destination_dir, "alignment")
-            os.makedirs(alignment_dest_dir, exist_ok=True)
-
-            # Get list of files in the alignment directory
-            files = os.listdir(ALIGNMENT_OUTPUT_DIR)
-
-            if files:
-                logger.info(
-                    f"Moving {len(files)} files from {ALIGNMENT_OUTPUT_DIR} to {alignment_dest_dir}")
-
-                for file in files:
-                    source_path = os.path.join(ALIGNMENT_OUTPUT_DIR, file)
-                    destination_path = os.path.join(alignment_dest_dir, file)
-
-                    # Move the file
-                    shutil.move(source_path, destination_path)
-                    moved_files["alignment"].append(file)
-
-                logger.info(
-                    f"Successfully moved all alignment files to {alignment_dest_dir}")
-            else:
-                logger.warning(
-                    f"No files found in {ALIGNMENT_OUTPUT_DIR} to move")
-
-        except Exception as e:
-            logger.error(
-                f"Error moving files from {ALIGNMENT_OUTPUT_DIR} to {alignment_dest_dir}: {str(e)}")
-            results["file_movement_error_alignment"] = str(e)
-
-    # 3. Move the generated image if it exists
-    if "image_path" in results.get("image_results", {}):
-        try:
-            image_path = results["image_results"]["image_path"]
-            if os.path.exists(image_path):
-                image_filename = os.path.basename(image_path)
-                destination_path = os.path.join(
-                    destination_dir, image_filename)
-
-                # Move the image file
-                # Using copy2 to preserve metadata
-                shutil.copy2(image_path, destination_path)
-
-                # Update the image path in results to point to the new location
-                results["image_results"]["original_image_path"] = image_path
-                results["image_results"]["image_path"] = destination_path
-                moved_files["image"].append(image_filename)
-
-                logger.info(f"Successfully copied image to {destination_path}")
-            else:
-                logger.warning(f"Image file not found at {image_path}")
-        except Exception as e:
-            logger.error(f"Error moving image file: {str(e)}")
-            results["file_movement_error_image"] = str(e)
-
-    # Add base64 encoded data if needed
-    if "wav_path" in results.get("audio_results", {}):
-        results["audio_base64"] = encode_to_base64(
-            results["audio_results"]["wav_path"])
-
-    if "image_path" in results.get("image_results", {}):
-        results["image_base64"] = encode_to_base64(
-            results["image_results"]["image_path"])
-
-    results["filename"] = filename
-    results["transcribed_dir"] = destination_dir
-    results["moved_files"] = moved_files
+async def process_articles_async(batch, max_workers=BATCH_MAX_WORKERS,
+                                 align_batch_size=MFA_BATCH_SIZE, render=False,
+                                 include_base64=True):
+    """
+    Process many articles through the stage graph on the running event loop.
+
+    Args:
+        batch (list): Article texts to process
+        max_workers (int): Concurrency limit of each I/O-bound stage
+        align_batch_size (int): Maximum number of runs aligned in one aligner call
+        render (bool): Whether to also render each short video
+        include_base64 (bool): Whether the results offer base64 copies of the audio and image
+
+    Returns:
+        list: One ArticleResult per article, in the same order as batch
+    """
+    articles = list(batch)
+    runs = [_new_run(include_base64) for _ in articles]
+    pipeline = build_article_pipeline(max_workers, align_batch_size, render)
+
+    outcomes = await pipeline.run(
+        [(run, {"article": article_text}) for run, article_text in zip(runs, articles)],
+        executor=_get_process_pool())
+
+    results = [_collect_results(run, outcome, render)
+               for run, outcome in zip(runs, outcomes)]
+    for run, result in zip(runs, results):
+        if "status" in result:
+            logger.info(
+                f"Article processing complete with status: {result['status']}")
+        record({"kind": "article", "created": time.time(), "filename": run["filename"],
+                "status": result.get("status", "failed"), **result["metrics"]})
+    return results
+
+
+def process_article(article_text, render=False, include_base64=True):
+    """
+    Process an article by generating a summary, audio, and image.
+    Then align the text with the audio.
+
+    Every stage writes its files once, straight into the run's own
+    transcribed/<filename>/ directory (see artifacts.ArtifactStore), so several
+    articles can be processed at the same time without touching each other's files.
+
+    Every stage's wall time, CPU time and RSS change, and metadata of its
+    external calls, are returned under "metrics" and appended to METRICS_FILE
+    if it is set.
+
+    This blocks until the article is done, also when called from a thread
+    that runs an event loop; async code should await process_articles_async
+    instead. CPU-bound stages run in a process pool shared by all calls.
+
+    Args:
+        article_text (str): The full article text to process
+        render (bool): Whether to also render the short video
+        include_base64 (bool): Whether the result offers base64 copies of the
+                               audio and image as "audio_base64" and "image_base64",
+                               encoded from the files when they are read
+
+    Returns:
+        ArticleResult: The processing results, read like a dict
+    """
+    return run_sync(process_articles_async(
+        [article_text], render=render, include_base64=include_base64))[0]
+
+
+def process_articles(batch, max_workers=BATCH_MAX_WORKERS, align_batch_size=MFA_BATCH_SIZE,
+                     render=False, include_base64=True):
+    """
+    Process many articles concurrently.
+
+    Each stage of each article starts as soon as its inputs are ready, so one
+    article's render can overlap another's TTS. Finished audio is aligned in
+    groups of up to align_batch_size with a single aligner invocation.
+
+    Args:
+        batch (list): Article texts to process
+        max_workers (int): Concurrency limit of each I/O-bound stage
+        align_batch_size (int): Maximum number of runs aligned in one aligner call
+        render (bool): Whether to also render each short video
+        include_base64 (bool): Whether the results offer base64 copies of the audio and image
+
+    Returns:
+        list: One ArticleResult per article, in the same order as batch
+    """
+    articles = list(batch)
+    logger.info(
+        f"Starting batch processing of {len(articles)} articles with {max_workers} workers")
+    results = run_sync(process_articles_async(
+        articles, max_workers, align_batch_size, render, include_base64))
 
+    succeeded = sum(1 for r in results if r.get("status") == "success")
     logger.info(
-        f"Article processing complete with status: {results['status']}")
+        f"Batch processing complete: {succeeded}/{len(results)} articles fully succeeded")
     return results
 
 
@@ -230,10 +320,10 @@ if __name__ == "__main__":
         print(f"Image saved to: {results['image_results'].get('image_path')}")
 
     if "transcribed_dir" in results:
-        print(f"Processed files moved to: {results['transcribed_dir']}")
+        print(f"Processed files saved to: {results['transcribed_dir']}")
 
     if "moved_files" in results:
-        print(f"Files moved summary:")
+        print(f"Files summary:")
         print(
             f"  - Transcription files: {len(results['moved_files']['transcription'])}")
         print(
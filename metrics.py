@@ -0,0 +1,412 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+import contextlib
+import contextvars
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_FILE, METRICS_PROMETHEUS_FILE, METRICS_SERVE_HOST
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('metrics')
+
+# Upper bounds of the Prometheus wall-time histogram buckets, in seconds
+WALL_TIME_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Spans finished in this context are appended to this list, if set
+_collector = contextvars.ContextVar("metrics_collector", default=None)
+# Name of the innermost open span
+_parent = contextvars.ContextVar("metrics_parent", default=None)
+
+
+def _current_rss():
+    """Current resident set size of this process in bytes, or None without /proc."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _on_event_loop():
+    """Whether this thread runs an event loop, so other tasks may run inside a span."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _children_cpu():
+    """CPU seconds used by waited-for child processes such as ffmpeg and MFA."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Span:
+    """
+    Timing and resource usage of one step, with metadata about it.
+
+    cpu_seconds is the CPU time of the thread that ran the step. It is None
+    for steps opened on an event loop's thread, since the loop runs other
+    tasks while they await.
+    child_cpu_seconds is the CPU time of subprocesses that finished during
+    the step. It is process-wide, so it also counts other threads' children.
+    rss_bytes is the process's RSS when the step ended and rss_delta_bytes
+    how much it changed during the step, also through other threads. Both
+    are None where /proc is unavailable.
+    """
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes)
+        self.start = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.child_cpu_seconds = None
+        self.rss_bytes = None
+        self.rss_delta_bytes = None
+        self.error = None
+
+    def set(self, key, value):
+        """Set a metadata value, such as the characters sent to an API."""
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        """Increase a metadata counter, such as the retry count."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def fail(self, error):
+        """Mark the step as failed, for code that returns errors instead of raising."""
+        self.error = str(error)
+
+    def to_dict(self):
+        span = {
+            "name": self.name,
+            "parent": self.parent,
+            "start": self.start,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "child_cpu_seconds": self.child_cpu_seconds,
+            "rss_bytes": self.rss_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "pid": os.getpid(),
+            "attributes": self.attributes,
+        }
+        if self.error is not None:
+            span["error"] = self.error
+        return span
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Record the wall time, CPU time and RSS change of a block.
+
+    The finished span is added to the spans being collected in the current
+    context (see collect); outside of one it is discarded. Spans opened
+    inside the block record this one as their parent.
+
+    Args:
+        name (str): Span name, e.g. "tts" or "render.encode"
+        **attributes: Initial metadata
+
+    Yields:
+        Span: The span, for adding metadata
+    """
+    current = Span(name, _parent.get(), **attributes)
+    token = _parent.set(name)
+    current.start = time.time()
+    wall_start = time.perf_counter()
+    # Thread CPU time only means something if the block keeps the thread
+    cpu_start = None if _on_event_loop() else time.thread_time()
+    children_start = _children_cpu()
+    rss_start = _current_rss()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        current.wall_seconds = time.perf_counter() - wall_start
+        if cpu_start is not None:
+            current.cpu_seconds = time.thread_time() - cpu_start
+        current.child_cpu_seconds = _children_cpu() - children_start
+        current.rss_bytes = _current_rss()
+        if current.rss_bytes is not None and rss_start is not None:
+            current.rss_delta_bytes = current.rss_bytes - rss_start
+        _parent.reset(token)
+        spans = _collector.get()
+        if spans is not None:
+            spans.append(current.to_dict())
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collect the spans finished inside the block.
+
+    Yields:
+        list: Span dicts, appended to as spans finish
+    """
+    spans = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def call_collected(name, func, /, *args, **kwargs):
+    """
+    Call func inside a span and return its result with every span it recorded.
+
+    Meant for running stages in threads and worker processes: the spans come
+    back to the caller with the result. If func raises, the spans are attached
+    to the exception as its metrics_spans attribute, which survives pickling.
+
+    Returns:
+        tuple: (result, list of span dicts)
+    """
+    with collect() as spans:
+        try:
+            with span(name):
+                result = func(*args, **kwargs)
+        except Exception as e:
+            e.metrics_spans = list(spans)
+            raise
+    return result, spans
+
+
+def add_spans(spans):
+    """
+    Add spans recorded elsewhere, e.g. by call_collected in a worker process,
+    to the spans being collected here. Their top-level spans become children
+    of the innermost open span.
+    """
+    collector = _collector.get()
+    if collector is None:
+        return
+    parent = _parent.get()
+    for s in spans:
+        if s["parent"] is None:
+            s["parent"] = parent
+        collector.append(s)
+
+
+def summarize(spans):
+    """
+    Summarize the spans of one run for its result dict.
+
+    Returns:
+        dict: The spans, ordered by start time, and the run's wall time from
+              the first span's start to the last span's end
+    """
+    spans = sorted(spans, key=lambda s: s["start"])
+    wall = 0.0
+    if spans:
+        wall = max(s["start"] + s["wall_seconds"] for s in spans) - spans[0]["start"]
+    return {"wall_seconds": wall, "spans": spans}
+
+
+_file_lock = threading.Lock()
+
+
+def record(entry, path=METRICS_FILE):
+    """
+    Append one entry to the JSON-lines metrics file and the Prometheus exporter.
+
+    Args:
+        entry (dict): JSON-serializable record with a "spans" list
+        path (str): Metrics file, "" to skip writing it
+    """
+    exporter.observe(entry.get("spans", []))
+    if path:
+        line = json.dumps(entry, default=str)
+        try:
+            with _file_lock:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Error writing metrics to {path}: {str(e)}")
+    if METRICS_PROMETHEUS_FILE:
+        exporter.write(METRICS_PROMETHEUS_FILE)
+
+
+@contextlib.contextmanager
+def recording(kind, **fields):
+    """
+    Collect spans for a top-level call and record them when it finishes.
+
+    If spans are already being collected, e.g. because the call runs as a
+    pipeline stage, the spans go to that collector and nothing is recorded
+    here.
+
+    Args:
+        kind (str): Record kind, e.g. "render"
+        **fields: Extra fields of the record
+
+    Yields:
+        dict: The record's fields, which can be updated before it is written
+    """
+    if _collector.get() is not None:
+        yield fields
+        return
+    with collect() as spans:
+        try:
+            yield fields
+        finally:
+            record({"kind": kind, "created": time.time(), **fields, **summarize(spans)})
+
+
+def _metric_name(key):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", key)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans into Prometheus text-format metrics.
+
+    Per span name it exports a wall-time histogram, CPU time sums, the highest
+    RSS at the end of a span and the largest RSS growth during one, an error count, and a sum for every numeric metadata value,
+    such as corgi_span_characters_total{span="tts"}.
+    """
+
+    def __init__(self, prefix="corgi", buckets=WALL_TIME_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def observe(self, spans):
+        """Add finished spans to the aggregates."""
+        with self._lock:
+            for s in spans:
+                stats = self._spans.setdefault(s["name"], {
+                    "count": 0, "wall": 0.0, "cpu": 0.0, "child_cpu": 0.0, "errors": 0,
+                    "rss": 0, "rss_growth": 0, "buckets": [0] * len(self.buckets), "totals": {},
+                })
+                stats["count"] += 1
+                stats["wall"] += s["wall_seconds"]
+                stats["cpu"] += s["cpu_seconds"] or 0.0
+                stats["child_cpu"] += s["child_cpu_seconds"]
+                stats["rss"] = max(stats["rss"], s["rss_bytes"] or 0)
+                stats["rss_growth"] = max(stats["rss_growth"], s["rss_delta_bytes"] or 0)
+                stats["errors"] += "error" in s
+                for index, bound in enumerate(self.buckets):
+                    if s["wall_seconds"] <= bound:
+                        stats["buckets"][index] += 1
+                for key, value in s["attributes"].items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        totals = stats["totals"]
+                        totals[key] = totals.get(key, 0) + value
+
+    def render(self):
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format
+        """
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_span_wall_seconds Wall time of pipeline spans",
+            f"# TYPE {p}_span_wall_seconds histogram",
+        ]
+        with self._lock:
+            spans = sorted(self._spans.items())
+            for name, stats in spans:
+                label = f'span="{_label(name)}"'
+                for bound, count in zip(self.buckets, stats["buckets"]):
+                    lines.append(f'{p}_span_wall_seconds_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{p}_span_wall_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+                lines.append(f"{p}_span_wall_seconds_sum{{{label}}} {stats['wall']}")
+                lines.append(f"{p}_span_wall_seconds_count{{{label}}} {stats['count']}")
+
+            for metric, key, kind, help_text in (
+                    ("cpu_seconds_total", "cpu", "counter", "Thread CPU time of spans"),
+                    ("child_cpu_seconds_total", "child_cpu", "counter",
+                     "CPU time of subprocesses that finished during spans"),
+                    ("errors_total", "errors", "counter", "Spans that raised"),
+                    ("rss_bytes", "rss", "gauge", "Highest RSS at the end of a span"),
+                    ("rss_growth_bytes", "rss_growth", "gauge", "Largest RSS growth during a span")):
+                lines.append(f"# HELP {p}_span_{metric} {help_text}")
+                lines.append(f"# TYPE {p}_span_{metric} {kind}")
+                for name, stats in spans:
+                    lines.append(f'{p}_span_{metric}{{span="{_label(name)}"}} {stats[key]}')
+
+            keys = sorted({key for _, stats in spans for key in stats["totals"]})
+            for key in keys:
+                metric = f"{p}_span_{_metric_name(key)}_total"
+                lines.append(f"# HELP {metric} Sum of the span metadata value {key}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, stats in spans:
+                    if key in stats["totals"]:
+                        lines.append(f'{metric}{{span="{_label(name)}"}} {stats["totals"][key]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to a file atomically, e.g. for node_exporter's textfile collector."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Error writing Prometheus metrics to {path}: {str(e)}")
+
+    def serve(self, port, host=METRICS_SERVE_HOST):
+        """
+        Serve the metrics over HTTP at /metrics from a background thread.
+
+        Args:
+            port (int): Port to listen on
+            host (str): Interface to bind to, loopback only unless
+                        METRICS_SERVE_HOST or host says otherwise
+
+        Returns:
+            ThreadingHTTPServer: The running server; call shutdown() to stop it
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Serving Prometheus metrics on {host}:{port}/metrics")
+        return server
+
+
+# Shared by every record() call in the process
+exporter = PrometheusExporter()
@@ -1,9 +1,21 @@
-from moviepy import *
-import numpy as np
+import io
 import os
+import numbers
+import functools
 import logging
 import sys
+from PIL import Image
 from parse import parse_textgrid
+from captions import (group_captions, render_caption, CaptionTrack, CAPTION_FONT_SIZE,
+                      CAPTION_STROKE_WIDTH)
+from compositor import ShortsCompositor, StaticImageLayer, load_rgba
+from sprites import load_sprite, SpriteLayer
+from text_aligner import align_text
+from ffmpeg_render import render_ffmpeg
+from segments import render_segmented
+from metrics import span, recording
+from profiling import profiled
+from config import RENDER_ENGINE, RENDER_SEGMENTS, RENDER_PROFILES, RENDER_PROFILE
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
@@ -14,9 +26,207 @@ logger = logging.getLogger('movie_generator')
 SHORTS_WIDTH, SHORTS_HEIGHT = 1080, 1920
 PADDING = 50  # Padding for summary image
 PAUSE_DURATION = 0.25
+CORGI_INITIAL_HEIGHT = 100  # Start small
+CORGI_FINAL_HEIGHT = 700    # Target size
+CORGI_GROW_DURATION = 0.3   # Seconds the corgi takes to grow in
+BACKGROUND_COLOR = (10, 6, 47)
+TREND_IMAGE_Y = 350
+TREND_FADE_DURATION = 0.5
+AUDIO_EXTENSIONS = (".flac", ".mp3", ".wav")  # Narration files, most preferred first
 
 
-def create_shorts_video(process_folder, output_path=None):
+def shorts_layout(profile=RENDER_PROFILE):
+    """
+    Pixel layout of a Shorts video for a render profile.
+
+    The layout is designed for 1080x1920 and scaled to the profile's size,
+    so smaller profiles draw every layer small instead of rendering full
+    size and downscaling.
+
+    Args:
+        profile (str): Name of the render profile in RENDER_PROFILES
+
+    Returns:
+        dict: Frame size, frame rate and scaled positions and sizes
+    """
+    settings = RENDER_PROFILES[profile]
+    width, height = settings["size"]
+    scale = width / SHORTS_WIDTH
+
+    def scaled(value):
+        return max(1, int(round(value * scale)))
+
+    # Position for captions (above the trend image)
+    trend_img_height = SHORTS_HEIGHT // 3
+    subtitle_y_position = (SHORTS_HEIGHT // 2) - \
+        (trend_img_height // 2) - 500
+
+    return {
+        "size": (width, height),
+        "fps": settings["fps"],
+        "trend_height": scaled(SHORTS_HEIGHT // 2),
+        "trend_y": scaled(TREND_IMAGE_Y),
+        "corgi_initial_height": scaled(CORGI_INITIAL_HEIGHT),
+        "corgi_final_height": scaled(CORGI_FINAL_HEIGHT),
+        "caption_y": scaled(subtitle_y_position),
+        "font_size": scaled(CAPTION_FONT_SIZE),
+        "stroke_width": scaled(CAPTION_STROKE_WIDTH),
+    }
+
+
+def build_compositor(image_path, corgi_path, caption_groups, duration, font_path=None,
+                     profile=RENDER_PROFILE):
+    """
+    Build the compositor that draws every frame of a Shorts video.
+
+    Args:
+        image_path (str): Path to the trend image
+        corgi_path (str): Path to the corgi GIF
+        caption_groups (list): Caption group tuples (start_time, end_time, text)
+        duration (float): Video duration in seconds
+        font_path (str, optional): Caption font, or None for the default font
+        profile (str): Name of the render profile in RENDER_PROFILES
+
+    Returns:
+        ShortsCompositor: The compositor
+    """
+    layout = shorts_layout(profile)
+    width, height = layout["size"]
+
+    # Corgi frames are decoded and pre-scaled once, then reused across videos
+    corgi = load_sprite(corgi_path, layout["corgi_initial_height"],
+                        layout["corgi_final_height"], CORGI_GROW_DURATION, layout["fps"])
+
+    # # Load and prepare the trend image (static apart from its fades)
+    trend_rgba = load_rgba(image_path, layout["trend_height"])
+    trend_img = StaticImageLayer(
+        trend_rgba, x=int((width - trend_rgba.shape[1]) / 2), y=layout["trend_y"],
+        duration=duration, fade_in=TREND_FADE_DURATION, fade_out=TREND_FADE_DURATION)
+
+    caption_track = CaptionTrack(caption_groups, width, layout["caption_y"],
+                                 font_path=font_path, font_size=layout["font_size"],
+                                 stroke_width=layout["stroke_width"])
+
+    # Background and trend image are flattened into one cached base frame;
+    # only the corgi and the active caption are drawn per frame
+    return ShortsCompositor(
+        (width, height), duration, BACKGROUND_COLOR,
+        static_layers=[trend_img],
+        dynamic_layers=[
+            SpriteLayer(corgi, ("center", "bottom"), (width, height)),
+            caption_track,
+        ])
+
+
+def _load_assets(process_folder):
+    """
+    Find and prepare everything a Shorts video of a processed article needs.
+
+    Aligns the folder first if it has no TextGrid yet.
+
+    Args:
+        process_folder (str): Path to the folder containing processed article assets
+
+    Returns:
+        dict: Captions, asset paths, video duration and caption font, or None
+              if an asset is missing
+    """
+    # Set up paths based on the structure
+    alignment_folder = os.path.join(process_folder, "alignment")
+
+    # Align the folder first if it has not been aligned yet
+    if not os.path.isdir(alignment_folder) or not any(
+            f.endswith('.TextGrid') for f in os.listdir(alignment_folder)):
+        logger.info(f"No alignment found, aligning {process_folder}")
+        align_text(process_folder, output_path=alignment_folder)
+
+    # Find TextGrid file in alignment folder
+    textgrid_files = [f for f in os.listdir(
+        alignment_folder) if f.endswith('.TextGrid')]
+    if not textgrid_files:
+        logger.error(f"No TextGrid files found in {alignment_folder}")
+        return None
+
+    textgrid_path = os.path.join(alignment_folder, textgrid_files[0])
+
+    # Parse TextGrid to get captions
+    captions = parse_textgrid(textgrid_path)
+    if not captions:
+        logger.error("Failed to extract captions from TextGrid")
+        return None
+
+    logger.info(f"Extracted {len(captions)} captions for video")
+
+    # Find audio file in process folder, preferring the full-band narration
+    # over the 16 kHz WAV made for alignment
+    audio_files = sorted(
+        (f for f in os.listdir(process_folder)
+         if os.path.splitext(f)[1] in AUDIO_EXTENSIONS),
+        key=lambda f: AUDIO_EXTENSIONS.index(os.path.splitext(f)[1]))
+    if not audio_files:
+        logger.error(f"No audio files found in {process_folder}")
+        return None
+
+    audio_path = os.path.join(process_folder, audio_files[0])
+
+    # Find image file in process folder
+    image_files = [f for f in os.listdir(
+        process_folder) if f.endswith('.png') or f.endswith('.jpg')]
+    if not image_files:
+        logger.error(f"No image files found in {process_folder}")
+        return None
+
+    image_path = os.path.join(process_folder, image_files[0])
+
+    # Path to corgi GIF in assets folder
+    corgi_path = "./assets/corgi.gif"
+    if not os.path.exists(corgi_path):
+        logger.error(f"Corgi GIF not found at {corgi_path}")
+        return None
+
+    # Maximum duration based on last caption end time
+    # Default 10 seconds if no captions
+    MAX_DURATION = captions[-1][1] if captions else 10
+    MAX_DURATION = MAX_DURATION + (PAUSE_DURATION)
+
+    # Choose a font
+    font_path = None
+    if sys.platform == "darwin":  # macOS
+        font_path = "/System/Library/Fonts/Supplemental/Impact.ttf"
+    # Add Windows and Linux paths if needed
+
+    if not font_path or not os.path.exists(font_path):
+        logger.warning("Impact font not found, using default")
+        font_path = None
+
+    return {
+        "captions": captions,
+        "audio_path": audio_path,
+        "image_path": image_path,
+        "corgi_path": corgi_path,
+        "duration": MAX_DURATION,
+        "font_path": font_path,
+    }
+
+
+def _caption_groups(captions, font_path, layout):
+    """Group words into captions, rasterized once each and blitted per frame"""
+    caption_groups = []
+    for start, end, text in group_captions(captions):
+        try:
+            render_caption(text, font_path=font_path, font_size=layout["font_size"],
+                           stroke_width=layout["stroke_width"])
+            caption_groups.append((start, end, text))
+            logger.info(f"Created subtitle: '{text}' ({start} to {end})")
+        except Exception as e:
+            logger.warning(f"Error creating subtitle for '{text}': {str(e)}")
+    return caption_groups
+
+
+@profiled("create_shorts_video",
+          directory=lambda process_folder, *args, **kwargs: process_folder)
+def create_shorts_video(process_folder, output_path=None, engine=RENDER_ENGINE,
+                        segments=RENDER_SEGMENTS, profile=RENDER_PROFILE):
     """
     Create a YouTube Shorts style video using assets from a processed article.
 
@@ -24,10 +234,25 @@ def create_shorts_video(process_folder, output_path=None):
         process_folder (str): Path to the folder containing processed article assets
         output_path (str, optional): Path where the output video should be saved
                                      If None, saves to process_folder/output_shorts.mp4
+        engine (str): "moviepy" to composite frames in Python, or "ffmpeg" to
+                      render the same layout with a single ffmpeg filter graph
+        segments (int): With the "moviepy" engine, render this many segments,
+                        split on caption-group boundaries, in parallel processes
+        profile (str): Render profile in RENDER_PROFILES, e.g. "final" or the
+                       smaller, faster "preview"
 
     Returns:
         str: Path to the created video file or None if creation failed
     """
+    # Outside of a pipeline stage, the render's spans are recorded on their own
+    with recording("render", process_folder=process_folder, engine=engine,
+                   profile=profile) as fields:
+        fields["output_path"] = _create_shorts_video(process_folder, output_path, engine,
+                                                     segments, profile)
+        return fields["output_path"]
+
+
+def _create_shorts_video(process_folder, output_path, engine, segments, profile):
     try:
 
         # Ensure process folder exists
@@ -35,9 +260,6 @@ def create_shorts_video(process_folder, output_path=None):
             logger.error(f"Process folder not found: {process_folder}")
             return None
 
-        # Set up paths based on the structure
-        alignment_folder = os.path.join(process_folder, "alignment")
-
         # Set output path if not provided
         if output_path is None:
             output_path = os.path.join(process_folder, "output_shorts.mp4")
@@ -47,95 +269,66 @@ def create_shorts_video(process_folder, output_path=None):
             os.environ["IMAGEIO_FFMPEG_EXE"] = "/opt/anaconda3/envs/mana/bin/ffmpeg"
             os.environ["IMAGEMAGICK_BINARY"] = "/opt/homebrew/bin/magick"
 
-        # Find TextGrid file in alignment folder
-        textgrid_files = [f for f in os.listdir(
-            alignment_folder) if f.endswith('.TextGrid')]
-        if not textgrid_files:
-            logger.error(f"No TextGrid files found in {alignment_folder}")
-            return None
-
-        textgrid_path = os.path.join(alignment_folder, textgrid_files[0])
-
-        # Parse TextGrid to get captions
-        captions = parse_textgrid(textgrid_path)
-        if not captions:
-            logger.error("Failed to extract captions from TextGrid")
-            return None
-
-        logger.info(f"Extracted {len(captions)} captions for video")
-
-        # Find audio file in process folder
-        audio_files = [f for f in os.listdir(
-            process_folder) if f.endswith('.wav') or f.endswith('.mp3')]
-        if not audio_files:
-            logger.error(f"No audio files found in {process_folder}")
+        with span("render.load_assets"):
+            assets = _load_assets(process_folder)
+        if assets is None:
             return None
-
-        audio_path = os.path.join(process_folder, audio_files[0])
-
-        # Find image file in process folder
-        image_files = [f for f in os.listdir(
-            process_folder) if f.endswith('.png') or f.endswith('.jpg')]
-        if not image_files:
-            logger.error(f"No image files found in {process_folder}")
-            return None
-
-        image_path = os.path.join(process_folder, image_files[0])
-
-        # Path to corgi GIF in assets folder
-        corgi_path = "./assets/corgi.gif"
-        if not os.path.exists(corgi_path):
-            logger.error(f"Corgi GIF not found at {corgi_path}")
-            return None
-
-        # Maximum duration based on last caption end time
-        # Default 10 seconds if no captions
-        MAX_DURATION = captions[-1][1] if captions else 10
-        MAX_DURATION = MAX_DURATION + (PAUSE_DURATION)
+        MAX_DURATION = assets["duration"]
+        captions = assets["captions"]
+        audio_path = assets["audio_path"]
+        image_path = assets["image_path"]
+        corgi_path = assets["corgi_path"]
+        font_path = assets["font_path"]
 
         logger.info(
             f"Creating video with duration: {MAX_DURATION:.2f} seconds")
 
-        # Create a background with YouTube Shorts resolution
-        background = ColorClip(size=(SHORTS_WIDTH, SHORTS_HEIGHT),
-                               color=(10, 6, 47), duration=MAX_DURATION)
-
-        # Load and prepare the corgi GIF
-        video = VideoFileClip(corgi_path, has_mask=True)
-
-        # Loop the gif for the full duration
-        looped_video = video.with_effects([vfx.Loop(duration=MAX_DURATION)])
-
-        # Animation parameters
-        initial_height = 100  # Start small
-        final_height = 700    # Target size
-
-        # # Get original aspect ratio
-        aspect_ratio = video.w / video.h
-
-        # # Define scaling function for smooth animation
-        def scale_func(t):
-            if t > 0.3:
-                # Exact target size
-                return (final_height * aspect_ratio, final_height)
-            else:
-                scale_factor = (t / 0.3)  # Linear scaling
-                height = int(initial_height + scale_factor *
-                             (final_height - initial_height))
-                return (int(height * aspect_ratio), height)
-
-        # Apply scaling and position
-
-        gif_resized = looped_video.with_position(
-            ("center", "bottom")).resized(scale_func)
+        if profile not in RENDER_PROFILES:
+            logger.error(f"Unknown render profile: {profile}")
+            return None
+        layout = shorts_layout(profile)
+        encoding = RENDER_PROFILES[profile]
+
+        if engine == "ffmpeg":
+            logger.info(f"Rendering {output_path} with ffmpeg ({profile})")
+            with span("render.encode", engine="ffmpeg",
+                      frames=int(MAX_DURATION * layout["fps"])):
+                render_ffmpeg(
+                    output_path, layout["size"], MAX_DURATION, BACKGROUND_COLOR,
+                    image_path, layout["trend_y"], layout["trend_height"], TREND_FADE_DURATION,
+                    corgi_path, layout["corgi_initial_height"], layout["corgi_final_height"],
+                    CORGI_GROW_DURATION, audio_path, group_captions(captions),
+                    layout["caption_y"], font_path=font_path, font_size=layout["font_size"],
+                    stroke_width=layout["stroke_width"], fps=layout["fps"], encoding=encoding,
+                    audio_duration=MAX_DURATION + PAUSE_DURATION)
+            logger.info(f"Video creation complete: {output_path}")
+            return output_path
+        if engine != "moviepy":
+            logger.error(f"Unknown render engine: {engine}")
+            return None
 
-        # # Load and prepare the trend image
-        trend_img = ImageClip(image_path, duration=MAX_DURATION).resized(
-            width=SHORTS_WIDTH - 2 * PADDING, height=SHORTS_HEIGHT // 2)
-        trend_img = trend_img.with_position(
-            ("center", 350))
-        trend_img = trend_img.with_effects(
-            [vfx.FadeIn(duration=.5), vfx.FadeOut(duration=.5)])
+        with span("render.captions") as caption_span:
+            caption_groups = _caption_groups(captions, font_path, layout)
+            caption_span.set("groups", len(caption_groups))
+
+        factory = functools.partial(
+            build_compositor, image_path, corgi_path, caption_groups, MAX_DURATION,
+            font_path=font_path, profile=profile)
+
+        if segments > 1:
+            # Fill the sprite cache first so workers only memory-map it
+            with span("render.sprite_cache"):
+                load_sprite(corgi_path, layout["corgi_initial_height"],
+                            layout["corgi_final_height"], CORGI_GROW_DURATION, layout["fps"])
+            # Render caption-aligned segments in parallel and join them
+            render_segmented(factory, caption_groups, MAX_DURATION, layout["size"],
+                             layout["fps"], audio_path, MAX_DURATION + PAUSE_DURATION,
+                             output_path, segments, encoding=encoding)
+            logger.info(f"Video creation complete: {output_path}")
+            return output_path
+
+        # MoviePy is only needed for this single-pass path, so load it here
+        from moviepy import AudioClip, AudioFileClip, concatenate_audioclips
 
         # # Load audio
         audio = AudioFileClip(audio_path).with_duration(MAX_DURATION)
@@ -144,88 +337,23 @@ def create_shorts_video(process_folder, output_path=None):
         full_audio = concatenate_audioclips(
             [audio, silence_end])
 
-        # Choose a font
-        font_path = None
-        if sys.platform == "darwin":  # macOS
-            font_path = "/System/Library/Fonts/Supplemental/Impact.ttf"
-        # Add Windows and Linux paths if needed
-
-        if not font_path or not os.path.exists(font_path):
-            logger.warning("Impact font not found, using default")
-            font_path = None
-
-        # Position for captions (above the trend image)
-        trend_img_height = SHORTS_HEIGHT // 3
-        subtitle_y_position = (SHORTS_HEIGHT // 2) - \
-            (trend_img_height // 2) - 500
-
-        # Generate text clips for captions with combined words
-        subtitle_clips = []
-        current_text = ""
-        current_start = None
-        current_end = None
-        MAX_CHAR_COUNT = 25
-
-        for start, end, text in captions:
-            # If we haven't started a new text group yet, initialize with this word
-            if current_text == "":
-                current_text = text
-                current_start = start
-                current_end = end
-            # If adding this word would keep us under the character limit, add it
-            elif len(current_text + " " + text) <= MAX_CHAR_COUNT:
-                current_text += " " + text
-                current_end = end  # Update the end time to the end of the last word
-            # Otherwise, create a clip with the accumulated text and start a new group
-            else:
-                try:
-                    clip = TextClip(text=current_text, font_size=100, color="white", font=font_path,
-                                    stroke_width=3, stroke_color="black")
-                    clip = clip.with_position(("center", subtitle_y_position))
-                    clip = clip.with_start(current_start).with_end(current_end)
-                    subtitle_clips.append(clip)
-                    logger.info(
-                        f"Created subtitle: '{current_text}' ({current_start} to {current_end})")
-                except Exception as e:
-                    logger.warning(
-                        f"Error creating subtitle for '{current_text}': {str(e)}")
-
-                # Start a new text group with the current word
-                current_text = text
-                current_start = start
-                current_end = end
-
-        # Don't forget the last group of text if there is any
-        if current_text:
-            try:
-                clip = TextClip(text=current_text, font_size=100, color="white", font=font_path,
-                                stroke_width=3, stroke_color="black")
-                clip = clip.with_position(("center", subtitle_y_position))
-                clip = clip.with_start(current_start).with_end(current_end)
-                subtitle_clips.append(clip)
-                logger.info(
-                    f"Created subtitle: '{current_text}' ({current_start} to {current_end})")
-            except Exception as e:
-                logger.warning(
-                    f"Error creating subtitle for '{current_text}': {str(e)}")
-
-        clips_to_compose = [background, trend_img, gif_resized]
-        clips_to_compose.extend(subtitle_clips)
-
-        # Create composite with explicit duration
-        final_video = CompositeVideoClip(
-            clips_to_compose, size=(SHORTS_WIDTH, SHORTS_HEIGHT))
+        final_video = factory().clip()
         final_video.audio = full_audio
 
         # # Save the final video
         logger.info(f"Writing video to {output_path}")
-        final_video.write_videofile(
-            output_path, codec="libx264", fps=24, audio_codec="aac", bitrate="5000k")
+        with span("render.encode", engine="moviepy",
+                  frames=int(MAX_DURATION * layout["fps"])):
+            final_video.write_videofile(
+                output_path, codec=encoding["codec"], fps=layout["fps"], audio_codec="aac",
+                bitrate=None if encoding["crf"] is not None else encoding["bitrate"],
+                preset=encoding["preset"], threads=encoding["threads"],
+                ffmpeg_params=["-crf", str(encoding["crf"])] if encoding["crf"] is not None
+                else None)
 
         # final_video.preview()
 
         # Clean up resources
-        video.close()
         final_video.close()
         audio.close()
 
@@ -237,6 +365,82 @@ def create_shorts_video(process_folder, output_path=None):
         return None
 
 
+def encode_image(frame, image_format="png", quality=90):
+    """
+    Encode an RGB frame as PNG or JPEG bytes.
+
+    Args:
+        frame (numpy.ndarray): (height, width, 3) uint8 frame
+        image_format (str): "png" or "jpeg"
+        quality (int): JPEG quality
+
+    Returns:
+        bytes: The encoded image
+    """
+    buffer = io.BytesIO()
+    if image_format == "png":
+        Image.fromarray(frame).save(buffer, format="PNG")
+    elif image_format in ("jpeg", "jpg"):
+        Image.fromarray(frame).save(buffer, format="JPEG", quality=quality)
+    else:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    return buffer.getvalue()
+
+
+def render_frames(process_folder, timestamps, image_format="png", profile=RENDER_PROFILE,
+                  quality=90):
+    """
+    Compose frames of a Shorts video without encoding a video.
+
+    Frames are drawn with the same layout as create_shorts_video, so they
+    can be used as thumbnails or for QA contact sheets.
+
+    Args:
+        process_folder (str): Path to the folder containing processed article assets
+        timestamps (float or list): Time in seconds, or a list of times, to compose.
+                                    Times are clamped to the video duration.
+        image_format (str): "png" or "jpeg" for encoded bytes, "array" for
+                            (height, width, 3) uint8 NumPy frames
+        profile (str): Render profile in RENDER_PROFILES, which sets the frame size
+        quality (int): JPEG quality
+
+    Returns:
+        bytes, numpy.ndarray or list: One image per timestamp (a single one
+                                      if a single time was given), or None if
+                                      composing failed
+    """
+    try:
+        if not os.path.exists(process_folder):
+            logger.error(f"Process folder not found: {process_folder}")
+            return None
+        if profile not in RENDER_PROFILES:
+            logger.error(f"Unknown render profile: {profile}")
+            return None
+
+        assets = _load_assets(process_folder)
+        if assets is None:
+            return None
+
+        layout = shorts_layout(profile)
+        compositor = build_compositor(
+            assets["image_path"], assets["corgi_path"],
+            _caption_groups(assets["captions"], assets["font_path"], layout),
+            assets["duration"], font_path=assets["font_path"], profile=profile)
+
+        # numbers.Real also covers NumPy scalars such as np.float32
+        single = isinstance(timestamps, numbers.Real)
+        images = []
+        for t in ([timestamps] if single else timestamps):
+            frame = compositor.frame(min(max(float(t), 0.0), assets["duration"]))
+            images.append(frame if image_format == "array"
+                          else encode_image(frame, image_format, quality))
+        return images[0] if single else images
+
+    except Exception as e:
+        logger.error(f"Error rendering frames: {str(e)}")
+        return None
+
+
 def main():
     """
     Main function with hard-coded input directory and output path.
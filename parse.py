@@ -1,20 +1,235 @@
-import re
-import pandas as pd
 import os
+import sys
 import logging
+from array import array
+import numpy as np
+from profiling import profiled
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('textgrid_parser')
 
+SIDECAR_SUFFIX = ".tiers.npz"
+SIDECAR_VERSION = 1  # Bump when the sidecar layout changes
 
-def parse_textgrid(textgrid_path):
+
+class Tier:
+    """
+    One tier of a TextGrid as compact arrays.
+
+    Interval tiers have a start and end time per interval; for point tiers
+    (TextTier) start and end are both the point's time. Texts are interned,
+    so repeated labels such as phones share one string.
+    """
+
+    def __init__(self, name, kind, starts, ends, texts):
+        self.name = name
+        self.kind = kind
+        self.starts = starts  # float64 array
+        self.ends = ends      # float64 array
+        self.texts = texts    # list of str
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return zip(self.starts.tolist(), self.ends.tolist(), self.texts)
+
+    def labeled(self):
+        """Return (start, end, text) tuples of the entries with non-blank text."""
+        return [entry for entry in self if entry[2].strip() != ""]
+
+
+_NUMBER_START = frozenset("0123456789+-.")
+
+
+def _tokens(lines):
+    """
+    Yield the numbers (as float) and strings (as str) of a TextGrid in order.
+
+    Everything else, such as the long format's "xmin =" labels, "item [1]:"
+    headers and the "<exists>" flag, is skipped. Both the long and the short
+    text formats reduce to the same token sequence this way. Strings may span
+    lines and use "" for a literal quote.
+
+    Lines are read one at a time. A line with quotes is split on them, and
+    every quote toggles whether the following piece is inside a string; that
+    state carries over to the next line. An empty piece between two strings
+    is a doubled quote.
+    """
+    string = None  # The string being read, until the piece after its closing quote
+    inside = False
+    for line in lines:
+        if not inside and '"' not in line:
+            # Most lines hold just a label and a number
+            for word in line.split():
+                if word[0] in _NUMBER_START:
+                    try:
+                        yield float(word)
+                    except ValueError:
+                        pass
+            continue
+
+        pieces = line.split('"')
+        last = len(pieces) - 1
+        for index, piece in enumerate(pieces):
+            if index:
+                inside = not inside
+            if inside:
+                string = piece if string is None else string + piece
+                continue
+            if string is not None:
+                if not piece and index < last:
+                    # Doubled quote inside a string
+                    string += '"'
+                    continue
+                yield string
+                string = None
+            for word in piece.split():
+                if word[0] in _NUMBER_START:
+                    try:
+                        yield float(word)
+                    except ValueError:
+                        pass
+
+
+def _open_text(textgrid_path):
+    """Open a TextGrid as text, detecting the UTF-16 files Praat can write."""
+    with open(textgrid_path, "rb") as f:
+        head = f.read(2)
+    encoding = "utf-16" if head in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+    return open(textgrid_path, "r", encoding=encoding)
+
+
+def _read_tiers(textgrid_path):
+    """Parse every tier of a TextGrid in a single streaming pass."""
+    with _open_text(textgrid_path) as file:
+        try:
+            return _parse_tokens(_tokens(file), textgrid_path)
+        except StopIteration:
+            raise ValueError(f"TextGrid file ends early: {textgrid_path}") from None
+
+
+def _parse_tokens(tokens, textgrid_path):
+    """Build the tiers from the token stream of a TextGrid."""
+    file_type, object_class = next(tokens), next(tokens)
+    if not str(file_type).startswith("ooTextFile") or object_class != "TextGrid":
+        raise ValueError(f"Not a text TextGrid file: {textgrid_path}")
+    next(tokens)  # xmin
+    next(tokens)  # xmax
+    tier_count = int(next(tokens))
+
+    tiers = []
+    for _ in range(tier_count):
+        kind = next(tokens)
+        name = next(tokens)
+        next(tokens)  # xmin
+        next(tokens)  # xmax
+        count = int(next(tokens))
+
+        starts, ends, texts = array("d"), array("d"), []
+        if kind == "IntervalTier":
+            for _ in range(count):
+                starts.append(next(tokens))
+                ends.append(next(tokens))
+                texts.append(sys.intern(next(tokens)))
+        elif kind == "TextTier":
+            for _ in range(count):
+                time = next(tokens)
+                starts.append(time)
+                ends.append(time)
+                texts.append(sys.intern(next(tokens)))
+        else:
+            raise ValueError(f"Unknown tier class: {kind}")
+
+        tiers.append(Tier(name, kind, np.frombuffer(starts, dtype=np.float64),
+                          np.frombuffer(ends, dtype=np.float64), texts))
+    return tiers
+
+
+def _sidecar_path(textgrid_path):
+    return textgrid_path + SIDECAR_SUFFIX
+
+
+def _source_stamp(textgrid_path):
+    stat = os.stat(textgrid_path)
+    return np.array([SIDECAR_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def _load_sidecar(textgrid_path):
+    """Return the cached tiers if the sidecar matches the TextGrid, else None."""
+    sidecar_path = _sidecar_path(textgrid_path)
+    if not os.path.exists(sidecar_path):
+        return None
+    try:
+        with np.load(sidecar_path, allow_pickle=False) as data:
+            if not np.array_equal(data["stamp"], _source_stamp(textgrid_path)):
+                return None
+            return [
+                Tier(str(name), str(kind), data[f"starts_{index}"], data[f"ends_{index}"],
+                     [sys.intern(str(text)) for text in data[f"texts_{index}"]])
+                for index, (name, kind) in enumerate(zip(data["names"], data["kinds"]))
+            ]
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable TextGrid sidecar {sidecar_path}: {str(e)}")
+        return None
+
+
+def _save_sidecar(textgrid_path, tiers):
+    sidecar_path = _sidecar_path(textgrid_path)
+    arrays = {
+        "stamp": _source_stamp(textgrid_path),
+        "names": np.array([tier.name for tier in tiers], dtype=str),
+        "kinds": np.array([tier.kind for tier in tiers], dtype=str),
+    }
+    for index, tier in enumerate(tiers):
+        arrays[f"starts_{index}"] = tier.starts
+        arrays[f"ends_{index}"] = tier.ends
+        arrays[f"texts_{index}"] = np.array(tier.texts, dtype=str)
+
+    temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, sidecar_path)
+    except OSError as e:
+        logger.warning(f"Error writing TextGrid sidecar {sidecar_path}: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def read_textgrid(textgrid_path, use_cache=True):
+    """
+    Read all tiers of a long- or short-format TextGrid file.
+
+    The parsed tiers are stored in a binary sidecar file next to the
+    TextGrid and reused while the TextGrid is unchanged.
+
+    Args:
+        textgrid_path (str): Path to the TextGrid file
+        use_cache (bool): Whether to read and write the sidecar cache
+
+    Returns:
+        dict: Tier name -> Tier, in file order
+    """
+    tiers = _load_sidecar(textgrid_path) if use_cache else None
+    if tiers is None:
+        tiers = _read_tiers(textgrid_path)
+        if use_cache:
+            _save_sidecar(textgrid_path, tiers)
+    return {tier.name: tier for tier in tiers}
+
+
+@profiled("parse_textgrid")
+def parse_textgrid(textgrid_path, tier_name="words"):
     """
     Parse a TextGrid file to extract word alignments.
 
     Args:
         textgrid_path (str): Path to the TextGrid file
+        tier_name (str): Name of the tier to read. If the file has no tier by
+                         that name, its first interval tier is used.
 
     Returns:
         list: List of caption tuples (start_time, end_time, text)
@@ -27,48 +242,17 @@ def parse_textgrid(textgrid_path):
             logger.error(f"TextGrid file not found at {textgrid_path}")
             return []
 
-        # Read the TextGrid content from a file
-        with open(textgrid_path, "r", encoding="utf-8") as file:
-            textgrid_content = file.read()
-
-        # Regular expression to extract only the "words" tier and stop reading at "phones" tier
-        pattern_words = re.compile(
-            r"item \[1\]:\s*class = \"IntervalTier\"\s*name = \"words\"(.*?)item \[2\]:",
-            re.DOTALL
-        )
-
-        # Extract only the relevant section of the "words" tier
-        match_words = pattern_words.search(textgrid_content)
-        if match_words:
-            words_section = match_words.group(1)
-        else:
-            logger.warning("Could not find 'words' tier in TextGrid file")
-            return []
-
-        # Regular expression pattern to extract xmin, xmax, and text from "words" tier
-        pattern_intervals = re.compile(
-            r"intervals \[\d+\]:\s*"
-            r"xmin = ([\d\.]+)\s*"
-            r"xmax = ([\d\.]+)\s*"
-            r'text = "(.*?)"',
-            re.DOTALL
-        )
-
-        # Extract matches from the words section
-        matches = pattern_intervals.findall(words_section)
-
-        # Convert to DataFrame
-        df_parsed = pd.DataFrame(matches, columns=["start", "stop", "text"])
-
-        # Convert start and stop to float
-        df_parsed["start"] = df_parsed["start"].astype(float)
-        df_parsed["stop"] = df_parsed["stop"].astype(float)
+        tiers = read_textgrid(textgrid_path)
+        tier = tiers.get(tier_name)
+        if tier is None:
+            tier = next((t for t in tiers.values() if t.kind == "IntervalTier"), None)
+            if tier is None:
+                logger.warning(f"Could not find '{tier_name}' tier in TextGrid file")
+                return []
+            logger.warning(f"No '{tier_name}' tier in TextGrid file, using '{tier.name}'")
 
         # Remove empty text entries
-        df_parsed = df_parsed[df_parsed["text"].str.strip() != ""]
-
-        # Convert to list of tuples for captions format
-        captions = list(df_parsed.itertuples(index=False, name=None))
+        captions = tier.labeled()
 
         logger.info(f"Successfully parsed {len(captions)} captions")
         return captions
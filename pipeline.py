@@ -0,0 +1,261 @@
+import copy
+import time
+import contextlib
+import asyncio
+import functools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from metrics import call_collected
+from profiling import configure, settings
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('pipeline')
+
+
+class StageFailed(Exception):
+    """Raised in place of a stage's result when the stage or one of its dependencies failed"""
+
+
+class Stage:
+    """
+    A named step of a pipeline.
+
+    Args:
+        name (str): Unique stage name
+        func (callable): Called as func(run, **results of deps). For "batch"
+                         stages it is called with a list of (run, deps) pairs
+                         and must return one result per pair.
+        deps (tuple): Stages (or pipeline inputs) whose results are passed to func
+        after (tuple): Stages that must finish first, without passing their results
+        kind (str): "io" runs in a thread, "cpu" in the process pool, and
+                    "batch" collects several runs into one call in the process pool
+        concurrency (int, optional): Maximum number of concurrent calls
+        batch_size (int): Maximum number of runs per call for "batch" stages
+        batch_window (float): Seconds a "batch" stage waits for a batch to fill
+    """
+
+    def __init__(self, name, func, deps=(), after=(), kind="io", concurrency=None,
+                 batch_size=1, batch_window=0.5):
+        if kind not in ("io", "cpu", "batch"):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.after = tuple(after)
+        self.kind = kind
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+
+
+class _Batcher:
+    """Groups calls of a "batch" stage and runs each group in the process pool"""
+
+    def __init__(self, stage, executor, expected):
+        self.stage = stage
+        self.executor = executor
+        self.expected = expected  # Runs that may still reach this stage
+        self.queue = []
+        self.timer = None
+        # The loop only keeps weak references to tasks, so running batches
+        # are held here until they finish
+        self.tasks = set()
+
+    async def submit(self, run, kwargs):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append((run, kwargs, future))
+        self.expected -= 1
+        self._maybe_flush()
+        return await future
+
+    def skip(self):
+        """Record that a run will never reach this stage."""
+        self.expected -= 1
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if not self.queue:
+            return
+        if len(self.queue) >= self.stage.batch_size or self.expected <= 0:
+            self._flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(
+                self.stage.batch_window, self._flush)
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.queue = self.queue[:self.stage.batch_size], self.queue[self.stage.batch_size:]
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        if self.queue:
+            self._maybe_flush()
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        jobs = [(run, kwargs) for run, kwargs, _ in batch]
+        try:
+            results, spans = await loop.run_in_executor(
+                self.executor, functools.partial(call_collected, self.stage.name,
+                                                 self.stage.func, jobs))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for span in spans:
+            if span["name"] == self.stage.name and span["parent"] is None:
+                span["attributes"]["batch_size"] = len(jobs)
+        # Every run in the batch gets its own copy of the batch's spans
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result((result, copy.deepcopy(spans)))
+
+
+class Pipeline:
+    """
+    Runs a graph of stages for many runs on asyncio.
+
+    Every stage of every run starts as soon as the stages it depends on have
+    finished, so different runs can be in different stages at the same time.
+    I/O-bound stages run in threads behind per-stage concurrency limits and
+    CPU-bound stages run in a shared process pool.
+
+    Every stage call is recorded as a metrics span named after the stage,
+    together with the spans recorded inside it, also in worker processes.
+    The stage span's queued_seconds is the time from its inputs being ready
+    to it starting to run.
+    """
+
+    def __init__(self, stages, process_workers=None):
+        self.stages = list(stages)
+        self.process_workers = process_workers
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Stage names must be unique")
+        if "spans" in names:
+            raise ValueError("'spans' is reserved for the metrics of each run")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        """Raise ValueError if the stage graph has a cycle."""
+        graph = {stage.name: stage.deps + stage.after for stage in self.stages}
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done or name not in graph:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage graph has a cycle through {name}")
+            visiting.add(name)
+            for dependency in graph[name]:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in graph:
+            visit(name)
+
+    async def run(self, items, executor=None):
+        """
+        Run the pipeline for several runs.
+
+        Args:
+            items (list): (run, inputs) pairs. run is passed to every stage;
+                          inputs maps input names to values stages can depend on.
+            executor (ProcessPoolExecutor, optional): Process pool for "cpu" and
+                          "batch" stages, left running afterwards. If None, a
+                          pool of process_workers is created for this call.
+
+        Returns:
+            list: For each item, a dict of stage name -> result, or the
+                  exception the stage failed with, and "spans", the list of
+                  metrics spans its stages recorded
+        """
+        items = list(items)
+        semaphores = {
+            stage.name: asyncio.Semaphore(stage.concurrency)
+            for stage in self.stages if stage.concurrency
+        }
+
+        if executor is None:
+            pool = ProcessPoolExecutor(max_workers=self.process_workers,
+                                       initializer=configure, initargs=settings())
+        else:
+            pool = contextlib.nullcontext(executor)
+        with pool as executor:
+            batchers = {
+                stage.name: _Batcher(stage, executor, len(items))
+                for stage in self.stages if stage.kind == "batch"
+            }
+            return await asyncio.gather(*[
+                self._run_item(run, inputs, executor, semaphores, batchers)
+                for run, inputs in items
+            ])
+
+    async def _run_item(self, run, inputs, executor, semaphores, batchers):
+        loop = asyncio.get_running_loop()
+        futures = {name: loop.create_future() for name in inputs}
+        for name, value in inputs.items():
+            futures[name].set_result(value)
+        for stage in self.stages:
+            futures[stage.name] = loop.create_future()
+        run_spans = []
+
+        async def run_stage(stage):
+            try:
+                for dependency in stage.deps + stage.after:
+                    await asyncio.shield(futures[dependency])
+            except Exception as e:
+                if stage.name in batchers:
+                    batchers[stage.name].skip()
+                futures[stage.name].set_exception(
+                    StageFailed(f"{stage.name} skipped: {str(e)}"))
+                return
+
+            kwargs = {dependency: futures[dependency].result()
+                      for dependency in stage.deps}
+            ready = time.time()
+            try:
+                if stage.kind == "batch":
+                    result, spans = await batchers[stage.name].submit(run, kwargs)
+                else:
+                    semaphore = semaphores.get(stage.name)
+                    if semaphore is not None:
+                        await semaphore.acquire()
+                    try:
+                        call = functools.partial(call_collected, stage.name, stage.func,
+                                                 run, **kwargs)
+                        if stage.kind == "cpu":
+                            result, spans = await loop.run_in_executor(executor, call)
+                        else:
+                            result, spans = await asyncio.to_thread(call)
+                    finally:
+                        if semaphore is not None:
+                            semaphore.release()
+                error = None
+            except Exception as e:
+                logger.error(f"Stage {stage.name} failed: {str(e)}")
+                result, spans, error = None, getattr(e, "metrics_spans", []), e
+            for span in spans:
+                if span["name"] == stage.name and span["parent"] is None:
+                    span["attributes"]["queued_seconds"] = max(0.0, span["start"] - ready)
+            run_spans.extend(spans)
+            if error is not None:
+                futures[stage.name].set_exception(error)
+            else:
+                futures[stage.name].set_result(result)
+
+        await asyncio.gather(*[run_stage(stage) for stage in self.stages])
+
+        outcome = {}
+        for stage in self.stages:
+            future = futures[stage.name]
+            outcome[stage.name] = future.exception() or future.result()
+        outcome["spans"] = sorted(run_spans, key=lambda span: span["start"])
+        return outcome
@@ -0,0 +1,287 @@
+import os
+import sys
+import time
+import random
+import logging
+import threading
+import functools
+import contextlib
+import contextvars
+from collections import Counter
+from config import PROFILE_STAGES, PROFILER, PROFILE_SAMPLE_RATE, PROFILE_DIR
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('profiling')
+
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples of the sampling profiler
+MAX_COLLAPSED_DEPTH = 200  # Deepest stack written when collapsing a cProfile profile
+
+# Stage names that can be profiled, see profiled()
+STAGE_NAMES = ("generate_content", "generate_audio", "generate_image", "align_text_mfa",
+               "align_runs_mfa", "parse_textgrid", "create_shorts_video")
+
+_settings = {}
+
+# Run directories that profiles of the current call go to: None outside of
+# a run, empty if the run was not sampled
+_run_directories = contextvars.ContextVar("profiling_run_directories", default=None)
+# Whether a profiler is already running for this call stack
+_active = contextvars.ContextVar("profiling_active", default=False)
+
+
+def configure(stages=PROFILE_STAGES, profiler=PROFILER, sample_rate=PROFILE_SAMPLE_RATE):
+    """
+    Choose which stages are profiled, with which profiler and how often.
+
+    The settings apply to this process only. Process pools pass them to
+    their workers with configure as initializer and settings() as initargs,
+    so pools created before a call keep the settings they started with.
+
+    Args:
+        stages (str or list): Stage names (see STAGE_NAMES), comma-separated
+                              or as a list; "all" for every stage, "" for none
+        profiler (str): "cprofile" for a deterministic profile (.prof), or
+                        "sampling" for a low-overhead collapsed-stack file
+                        (.collapsed) for flame graphs. cProfile profiles are
+                        also written as .collapsed, built from the call graph.
+        sample_rate (int): Profile 1 in sample_rate runs
+    """
+    if isinstance(stages, str):
+        stages = [name.strip() for name in stages.split(",") if name.strip()]
+    stages = set(STAGE_NAMES) if "all" in stages else set(stages)
+    unknown = stages - set(STAGE_NAMES)
+    if unknown:
+        logger.warning(f"Unknown stages to profile: {', '.join(sorted(unknown))}")
+    if profiler not in ("cprofile", "sampling"):
+        raise ValueError(f"Unknown profiler: {profiler}")
+
+    _settings.update(stages=stages, profiler=profiler, sample_rate=max(int(sample_rate), 1))
+
+
+configure()
+
+
+def settings():
+    """
+    Returns:
+        tuple: The current (stages, profiler, sample_rate), the arguments of
+               configure, e.g. as initargs for a process pool
+    """
+    return sorted(_settings["stages"]), _settings["profiler"], _settings["sample_rate"]
+
+
+def sample_run():
+    """
+    Decide whether a run is profiled, for 1 in PROFILE_SAMPLE_RATE runs.
+
+    Returns:
+        bool: True if the run should be profiled
+    """
+    return bool(_settings["stages"]) and random.randrange(_settings["sample_rate"]) == 0
+
+
+@contextlib.contextmanager
+def run_context(directories):
+    """
+    Send profiles of the profiled stages called inside the block to these directories.
+
+    Args:
+        directories (list): Run directories (transcribed/<id>) of the sampled
+                            runs being processed; empty if none were sampled
+    """
+    token = _run_directories.set(list(directories))
+    try:
+        yield
+    finally:
+        _run_directories.reset(token)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of one thread at a fixed interval.
+
+    Much cheaper than cProfile for long stages such as renders, and the
+    result is written as collapsed stacks ("frame;frame;frame count" lines)
+    that flamegraph.pl, speedscope and similar tools read directly.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _CProfiler:
+    """cProfile behind the same start/stop/write interface as SamplingProfiler."""
+
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        """Write the .prof file to path, and next to it the same profile as collapsed stacks."""
+        self.profile.dump_stats(path)
+        import pstats
+        stacks = _collapse(pstats.Stats(self.profile).stats)
+        with open(os.path.splitext(path)[0] + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, microseconds in stacks.most_common():
+                f.write(f"{stack} {microseconds}\n")
+
+
+def _pstats_label(function):
+    filename, line, name = function
+    if filename == "~":  # Built-in
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _collapse(stats, max_depth=MAX_COLLAPSED_DEPTH):
+    """
+    Turn cProfile statistics into collapsed stacks weighted by microseconds.
+
+    cProfile keeps only caller -> callee edges, not whole stacks, so every
+    function's own time is split over the paths leading to it in proportion
+    to the cumulative time spent through each edge. Recursion is cut at the
+    first repeated function.
+
+    Args:
+        stats (dict): pstats.Stats.stats, function -> (cc, nc, tt, ct, callers)
+        max_depth (int): Deeper stacks are cut off and their time dropped
+
+    Returns:
+        Counter: "frame;frame;frame" -> microseconds of own time
+    """
+    callees = {}
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+
+    stacks = Counter()
+
+    def visit(function, path, labels, cumulative):
+        _, _, own, total, _ = stats[function]
+        scale = cumulative / total if total else 0.0
+        microseconds = round(own * scale * 1e6)
+        if microseconds:
+            stacks[";".join(labels)] += microseconds
+        if len(labels) >= max_depth:
+            return
+        for callee, edge_cumulative in callees.get(function, ()):
+            time_through = edge_cumulative * scale
+            if callee in path or time_through < 1e-6:
+                continue
+            visit(callee, path | {callee}, labels + [_pstats_label(callee)], time_through)
+
+    for function, (_, _, _, total, callers) in stats.items():
+        if not callers:
+            visit(function, {function}, [_pstats_label(function)], total)
+    return stacks
+
+
+def _start_profiler(kind):
+    """Start a profiler, falling back to sampling if cProfile is already in use."""
+    if kind == "cprofile":
+        profiler = _CProfiler()
+        try:
+            profiler.start()
+            return profiler, "prof"
+        except ValueError:
+            # Python 3.12+ allows one cProfile per process, e.g. when two
+            # profiled stages run at once in different threads
+            logger.info("cProfile is busy, using the sampling profiler")
+    profiler = SamplingProfiler()
+    profiler.start()
+    return profiler, "collapsed"
+
+
+def _write_profiles(profiler, extension, name, directories):
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    for directory in directories:
+        profile_dir = os.path.join(directory, "profiles")
+        path = os.path.join(profile_dir, f"{name}.{stamp}.{os.getpid()}.{extension}")
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.write(path)
+            logger.info(f"Wrote {name} profile to {path}")
+        except OSError as e:
+            logger.warning(f"Error writing profile {path}: {str(e)}")
+
+
+def profiled(name, directory=None):
+    """
+    Decorate a stage so it is profiled when PROFILE_STAGES selects it.
+
+    Inside a pipeline run (see run_context) the profile goes to the
+    profiles/ folder of each sampled run's directory. Called on its own, the
+    call itself is sampled and the profile goes to directory(*args, **kwargs)
+    if given, else to PROFILE_DIR. A profiled stage called from another
+    profiled stage is only covered by the outer profile.
+
+    Args:
+        name (str): Stage name, one of STAGE_NAMES
+        directory (callable, optional): Maps the call's arguments to the run
+                                        directory of a standalone call
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if name not in _settings["stages"] or _active.get():
+                return func(*args, **kwargs)
+
+            directories = _run_directories.get()
+            if directories is None:
+                if not sample_run():
+                    return func(*args, **kwargs)
+                directories = [directory(*args, **kwargs) if directory else PROFILE_DIR]
+            if not directories:
+                return func(*args, **kwargs)
+
+            token = _active.set(True)
+            profiler, extension = _start_profiler(_settings["profiler"])
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.stop()
+                _active.reset(token)
+                _write_profiles(profiler, extension, name, directories)
+        return wrapper
+    return decorate
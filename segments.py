@@ -0,0 +1,183 @@
+import os
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from ffmpeg_render import encoder_args
+from metrics import span, call_collected, add_spans
+from config import RENDER_PROFILES
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('segments')
+
+
+def _ffmpeg():
+    return os.environ.get("IMAGEIO_FFMPEG_EXE", "ffmpeg")
+
+
+def plan_segments(groups, duration, fps, count):
+    """
+    Split a video's frames into at most count contiguous segments.
+
+    Cuts are placed on caption-group starts, picking for each ideal even
+    split the closest group start, so every segment begins with a new
+    caption. Cuts are snapped to frame boundaries.
+
+    Args:
+        groups (list): Caption group tuples (start_time, end_time, text)
+        duration (float): Video duration in seconds
+        fps (int): Frame rate
+        count (int): Maximum number of segments
+
+    Returns:
+        list: (first_frame, end_frame) pairs covering every frame, end exclusive
+    """
+    total_frames = int(duration * fps)
+    candidates = sorted({int(round(start * fps)) for start, _, _ in groups})
+    candidates = [frame for frame in candidates if 0 < frame < total_frames]
+
+    cuts = []
+    for index in range(1, max(count, 1)):
+        if not candidates:
+            break
+        target = total_frames * index / count
+        cut = min(candidates, key=lambda frame: abs(frame - target))
+        candidates.remove(cut)
+        cuts.append(cut)
+
+    bounds = [0] + sorted(cuts) + [total_frames]
+    return [(first, end) for first, end in zip(bounds, bounds[1:]) if end > first]
+
+
+def encode_frames(frame_source, first_frame, end_frame, frame_size, fps, output_path,
+                  encoding=RENDER_PROFILES["final"]):
+    """
+    Encode frames first_frame..end_frame-1 of a video to H.264 without audio.
+
+    Frame i is taken at t = i / fps, the same times MoviePy's write_videofile
+    uses, so segments line up exactly with a single-pass render.
+
+    Args:
+        frame_source (callable): Returns the RGB uint8 frame for a time t
+        first_frame (int): Index of the first frame to encode
+        end_frame (int): Index after the last frame to encode
+        frame_size (tuple): (width, height) of the frames
+        fps (int): Frame rate
+        output_path (str): Path of the video file to write
+        encoding (dict): Encoder settings of a render profile
+
+    Returns:
+        str: The output path
+    """
+    width, height = frame_size
+    process = subprocess.Popen([
+        _ffmpeg(), "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+        "-r", str(fps), "-i", "pipe:0",
+        *encoder_args(encoding),
+        output_path,
+    ], stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    try:
+        for index in range(first_frame, end_frame):
+            process.stdin.write(frame_source(index / fps).tobytes())
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = process.stderr.read()
+        process.wait()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, "ffmpeg", stderr=stderr)
+    return output_path
+
+
+def _render_segment(factory, first_frame, end_frame, frame_size, fps, output_path, encoding):
+    """Build the frame source in this worker and encode one segment with it."""
+    compositor = factory()
+    return encode_frames(compositor.frame, first_frame, end_frame, frame_size, fps,
+                         output_path, encoding)
+
+
+def concat_segments(segment_paths, audio_path, audio_duration, output_path):
+    """
+    Join video segments losslessly and add one continuous audio track.
+
+    The segments are stream-copied with ffmpeg's concat demuxer. The audio
+    is encoded once for the whole video, cut or padded with silence to
+    audio_duration, so there are no gaps at segment boundaries.
+
+    Returns:
+        str: The output path
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+        list_path = f.name
+
+    try:
+        subprocess.run([
+            _ffmpeg(), "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", audio_path,
+            "-map", "0:v", "-map", "1:a",
+            "-c:v", "copy",
+            # Same sample rate and channels as MoviePy's audio writer
+            "-af", f"apad,atrim=0:{audio_duration:.6f}", "-ar", "44100", "-ac", "2",
+            "-c:a", "aac",
+            output_path,
+        ], check=True, capture_output=True)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def render_segmented(factory, groups, duration, frame_size, fps, audio_path, audio_duration,
+                     output_path, workers, encoding=RENDER_PROFILES["final"]):
+    """
+    Render a video in parallel segments split on caption-group boundaries.
+
+    Each segment is rendered by its own worker process, which calls factory()
+    to build the frame source (an object with a frame(t) method) and encodes
+    its frames. The segments are then concatenated without re-encoding.
+
+    Args:
+        factory (callable): Picklable callable returning the frame source
+        groups (list): Caption group tuples (start_time, end_time, text)
+        duration (float): Video duration in seconds
+        frame_size (tuple): (width, height) of the video
+        fps (int): Frame rate
+        audio_path (str): Path to the narration audio
+        audio_duration (float): Length of the audio track in the output
+        output_path (str): Path of the video file to write
+        workers (int): Number of segments and worker processes
+        encoding (dict): Encoder settings of a render profile
+
+    Returns:
+        str: The output path
+    """
+    segments = plan_segments(groups, duration, fps, workers)
+    logger.info(f"Rendering {output_path} in {len(segments)} segments")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        segment_paths = [os.path.join(work_dir, f"segment_{index:03d}.mp4")
+                         for index in range(len(segments))]
+        with span("render.segments", segments=len(segments)), \
+                ProcessPoolExecutor(max_workers=len(segments)) as executor:
+            # Each worker sends back the spans of its segment
+            futures = [
+                executor.submit(call_collected, "render.segment", _render_segment, factory,
+                                first, end, frame_size, fps, path, encoding)
+                for (first, end), path in zip(segments, segment_paths)
+            ]
+            for future in futures:
+                _, spans = future.result()
+                add_spans(spans)
+
+        with span("render.concat"):
+            return concat_segments(segment_paths, audio_path, audio_duration, output_path)
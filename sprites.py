@@ -0,0 +1,208 @@
+import os
+import logging
+import functools
+import threading
+import numpy as np
+from PIL import Image
+from cache import content_key
+from compositor import resolve_position
+from captions import alpha_blit
+from config import CACHE_DIR
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('sprites')
+
+SPRITE_CACHE_DIR = os.path.join(CACHE_DIR, "sprites")
+SPRITE_FORMAT_VERSION = 1  # Bump when the cached layout changes
+
+_write_lock = threading.Lock()
+
+
+def grow_size(t, aspect_ratio, initial_height, final_height, grow_duration):
+    """
+    Size (width, height) of a sprite that grows linearly from initial_height
+    to final_height over grow_duration seconds.
+    """
+    if t > grow_duration:
+        return int(final_height * aspect_ratio), int(final_height)
+    height = int(initial_height + (t / grow_duration) * (final_height - initial_height))
+    return int(height * aspect_ratio), height
+
+
+def _resize_rgba(rgba, size):
+    """
+    Resize an RGBA frame with LANCZOS the way MoviePy resizes a clip and its mask.
+
+    Color and alpha are resampled separately (not premultiplied), and alpha
+    makes the same float round trip as a resized MoviePy mask.
+    """
+    rgb = np.array(Image.fromarray(np.ascontiguousarray(rgba[..., :3])).resize(
+        size, Image.Resampling.LANCZOS))
+    mask = (255 * (rgba[..., 3] / 255.0)).astype(np.uint8)
+    mask = np.array(Image.fromarray(mask).resize(size, Image.Resampling.LANCZOS))
+    alpha = (255 * (mask / 255.0)).astype(np.uint8)
+    return np.dstack([rgb, alpha])
+
+
+def _decode(path):
+    """
+    Decode every frame of an animation into an (n, height, width, 4) RGBA stack.
+
+    Returns:
+        tuple: (frames, fps, duration)
+    """
+    from moviepy import VideoFileClip
+
+    clip = VideoFileClip(path, has_mask=True)
+    try:
+        frames = []
+        for index in range(clip.reader.n_frames):
+            t = index / clip.fps
+            rgb = clip.get_frame(t).astype(np.uint8)
+            alpha = (clip.mask.get_frame(t) * 255).astype(np.uint8)
+            frames.append(np.dstack([rgb, alpha]))
+        return np.stack(frames), clip.fps, clip.duration
+    finally:
+        clip.close()
+
+
+class Sprite:
+    """
+    A looping animation decoded once and pre-scaled for drawing.
+
+    frames holds every source frame at final_height. The frames shown while
+    the sprite grows in are precomputed for the render frame rate in
+    grow_frames, so no frame is resampled at render time.
+    """
+
+    def __init__(self, frames, fps, duration, grow_frames, render_fps, initial_height,
+                 grow_duration):
+        self.frames = frames
+        self.fps = fps
+        self.duration = duration
+        self.grow_frames = grow_frames
+        self.render_fps = render_fps
+        self.initial_height = initial_height
+        self.grow_duration = grow_duration
+
+    def frame_index(self, t):
+        """Index of the source frame shown at time t, looping the animation."""
+        index = int(self.fps * (t % self.duration) + 0.00001)
+        return min(index, len(self.frames) - 1)
+
+    def frame_at(self, t):
+        """Return the RGBA frame of the sprite at time t."""
+        if t <= self.grow_duration:
+            step = round(t * self.render_fps)
+            if step < len(self.grow_frames) and abs(step / self.render_fps - t) < 1e-6:
+                return self.grow_frames[step]
+            # Off the render frame grid: scale the final-size frame down instead
+            height, width = self.frames.shape[1:3]
+            return _resize_rgba(self.frames[self.frame_index(t)], grow_size(
+                t, width / height, self.initial_height, height, self.grow_duration))
+        return self.frames[self.frame_index(t)]
+
+
+def _build(path, initial_height, final_height, grow_duration, render_fps):
+    frames, fps, duration = _decode(path)
+    aspect_ratio = frames.shape[2] / frames.shape[1]
+    final_size = grow_size(grow_duration + 1, aspect_ratio, initial_height,
+                           final_height, grow_duration)
+    scaled = np.stack([_resize_rgba(frame, final_size) for frame in frames])
+
+    sprite = Sprite(scaled, fps, duration, [], render_fps, initial_height, grow_duration)
+    for step in range(int(grow_duration * render_fps) + 1):
+        t = step / render_fps
+        size = grow_size(t, aspect_ratio, initial_height, final_height, grow_duration)
+        sprite.grow_frames.append(_resize_rgba(frames[sprite.frame_index(t)], size))
+    return sprite
+
+
+def _save(sprite, frames_path, meta_path):
+    """Write a sprite to disk; the metadata file is written last and marks it complete."""
+    with _write_lock:
+        temp_path = f"{frames_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, sprite.frames)
+        os.replace(temp_path, frames_path)
+
+        temp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, fps=sprite.fps, duration=sprite.duration,
+                     render_fps=sprite.render_fps, initial_height=sprite.initial_height,
+                     grow_duration=sprite.grow_duration,
+                     **{f"grow_frame_{i}": frame for i, frame in enumerate(sprite.grow_frames)})
+        os.replace(temp_path, meta_path)
+
+
+def _load(frames_path, meta_path):
+    with np.load(meta_path) as meta:
+        grow_frames = [meta[f"grow_frame_{i}"] for i in range(
+            sum(1 for name in meta.files if name.startswith("grow_frame_")))]
+        return Sprite(np.load(frames_path, mmap_mode="r"), float(meta["fps"]),
+                      float(meta["duration"]), grow_frames, float(meta["render_fps"]),
+                      int(meta["initial_height"]), float(meta["grow_duration"]))
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_sprite(key, path, initial_height, final_height, grow_duration, render_fps):
+    frames_path = os.path.join(SPRITE_CACHE_DIR, f"{key}.npy")
+    meta_path = os.path.join(SPRITE_CACHE_DIR, f"{key}.npz")
+
+    if os.path.exists(meta_path):
+        try:
+            return _load(frames_path, meta_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable sprite cache {meta_path}: {str(e)}")
+
+    logger.info(f"Decoding sprite {path} at {final_height}px")
+    sprite = _build(path, initial_height, final_height, grow_duration, render_fps)
+    try:
+        os.makedirs(SPRITE_CACHE_DIR, exist_ok=True)
+        _save(sprite, frames_path, meta_path)
+        sprite.frames = np.load(frames_path, mmap_mode="r")
+    except OSError as e:
+        logger.warning(f"Error storing sprite cache: {str(e)}")
+    return sprite
+
+
+def load_sprite(path, initial_height, final_height, grow_duration, render_fps):
+    """
+    Return the sprite for an animation file, decoding it only when needed.
+
+    Sprites are kept per process and in a memory-mapped file under
+    SPRITE_CACHE_DIR, keyed by the file's path, size and modification time
+    and by the scaling parameters.
+
+    Args:
+        path (str): Path to the animation (e.g. a GIF)
+        initial_height (int): Height when the sprite first appears
+        final_height (int): Height once it has grown in
+        grow_duration (float): Seconds the grow-in takes
+        render_fps (float): Frame rate the grow-in frames are precomputed for
+
+    Returns:
+        Sprite: The decoded, pre-scaled sprite
+    """
+    stat = os.stat(path)
+    key = content_key(SPRITE_FORMAT_VERSION, os.path.abspath(path), stat.st_size,
+                      stat.st_mtime_ns, initial_height, final_height, grow_duration,
+                      render_fps)
+    return _cached_sprite(key, path, initial_height, final_height, grow_duration, render_fps)
+
+
+class SpriteLayer:
+    """A sprite drawn at a MoviePy-style position, e.g. ("center", "bottom")."""
+
+    def __init__(self, sprite, position, frame_size):
+        self.sprite = sprite
+        self.position = position
+        self.frame_size = frame_size
+
+    def draw(self, frame, t):
+        """Blit the sprite's frame at time t onto the frame in place."""
+        rgba = self.sprite.frame_at(t)
+        x, y = resolve_position(self.position, self.frame_size, rgba.shape[1], rgba.shape[0])
+        return alpha_blit(frame, rgba, x, y)
@@ -0,0 +1,110 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import aligner_service
+import text_aligner
+from aligner_service import AlignerService, request_alignment
+
+AUTHKEY = "test-secret"
+
+
+class FakeMfaCli:
+    """Stands in for MFA's click command: writes a TextGrid per utterance."""
+
+    def __init__(self):
+        self.calls = []
+
+    def main(self, args, standalone_mode=True):
+        self.calls.append(args)
+        corpus_dir, aligned_dir = args[-4], args[-1]
+        for file in os.listdir(corpus_dir):
+            stem, extension = os.path.splitext(file)
+            if extension == ".wav":
+                with open(os.path.join(aligned_dir, f"{stem}.TextGrid"), "w") as f:
+                    f.write("aligned")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _run(tmp_path, name):
+    input_path = tmp_path / name
+    input_path.mkdir()
+    (input_path / f"{name}.txt").write_text("hello world")
+    (input_path / f"{name}.wav").write_bytes(b"RIFF")
+    return str(input_path), str(tmp_path / name / "alignment")
+
+
+@pytest.fixture
+def service(tmp_path):
+    mfa_cli = FakeMfaCli()
+    address = ("127.0.0.1", _free_port())
+    service = AlignerService(work_dir=str(tmp_path / "service"), mfa_cli=mfa_cli)
+    threading.Thread(target=service.serve_forever, args=(address, AUTHKEY),
+                     daemon=True).start()
+    # Wait until the listener accepts connections
+    for _ in range(100):
+        try:
+            socket.create_connection(address, timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.02)
+    return address, mfa_cli
+
+
+def test_service_aligns_every_run_of_a_job(tmp_path, service):
+    address, mfa_cli = service
+    runs = [_run(tmp_path, "a"), _run(tmp_path, "b")]
+
+    status = request_alignment(runs, num_jobs=2, address=address, authkey=AUTHKEY)
+
+    assert status == {runs[0][1]: True, runs[1][1]: True}
+    assert os.path.exists(os.path.join(runs[0][1], "a.TextGrid"))
+    assert len(mfa_cli.calls) == 1
+    assert mfa_cli.calls[0][:3] == ["align", "--num_jobs", "2"]
+    # The job's corpus is removed afterwards
+    assert os.listdir(os.path.join(tmp_path, "service", "jobs")) == []
+
+
+def test_service_serves_several_requests_per_connection(tmp_path, service):
+    address, mfa_cli = service
+    first, second = _run(tmp_path, "a"), _run(tmp_path, "b")
+
+    assert request_alignment([first], address=address, authkey=AUTHKEY) == {first[1]: True}
+    assert request_alignment([second], address=address, authkey=AUTHKEY) == {second[1]: True}
+    assert len(mfa_cli.calls) == 2
+
+
+def test_wrong_key_is_rejected(tmp_path, service):
+    address, mfa_cli = service
+
+    assert request_alignment([_run(tmp_path, "a")], address=address, authkey="wrong") is None
+    assert mfa_cli.calls == []
+
+
+def test_unreachable_service_returns_none(tmp_path):
+    address = ("127.0.0.1", _free_port())
+    assert request_alignment([_run(tmp_path, "a")], address=address, authkey=AUTHKEY) is None
+
+
+def test_align_runs_falls_back_to_the_subprocess(tmp_path, monkeypatch):
+    # Without a service key the service is taken to be not running
+    monkeypatch.setattr(aligner_service, "read_authkey", lambda: None)
+    calls = []
+
+    def align_runs_mfa(runs, num_jobs):
+        calls.append((runs, num_jobs))
+        return {output_path: True for _, output_path in runs}
+
+    monkeypatch.setattr(text_aligner, "align_runs_mfa", align_runs_mfa)
+    runs = [_run(tmp_path, "a")]
+
+    assert text_aligner.align_runs(runs, num_jobs=3, backend="service") == {runs[0][1]: True}
+    assert calls == [(runs, 3)]
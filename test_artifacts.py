@@ -0,0 +1,134 @@
+import base64
+
+import pytest
+
+from artifacts import ArticleResult, ArtifactStore, map_file
+
+
+@pytest.fixture
+def media(tmp_path):
+    wav_path = tmp_path / "run.wav"
+    wav_path.write_bytes(b"RIFF-audio")
+    image_path = tmp_path / "run.png"
+    image_path.write_bytes(b"PNG-image")
+    return str(wav_path), str(image_path)
+
+
+def _result(media, **fields):
+    wav_path, image_path = media
+    return ArticleResult(status="success",
+                         audio_results={"wav_path": wav_path},
+                         image_results={"image_path": image_path}, **fields)
+
+
+def test_uses_slots():
+    result = ArticleResult()
+    assert not hasattr(result, "__dict__")
+    with pytest.raises(AttributeError):
+        result.unknown = 1
+
+
+def test_keys_present_only_when_set():
+    result = ArticleResult(status="error", error="boom")
+
+    assert list(result) == ["status", "error"]
+    assert "summary" not in result
+    with pytest.raises(KeyError):
+        result["summary"]
+    assert result.get("summary") is None
+
+    del result["error"]
+    assert "error" not in result
+    with pytest.raises(KeyError):
+        del result["error"]
+
+
+def test_extra_keys_kept_in_dict():
+    result = ArticleResult(status="success", custom=[1, 2])
+
+    assert result["custom"] == [1, 2]
+    assert result.extra == {"custom": [1, 2]}
+    assert list(result) == ["status", "custom"]
+    assert len(result) == 2
+    del result["custom"]
+    assert "custom" not in result
+
+
+def test_base64_keys_encode_files(media):
+    result = _result(media)
+
+    assert "audio_base64" in result
+    assert base64.b64decode(result["audio_base64"]) == b"RIFF-audio"
+    assert base64.b64decode(result["image_base64"]) == b"PNG-image"
+    # Base64 keys follow the fields and are not stored on the result
+    assert list(result)[-2:] == list(ArticleResult.BASE64_KEYS)
+    assert result.extra == {}
+    assert set(result.to_dict()) == {"status", "audio_results", "image_results",
+                                     "audio_base64", "image_base64"}
+
+
+def test_base64_keys_absent_while_file_missing(media, tmp_path):
+    result = _result(media)
+    (tmp_path / "run.wav").unlink()
+
+    assert "audio_base64" not in result
+    assert "audio_base64" not in list(result)
+    with pytest.raises(KeyError):
+        result["audio_base64"]
+    assert "image_base64" in result
+
+
+def test_base64_keys_absent_without_paths():
+    result = ArticleResult(status="success", audio_results={"success": False})
+
+    assert "audio_base64" not in result
+    assert "image_base64" not in result
+    assert list(result) == ["status", "audio_results"]
+
+
+def test_base64_keys_can_be_turned_off(media):
+    result = _result(media, include_base64=False)
+
+    assert "audio_base64" not in result
+    assert not any(key in ArticleResult.BASE64_KEYS for key in result)
+
+
+def test_explicit_base64_value_wins(media):
+    result = _result(media)
+    result["audio_base64"] = "given"
+
+    assert result["audio_base64"] == "given"
+    assert list(result).count("audio_base64") == 1
+
+
+def test_media_views(media):
+    result = _result(media)
+
+    assert bytes(result.audio()) == b"RIFF-audio"
+    assert bytes(result.image()) == b"PNG-image"
+
+
+def test_map_empty_file(tmp_path):
+    path = tmp_path / "empty"
+    path.write_bytes(b"")
+
+    assert bytes(map_file(str(path))) == b""
+
+
+def test_store_paths_and_listing(tmp_path):
+    store = ArtifactStore("run", root=str(tmp_path))
+    for name in ("run.txt", "run.wav", "run.flac", "run.png", "alignment/run.TextGrid"):
+        with open(store.path(name), "w") as f:
+            f.write("x")
+
+    assert store.listing() == {
+        "transcription": ["run.flac", "run.txt", "run.wav"],
+        "alignment": ["run.TextGrid"],
+        "image": ["run.png"],
+    }
+
+
+def test_listing_of_missing_run(tmp_path):
+    store = ArtifactStore("missing", root=str(tmp_path))
+
+    assert store.listing() == {"transcription": [], "alignment": [], "image": []}
@@ -0,0 +1,145 @@
+import os
+import time
+
+from cache import BlobStore, DiskCache, TieredCache, content_key
+
+
+def _age(cache, key, seconds):
+    """Make an entry look last used seconds ago."""
+    then = time.time() - seconds
+    os.utime(cache._path(key), (then, then))
+
+
+def test_content_key_is_stable():
+    assert content_key("a", {"x": 1, "y": 2}) == content_key("a", {"y": 2, "x": 1})
+    assert content_key("a") != content_key("b")
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set("k1", {"summary": "text"})
+
+    assert cache.get("k1") == {"summary": "text"}
+    assert cache.get("missing") is None
+    # A new instance sees the stored entry and its size
+    assert DiskCache(str(tmp_path))._size == cache._size > 0
+
+
+def test_ttl_counts_from_creation_not_last_read(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    cache.set("k1", "value")
+
+    # Reads refresh the modification time but not the time-to-live
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 45)
+    assert cache.get("k1") == "value"
+    monkeypatch.setattr(time, "time", lambda: now + 90)
+    assert cache.get("k1") is None
+    assert not os.path.exists(cache._path("k1"))
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    for index, key in enumerate(("k1", "k2", "k3")):
+        cache.set(key, "x" * 100)
+        _age(cache, key, 100 - index)
+    cache.get("k1")  # Now the most recently used
+
+    cache.max_bytes = cache._size - 1
+    cache.evict()
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") == cache.get("k3") == "x" * 100
+    assert cache._size <= cache.max_bytes
+
+
+def test_set_evicts_over_budget(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=300)
+    for key in ("k1", "k2", "k3", "k4"):
+        cache.set(key, "x" * 100)
+        _age(cache, key, 100)
+
+    assert sum(cache.get(key) is not None for key in ("k1", "k2", "k3", "k4")) == 2
+    assert cache._size <= 300
+
+
+def test_unreadable_entry_is_discarded(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set("k1", "value")
+    with open(cache._path("k1"), "w") as f:
+        f.write("{not json")
+
+    assert cache.get("k1") is None
+    assert not os.path.exists(cache._path("k1"))
+
+
+def test_tiered_cache_expires_memory_layer(tmp_path, monkeypatch):
+    cache = TieredCache(str(tmp_path), ttl=60)
+    cache.set("k1", "value")
+    assert cache.get("k1") == "value"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 90)
+    assert cache.get("k1") is None
+
+
+def _file(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_blob_store_round_trip(tmp_path):
+    store = BlobStore(str(tmp_path / "store"))
+    source = _file(tmp_path, "run.wav", b"audio" * 100)
+    store.put("k1", {"wav": source})
+
+    paths = store.get("k1")
+    destination = str(tmp_path / "copy.wav")
+    BlobStore.materialize(paths["wav"], destination)
+
+    with open(destination, "rb") as f:
+        assert f.read() == b"audio" * 100
+    assert os.stat(destination).st_ino == os.stat(paths["wav"]).st_ino
+    assert os.stat(source).st_ino != os.stat(paths["wav"]).st_ino
+    assert store.get("missing") is None
+
+
+def test_blob_store_keeps_running_size(tmp_path):
+    store = BlobStore(str(tmp_path / "store"))
+    store.put("k1", {"wav": _file(tmp_path, "a", b"a" * 100)})
+    # The same content under another key is stored once
+    store.put("k2", {"wav": _file(tmp_path, "b", b"a" * 100),
+                     "mp3": _file(tmp_path, "c", b"c" * 50)})
+
+    assert store._size == 150
+    assert BlobStore(str(tmp_path / "store"))._size == 150
+
+
+def test_blob_store_lists_blobs_only_over_budget(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "store"), max_bytes=250)
+    listings = []
+    blobs = store._blobs
+    monkeypatch.setattr(store, "_blobs", lambda: listings.append(1) or blobs())
+
+    store.put("k1", {"wav": _file(tmp_path, "a", b"a" * 100)})
+    store.put("k2", {"wav": _file(tmp_path, "b", b"b" * 100)})
+    assert listings == []
+
+    store.put("k3", {"wav": _file(tmp_path, "c", b"c" * 100)})
+    assert listings == [1]
+
+
+def test_blob_store_evicts_blobs_with_their_entries(tmp_path):
+    store = BlobStore(str(tmp_path / "store"), max_bytes=250)
+    for index, key in enumerate(("k1", "k2")):
+        store.put(key, {"wav": _file(tmp_path, key, key.encode() * 50)})
+        then = time.time() - 100 + index
+        os.utime(store.get(key)["wav"], (then, then))
+
+    store.put("k3", {"wav": _file(tmp_path, "k3", b"k3" * 50)})
+
+    assert store.get("k1") is None
+    assert store.get("k2") is not None and store.get("k3") is not None
+    assert not os.path.exists(store.entries._path("k1"))
+    assert store._size == 200
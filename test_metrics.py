@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+import pytest
+
+import metrics
+from metrics import PrometheusExporter, collect, record, span
+
+HAS_PROC = os.path.exists("/proc/self/statm")
+
+
+def test_span_records_thread_cpu():
+    with collect() as spans:
+        with span("work", items=3):
+            sum(range(200000))
+
+    s, = spans
+    assert s["name"] == "work"
+    assert s["attributes"] == {"items": 3}
+    assert s["cpu_seconds"] > 0
+    assert s["wall_seconds"] >= 0
+
+
+async def _waiting_spans(seconds):
+    with collect() as spans:
+        with span("waiting"):
+            await asyncio.sleep(seconds)
+    return spans
+
+
+def test_span_on_event_loop_has_no_cpu_time():
+    s, = asyncio.run(_waiting_spans(0.01))
+    assert s["cpu_seconds"] is None
+    assert s["wall_seconds"] >= 0.01
+
+
+@pytest.mark.skipif(not HAS_PROC, reason="needs /proc")
+def test_span_reports_rss_change():
+    with collect() as spans:
+        with span("allocate"):
+            # Written, not just reserved, so the pages become resident
+            block = b"x" * (64 * 1024 * 1024)
+    del block
+
+    s, = spans
+    assert s["rss_bytes"] > 0
+    assert s["rss_delta_bytes"] >= 32 * 1024 * 1024
+
+
+def test_nested_spans_and_errors():
+    with collect() as spans:
+        with pytest.raises(ValueError):
+            with span("outer"):
+                with span("inner"):
+                    raise ValueError("boom")
+
+    inner, outer = spans
+    assert inner["parent"] == "outer"
+    assert outer["parent"] is None
+    assert inner["error"] == "ValueError: boom"
+
+
+def test_exporter_skips_missing_cpu_and_rss():
+    exporter = PrometheusExporter(prefix="test")
+    spans = asyncio.run(_waiting_spans(0))
+    spans[0]["rss_bytes"] = spans[0]["rss_delta_bytes"] = None
+
+    exporter.observe(spans)
+
+    text = exporter.render()
+    assert 'test_span_cpu_seconds_total{span="waiting"} 0.0' in text
+    assert 'test_span_rss_bytes{span="waiting"} 0' in text
+
+
+def test_record_without_metrics_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metrics, "exporter", PrometheusExporter())
+
+    record({"kind": "test", "spans": []}, path="")
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_record_appends_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "exporter", PrometheusExporter())
+    path = tmp_path / "metrics" / "spans.jsonl"
+
+    record({"kind": "test", "spans": []}, path=str(path))
+    record({"kind": "test", "spans": []}, path=str(path))
+
+    assert len(path.read_text().splitlines()) == 2
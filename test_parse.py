@@ -0,0 +1,164 @@
+import os
+
+import pytest
+
+from parse import SIDECAR_SUFFIX, parse_textgrid, read_textgrid
+
+LONG = '''File type = "ooTextFile"
+Object class = "TextGrid"
+
+xmin = 0
+xmax = 2.5
+tiers? <exists>
+size = 3
+item []:
+    item [1]:
+        class = "IntervalTier"
+        name = "phones"
+        xmin = 0
+        xmax = 2.5
+        intervals: size = 1
+        intervals [1]:
+            xmin = 0
+            xmax = 2.5
+            text = "HH"
+    item [2]:
+        class = "IntervalTier"
+        name = "words"
+        xmin = 0
+        xmax = 2.5
+        intervals: size = 3
+        intervals [1]:
+            xmin = 0
+            xmax = 1.2
+            text = "say ""hi"""
+        intervals [2]:
+            xmin = 1.2
+            xmax = 1.5
+            text = ""
+        intervals [3]:
+            xmin = 1.5
+            xmax = 2.5
+            text = "two
+lines"
+    item [3]:
+        class = "TextTier"
+        name = "marks"
+        xmin = 0
+        xmax = 2.5
+        points: size = 1
+        points [1]:
+            number = 0.7
+            mark = "beep"
+'''
+
+SHORT = '''File type = "ooTextFile"
+Object class = "TextGrid"
+
+0
+2.5
+<exists>
+3
+"IntervalTier"
+"phones"
+0
+2.5
+1
+0
+2.5
+"HH"
+"IntervalTier"
+"words"
+0
+2.5
+3
+0
+1.2
+"say ""hi"""
+1.2
+1.5
+""
+1.5
+2.5
+"two
+lines"
+"TextTier"
+"marks"
+0
+2.5
+1
+0.7
+"beep"
+'''
+
+WORDS = [(0.0, 1.2, 'say "hi"'), (1.5, 2.5, "two\nlines")]
+
+
+def _write(tmp_path, text, name="test.TextGrid", encoding="utf-8"):
+    path = tmp_path / name
+    path.write_text(text, encoding=encoding)
+    return str(path)
+
+
+@pytest.mark.parametrize("text", [LONG, SHORT], ids=["long", "short"])
+def test_long_and_short_format_read_the_same(tmp_path, text):
+    tiers = read_textgrid(_write(tmp_path, text), use_cache=False)
+
+    assert list(tiers) == ["phones", "words", "marks"]
+    assert [tier.kind for tier in tiers.values()] == ["IntervalTier", "IntervalTier", "TextTier"]
+    assert list(tiers["words"]) == [(0.0, 1.2, 'say "hi"'), (1.2, 1.5, ""),
+                                    (1.5, 2.5, "two\nlines")]
+    assert list(tiers["marks"]) == [(0.7, 0.7, "beep")]
+
+
+def test_utf16_file(tmp_path):
+    path = _write(tmp_path, LONG, encoding="utf-16")
+    assert parse_textgrid(path) == WORDS
+
+
+def test_parse_textgrid_reads_the_words_tier(tmp_path):
+    assert parse_textgrid(_write(tmp_path, LONG)) == WORDS
+    assert parse_textgrid(_write(tmp_path, LONG), tier_name="phones") == [(0.0, 2.5, "HH")]
+
+
+def test_falls_back_to_the_first_interval_tier(tmp_path):
+    path = _write(tmp_path, LONG.replace('name = "words"', 'name = "tokens"'))
+    assert parse_textgrid(path) == [(0.0, 2.5, "HH")]
+
+
+def test_no_interval_tier_gives_no_captions(tmp_path):
+    marks_only = SHORT[:SHORT.index('"IntervalTier"')].replace("<exists>\n3", "<exists>\n1")
+    marks_only += SHORT[SHORT.index('"TextTier"'):]
+    path = _write(tmp_path, marks_only)
+
+    assert list(read_textgrid(path, use_cache=False)) == ["marks"]
+    assert parse_textgrid(path) == []
+
+
+def test_truncated_file_is_an_error(tmp_path):
+    path = _write(tmp_path, LONG[:LONG.index("item [3]")])
+    with pytest.raises(ValueError):
+        read_textgrid(path, use_cache=False)
+    assert parse_textgrid(path) == []
+
+
+def test_sidecar_is_reused_until_the_textgrid_changes(tmp_path):
+    path = _write(tmp_path, LONG)
+    sidecar_path = path + SIDECAR_SUFFIX
+
+    assert parse_textgrid(path) == WORDS
+    assert os.path.exists(sidecar_path)
+    assert parse_textgrid(path) == WORDS
+
+    # A changed TextGrid invalidates the sidecar, even with the old mtime
+    stat = os.stat(path)
+    _write(tmp_path, LONG.replace('"beep"', '"a longer mark"').replace('"HH"', '"AH"'))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert parse_textgrid(path, tier_name="phones") == [(0.0, 2.5, "AH")]
+
+
+def test_unreadable_sidecar_is_ignored(tmp_path):
+    path = _write(tmp_path, LONG)
+    with open(path + SIDECAR_SUFFIX, "wb") as f:
+        f.write(b"not an npz file")
+    assert parse_textgrid(path) == WORDS
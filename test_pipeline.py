@@ -0,0 +1,184 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pipeline import Pipeline, Stage, StageFailed
+
+
+def _run(pipeline, items, timeout=5):
+    """Run a pipeline with a thread pool standing in for the process pool."""
+    async def main():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            return await asyncio.wait_for(pipeline.run(items, executor=executor), timeout)
+    return asyncio.run(main())
+
+
+class BatchRecorder:
+    """A "batch" stage function that records the size of every batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, jobs):
+        self.batches.append([run for run, _ in jobs])
+        return [f"{run}:{kwargs['value']}" for run, kwargs in jobs]
+
+
+def _fail_on(bad_run):
+    def value(run, number):
+        if run == bad_run:
+            raise ValueError(f"bad run {run}")
+        return number
+    return value
+
+
+def test_results_follow_dependencies():
+    pipeline = Pipeline([
+        Stage("double", lambda run, number: number * 2, deps=("number",)),
+        Stage("label", lambda run, double: f"{run}={double}", deps=("double",), kind="cpu"),
+    ])
+
+    outcomes = _run(pipeline, [("a", {"number": 1}), ("b", {"number": 2})])
+
+    assert [outcome["label"] for outcome in outcomes] == ["a=2", "b=4"]
+    names = [span["name"] for span in outcomes[0]["spans"]]
+    assert names == ["double", "label"]
+
+
+def test_failure_propagates_as_stage_failed():
+    ran = []
+    pipeline = Pipeline([
+        Stage("value", _fail_on("bad"), deps=("number",)),
+        Stage("dependent", lambda run, value: value + 1, deps=("value",)),
+        Stage("ordered", lambda run: ran.append(run), after=("dependent",)),
+        Stage("independent", lambda run, number: number, deps=("number",)),
+    ])
+
+    good, bad = _run(pipeline, [("good", {"number": 1}), ("bad", {"number": 2})])
+
+    assert good["dependent"] == 2
+    assert isinstance(bad["value"], ValueError)
+    assert isinstance(bad["dependent"], StageFailed)
+    assert "bad run bad" in str(bad["dependent"])
+    assert isinstance(bad["ordered"], StageFailed)
+    assert bad["independent"] == 2
+    assert ran == ["good"]
+    # The failed stage's span is still reported
+    assert [span["name"] for span in bad["spans"]].count("value") == 1
+
+
+def test_batch_stage_groups_runs():
+    recorder = BatchRecorder()
+    pipeline = Pipeline([
+        Stage("value", lambda run, number: number, deps=("number",)),
+        Stage("batch", recorder, deps=("value",), kind="batch",
+              batch_size=2, batch_window=60),
+    ])
+
+    outcomes = _run(pipeline, [(run, {"number": number})
+                               for number, run in enumerate("abcd")])
+
+    assert [outcome["batch"] for outcome in outcomes] == ["a:0", "b:1", "c:2", "d:3"]
+    assert sorted(len(batch) for batch in recorder.batches) == [2, 2]
+    batch_spans = [span for span in outcomes[0]["spans"] if span["name"] == "batch"]
+    assert batch_spans[0]["attributes"]["batch_size"] == 2
+
+
+def test_skip_flushes_partial_batch():
+    recorder = BatchRecorder()
+    pipeline = Pipeline([
+        Stage("value", _fail_on("b"), deps=("number",)),
+        Stage("batch", recorder, deps=("value",), kind="batch",
+              batch_size=3, batch_window=60),
+    ])
+
+    # With a 60 s window, only the skipped run can make the batch of two flush
+    started = time.perf_counter()
+    outcomes = _run(pipeline, [(run, {"number": number})
+                               for number, run in enumerate("abc")])
+
+    assert time.perf_counter() - started < 5
+    assert recorder.batches == [["a", "c"]]
+    assert outcomes[0]["batch"] == "a:0"
+    assert isinstance(outcomes[1]["batch"], StageFailed)
+    assert outcomes[2]["batch"] == "c:2"
+
+
+def test_batch_window_flushes_after_timeout():
+    recorder = BatchRecorder()
+
+    def value(run, number):
+        if run == "slow":
+            time.sleep(0.5)
+        return number
+
+    pipeline = Pipeline([
+        Stage("value", value, deps=("number",)),
+        Stage("batch", recorder, deps=("value",), kind="batch",
+              batch_size=2, batch_window=0.05),
+    ])
+
+    outcomes = _run(pipeline, [("fast", {"number": 1}), ("slow", {"number": 2})])
+
+    # The fast run does not wait for the slow one to fill the batch
+    assert recorder.batches == [["fast"], ["slow"]]
+    assert [outcome["batch"] for outcome in outcomes] == ["fast:1", "slow:2"]
+
+
+def test_batch_failure_fails_every_run_in_batch():
+    def broken(jobs):
+        raise RuntimeError("batch broke")
+
+    pipeline = Pipeline([
+        Stage("batch", broken, deps=("number",), kind="batch", batch_size=2),
+        Stage("after", lambda run, batch: batch, deps=("batch",)),
+    ])
+
+    outcomes = _run(pipeline, [("a", {"number": 1}), ("b", {"number": 2})])
+
+    for outcome in outcomes:
+        assert isinstance(outcome["batch"], RuntimeError)
+        assert isinstance(outcome["after"], StageFailed)
+
+
+def test_concurrency_limit():
+    active, peak = [0], [0]
+
+    def work(run):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        active[0] -= 1
+
+    pipeline = Pipeline([Stage("work", work, concurrency=1)])
+    _run(pipeline, [(run, {}) for run in range(4)])
+
+    assert peak[0] == 1
+
+
+def test_rejects_duplicate_names():
+    with pytest.raises(ValueError, match="unique"):
+        Pipeline([Stage("a", print), Stage("a", print)])
+
+
+def test_rejects_reserved_name():
+    with pytest.raises(ValueError, match="reserved"):
+        Pipeline([Stage("spans", print)])
+
+
+@pytest.mark.parametrize("stages", [
+    [Stage("a", print, deps=("b",)), Stage("b", print, deps=("a",))],
+    [Stage("a", print, after=("c",)), Stage("b", print, deps=("a",)),
+     Stage("c", print, deps=("b",))],
+    [Stage("a", print, deps=("a",))],
+])
+def test_rejects_cycles(stages):
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline(stages)
+
+
+def test_rejects_unknown_kind():
+    with pytest.raises(ValueError, match="Unknown stage kind"):
+        Stage("a", print, kind="gpu")
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import profiling
+from profiling import configure, profiled, run_context, settings
+
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+    before = settings()
+    yield
+    configure(*before)
+
+
+def _square_sum(n):
+    return sum(i * i for i in range(n))
+
+
+def _work():
+    _square_sum(100000)
+    time.sleep(0.01)
+
+
+def _worker_settings():
+    return settings()
+
+
+def test_configure_leaves_environment_alone(monkeypatch):
+    monkeypatch.delenv("PROFILE_STAGES", raising=False)
+
+    configure("parse_textgrid", "sampling", 4)
+
+    assert "PROFILE_STAGES" not in os.environ
+    assert settings() == (["parse_textgrid"], "sampling", 4)
+
+
+def test_configure_all_and_unknown_profiler():
+    configure("all")
+    assert settings()[0] == sorted(profiling.STAGE_NAMES)
+
+    with pytest.raises(ValueError):
+        configure("all", "perf")
+
+
+def test_pool_initializer_passes_settings():
+    configure("generate_audio,parse_textgrid", "sampling", 3)
+
+    # spawn starts from a fresh interpreter, which only has the config defaults
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=configure, initargs=settings()) as executor:
+        worker = executor.submit(_worker_settings).result()
+
+    assert worker == (["generate_audio", "parse_textgrid"], "sampling", 3)
+
+
+def test_cprofile_writes_collapsed_stacks(tmp_path):
+    configure("parse_textgrid", "cprofile")
+    stage = profiled("parse_textgrid")(_work)
+
+    with run_context([str(tmp_path)]):
+        stage()
+
+    files = sorted(os.listdir(tmp_path / "profiles"))
+    assert [os.path.splitext(file)[1] for file in files] == [".collapsed", ".prof"]
+    assert os.path.splitext(files[0])[0] == os.path.splitext(files[1])[0]
+
+    lines = (tmp_path / "profiles" / files[0]).read_text().splitlines()
+    stacks = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+    assert any(stack.startswith("_work (test_profiling.py")
+               and "_square_sum (test_profiling.py" in stack for stack in stacks)
+    # Microseconds of own time add up to about the profiled wall time
+    assert 10000 <= sum(stacks.values()) <= 1000000
+
+
+def test_collapse_splits_time_over_callers():
+    a, b, c = ("a.py", 1, "a"), ("b.py", 1, "b"), ("c.py", 1, "c")
+    stats = {
+        a: (1, 1, 1.0, 3.5, {}),
+        b: (1, 1, 0.5, 1.0, {a: (1, 1, 0.5, 1.0)}),
+        # c is called from a and b, spending 1.5 s below a and 0.5 s below b
+        c: (2, 2, 2.0, 2.0, {a: (1, 1, 1.5, 1.5), b: (1, 1, 0.5, 0.5)}),
+    }
+    stacks = profiling._collapse(stats)
+
+    assert stacks == {
+        "a (a.py:1)": 1000000,
+        "a (a.py:1);b (b.py:1)": 500000,
+        "a (a.py:1);c (c.py:1)": 1500000,
+        "a (a.py:1);b (b.py:1);c (c.py:1)": 500000,
+    }
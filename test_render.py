@@ -0,0 +1,123 @@
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from config import RENDER_PROFILES
+from ffmpeg_render import render_ffmpeg
+from movie import (BACKGROUND_COLOR, CORGI_GROW_DURATION, TREND_FADE_DURATION,
+                   build_compositor, render_frames, shorts_layout)
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+DURATION = 2.0
+# Near-lossless, so the comparison measures the compositing and not the encoder
+ENCODING = dict(RENDER_PROFILES["preview"], crf=12)
+
+
+TEXTGRID = '''File type = "ooTextFile"
+Object class = "TextGrid"
+
+xmin = 0
+xmax = 2
+tiers? <exists>
+size = 1
+item []:
+    item [1]:
+        class = "IntervalTier"
+        name = "words"
+        xmin = 0
+        xmax = 2
+        intervals: size = 2
+        intervals [1]:
+            xmin = 0
+            xmax = 0.8
+            text = "hello"
+        intervals [2]:
+            xmin = 0.8
+            xmax = 1.5
+            text = "world"
+'''
+
+
+def _images(folder):
+    image = np.zeros((256, 256, 3), dtype=np.uint8)
+    image[..., 0] = np.arange(256)[None, :]
+    image[..., 1] = np.arange(256)[:, None]
+    image[64:192, 64:192, 2] = 200
+    image_path = str(folder / "trend.png")
+    Image.fromarray(image).save(image_path)
+
+    frames = []
+    for shade in (90, 160):
+        sprite = Image.new("RGBA", (120, 100), (0, 0, 0, 0))
+        sprite.paste((230, shade, 40, 255), (20, 10, 100, 90))
+        frames.append(sprite)
+    corgi_path = str(folder / "corgi.gif")
+    frames[0].save(corgi_path, save_all=True, append_images=frames[1:], duration=500,
+                   loop=0, disposal=2)
+    return image_path, corgi_path
+
+
+def _assets(folder):
+    image_path, corgi_path = _images(folder)
+    audio_path = str(folder / "narration.wav")
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i",
+                    "anullsrc=r=16000:cl=mono", "-t", str(DURATION), audio_path], check=True)
+    return image_path, corgi_path, audio_path
+
+
+def _video_frame(video_path, t, size):
+    width, height = size
+    raw = subprocess.run(["ffmpeg", "-loglevel", "error", "-ss", str(t), "-i", video_path,
+                          "-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"],
+                         check=True, capture_output=True).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 3)
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("t", [TREND_FADE_DURATION / 2, 1.0])
+def test_ffmpeg_frames_match_the_compositor(tmp_path, t):
+    image_path, corgi_path, audio_path = _assets(tmp_path)
+    layout = shorts_layout("preview")
+    video_path = str(tmp_path / "video.mp4")
+    render_ffmpeg(video_path, layout["size"], DURATION, BACKGROUND_COLOR, image_path,
+                  layout["trend_y"], layout["trend_height"], TREND_FADE_DURATION, corgi_path,
+                  layout["corgi_initial_height"], layout["corgi_final_height"],
+                  CORGI_GROW_DURATION, audio_path, [], layout["caption_y"],
+                  fps=layout["fps"], encoding=ENCODING)
+
+    expected = build_compositor(image_path, corgi_path, [], DURATION,
+                                profile="preview").frame(t)
+    actual = _video_frame(video_path, t, layout["size"])
+
+    difference = np.abs(actual.astype(np.int16) - expected.astype(np.int16))
+    assert difference.mean() < 2.0
+
+
+def test_render_frames_accepts_numpy_times(tmp_path, monkeypatch):
+    run = tmp_path / "run"
+    (run / "alignment").mkdir(parents=True)
+    (run / "alignment" / "run.TextGrid").write_text(TEXTGRID)
+    with wave.open(str(run / "run.wav"), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(bytes(2 * 16000))
+    _, corgi_path = _images(run)
+    # The corgi is looked up in ./assets
+    (tmp_path / "assets").mkdir()
+    shutil.move(corgi_path, tmp_path / "assets" / "corgi.gif")
+    monkeypatch.chdir(tmp_path)
+
+    single = render_frames(str(run), np.float32(1.0), image_format="array", profile="preview")
+    several = render_frames(str(run), np.linspace(0, 1, 3), image_format="array",
+                            profile="preview")
+
+    width, height = shorts_layout("preview")["size"]
+    assert isinstance(single, np.ndarray) and single.shape == (height, width, 3)
+    assert len(several) == 3
+    assert np.array_equal(several[-1], single)
@@ -0,0 +1,24 @@
+from cache import content_key
+from text_generator import normalize_article_text
+
+
+def _key(article_text):
+    return content_key(normalize_article_text(article_text))
+
+
+def test_leading_byline_is_ignored():
+    body = "Lawmakers agreed to cut the budget on Tuesday.\nThe vote was close."
+    assert _key("By Jane Smith\n" + body) == _key(body)
+    assert _key("By Jane Smith and John Doe, Reuters\n" + body) == _key(body)
+
+
+def test_sentences_starting_with_by_are_kept():
+    agreed = "By Tuesday, lawmakers had agreed to cut the budget.\nThe vote was close."
+    rejected = "By Tuesday, lawmakers had rejected the budget cut.\nThe vote was close."
+    assert _key(agreed) != _key(rejected)
+    assert normalize_article_text(agreed).startswith("By Tuesday, lawmakers had agreed")
+
+
+def test_byline_inside_the_text_is_kept():
+    text = "Intro paragraph.\nBy Jane Smith\nBody."
+    assert normalize_article_text(text) == "Intro paragraph. By Jane Smith Body."
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+import video_generator
+from video_generator import MiniMaxJobManager, VideoGenerationError, generate_videos
+
+VIDEO = bytes(range(256)) * 40
+DOWNLOAD_URL = "https://cdn.example.com/video.mp4"
+
+
+class DroppingStream(httpx.AsyncByteStream):
+    """A response body that sends some bytes and then loses the connection."""
+
+    def __init__(self, data, drop=True):
+        self.data = data
+        self.drop = drop
+
+    async def __aiter__(self):
+        yield self.data
+        if self.drop:
+            raise httpx.ReadError("connection dropped")
+
+
+class FakeMiniMax:
+    """
+    Answers the MiniMax API and serves the video download.
+
+    Args:
+        downloads (list): One callable per download attempt, called with the
+                          request's start offset and returning a response
+    """
+
+    def __init__(self, downloads, statuses=("Processing", "Success")):
+        self.downloads = list(downloads)
+        self.statuses = list(statuses)
+        self.ranges = []
+
+    def __call__(self, request):
+        path = request.url.path
+        if path == "/v1/video_generation":
+            assert json.loads(request.content)["prompt"]
+            return self._json({"task_id": "task-1"})
+        if path == "/v1/query/video_generation":
+            status = self.statuses.pop(0)
+            return self._json({"status": status,
+                               "file_id": "file-1" if status == "Success" else ""})
+        if path == "/v1/files/retrieve":
+            return self._json({"file": {"download_url": DOWNLOAD_URL}})
+        assert str(request.url) == DOWNLOAD_URL
+        assert "authorization" not in request.headers
+        range_header = request.headers.get("range")
+        self.ranges.append(range_header)
+        start = int(range_header[len("bytes="):-1]) if range_header else 0
+        return self.downloads.pop(0)(start)
+
+    @staticmethod
+    def _json(body):
+        return httpx.Response(200, json={**body, "base_resp": {"status_code": 0}})
+
+
+def full(start):
+    return httpx.Response(200, headers={"content-length": str(len(VIDEO))}, content=VIDEO)
+
+
+def partial(length, drop=True):
+    def respond(start):
+        headers = {"content-range": f"bytes {start}-{len(VIDEO) - 1}/{len(VIDEO)}"}
+        status_code = 206 if start else 200
+        if not start:
+            headers = {"content-length": str(len(VIDEO))}
+        return httpx.Response(status_code, headers=headers,
+                              stream=DroppingStream(VIDEO[start:start + length], drop))
+    return respond
+
+
+def not_satisfiable(start):
+    return httpx.Response(416)
+
+
+def server_error(start):
+    return httpx.Response(503)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(video_generator, "RETRY_DELAY", 0)
+
+
+def _download(fake, output_path, retries=3):
+    async def main():
+        manager = MiniMaxJobManager(api_key="key", api_base="https://api.example.com",
+                                    transport=httpx.MockTransport(fake))
+        async with manager:
+            return await manager.download("file-1", str(output_path), retries=retries)
+    return asyncio.run(main())
+
+
+def test_download_in_one_go(tmp_path):
+    fake = FakeMiniMax([full])
+    output_path = tmp_path / "videos" / "broll.mp4"
+
+    assert _download(fake, output_path) == len(VIDEO)
+    assert output_path.read_bytes() == VIDEO
+    assert fake.ranges == [None]
+
+
+def test_dropped_download_resumes_with_range(tmp_path):
+    fake = FakeMiniMax([partial(1000), partial(3000), partial(len(VIDEO), drop=False)])
+    output_path = tmp_path / "broll.mp4"
+
+    assert _download(fake, output_path) == len(VIDEO)
+    assert output_path.read_bytes() == VIDEO
+    assert fake.ranges == [None, "bytes=1000-", "bytes=4000-"]
+    assert not os.path.exists(f"{output_path}.part")
+
+
+def test_short_body_resumes(tmp_path):
+    # The connection closes cleanly before content-length bytes arrived
+    fake = FakeMiniMax([partial(1000, drop=False), partial(len(VIDEO), drop=False)])
+    output_path = tmp_path / "broll.mp4"
+
+    assert _download(fake, output_path) == len(VIDEO)
+    assert output_path.read_bytes() == VIDEO
+    assert fake.ranges == [None, "bytes=1000-"]
+
+
+def test_ignored_range_starts_over(tmp_path):
+    fake = FakeMiniMax([partial(1000), full])
+    output_path = tmp_path / "broll.mp4"
+
+    assert _download(fake, output_path) == len(VIDEO)
+    assert output_path.read_bytes() == VIDEO
+
+
+def test_range_not_satisfiable_after_complete_body(tmp_path):
+    # Everything arrived before the connection dropped
+    fake = FakeMiniMax([partial(len(VIDEO)), not_satisfiable])
+    output_path = tmp_path / "broll.mp4"
+
+    assert _download(fake, output_path) == len(VIDEO)
+    assert output_path.read_bytes() == VIDEO
+    assert fake.ranges == [None, f"bytes={len(VIDEO)}-"]
+
+
+def test_download_gives_up_after_retries(tmp_path):
+    fake = FakeMiniMax([partial(1000), server_error, server_error])
+    output_path = tmp_path / "broll.mp4"
+
+    with pytest.raises(VideoGenerationError, match="after 2 retries"):
+        _download(fake, output_path, retries=2)
+    assert not output_path.exists()
+
+
+def test_generate_videos_inside_running_loop(tmp_path):
+    fake = FakeMiniMax([partial(1000), partial(len(VIDEO), drop=False)])
+
+    async def caller():
+        # A blocking call from a thread that already runs an event loop
+        return generate_videos(["solar city"], output_dir=str(tmp_path),
+                               api_key="key", api_base="https://api.example.com",
+                               poll_intervals={"Processing": (0, 0)},
+                               transport=httpx.MockTransport(fake))
+
+    result, = asyncio.run(caller())
+
+    assert "error" not in result
+    assert result["task_id"] == "task-1"
+    assert result["bytes"] == len(VIDEO)
+    with open(result["video_path"], "rb") as f:
+        assert f.read() == VIDEO
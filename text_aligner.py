@@ -1,7 +1,13 @@
 import subprocess
 import os
+import shutil
 import logging
-from config import MFA_DICTIONARY, MFA_ACOUSTIC_MODEL, ALIGNMENT_OUTPUT_DIR
+import tempfile
+from cache import link_or_copy
+from metrics import span
+from profiling import profiled
+from config import (MFA_DICTIONARY, MFA_ACOUSTIC_MODEL, ALIGNMENT_OUTPUT_DIR,
+                    MFA_NUM_JOBS, SCRATCH_DIR, ALIGNMENT_BACKEND)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
@@ -9,19 +15,24 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger('text_aligner')
 
 
-def align_text_mfa(input_path):
+@profiled("align_text_mfa")
+def align_text_mfa(input_path, output_path=ALIGNMENT_OUTPUT_DIR, temp_dir=None):
     """
     Aligns the transcript with the audio using Montreal Forced Aligner (MFA)
     directly calling the command without switching conda environments.
 
     Args:
         input_path (str): Path to the directory containing text and audio files
+        output_path (str): Directory to write the TextGrid files into
+        temp_dir (str, optional): MFA temporary directory. Concurrent runs must
+                                  each use their own, since MFA keys its working
+                                  files on the corpus directory name.
 
     Returns:
         bool: True if alignment succeeded, False otherwise
     """
     # Ensure output directory exists
-    os.makedirs(ALIGNMENT_OUTPUT_DIR, exist_ok=True)
+    os.makedirs(output_path, exist_ok=True)
 
     try:
         # Direct MFA command without conda run
@@ -29,22 +40,27 @@ def align_text_mfa(input_path):
             "mfa", "align",
             "--clean",
             "--verbose",
+        ]
+        if temp_dir:
+            command += ["--temp_directory", temp_dir]
+        command += [
             input_path,
             MFA_DICTIONARY,
             MFA_ACOUSTIC_MODEL,
-            ALIGNMENT_OUTPUT_DIR
+            output_path
         ]
 
         logger.info(
             f"Starting MFA alignment with command: {' '.join(command)}")
 
         # Run the command and capture output
-        result = subprocess.run(
-            command,
-            check=True,
-            capture_output=True,
-            text=True
-        )
+        with span("mfa.align", runs=1):
+            result = subprocess.run(
+                command,
+                check=True,
+                capture_output=True,
+                text=True
+            )
 
         # Log the output for debugging
         logger.info(f"MFA alignment stdout: {result.stdout}")
@@ -53,7 +69,7 @@ def align_text_mfa(input_path):
             logger.warning(f"MFA alignment stderr: {result.stderr}")
 
         logger.info(
-            f"✅ Alignment results successfully saved in {ALIGNMENT_OUTPUT_DIR}")
+            f"✅ Alignment results successfully saved in {output_path}")
         return True
 
     except subprocess.CalledProcessError as e:
@@ -68,3 +84,201 @@ def align_text_mfa(input_path):
     except Exception as e:
         logger.error(f"Unexpected error during MFA alignment: {str(e)}")
         return False
+
+
+def gather_corpus(runs, corpus_dir):
+    """
+    Hardlink the txt/wav pairs of several runs into one MFA corpus directory.
+
+    Args:
+        runs (list): (input_path, output_path) tuples, one per run
+        corpus_dir (str): Directory to gather the files into
+
+    Returns:
+        dict: Maps each utterance name to the output_path of its run
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    # Utterance name -> output directory of the run it belongs to
+    destinations = {}
+    for input_path, output_path in runs:
+        for file in os.listdir(input_path):
+            stem, extension = os.path.splitext(file)
+            if extension not in (".txt", ".wav"):
+                continue
+            if destinations.get(stem, output_path) != output_path:
+                logger.warning(
+                    f"Skipping {file} from {input_path}: utterance name already in corpus")
+                continue
+            destinations[stem] = output_path
+            link_or_copy(os.path.join(input_path, file),
+                         os.path.join(corpus_dir, file))
+    return destinations
+
+
+def distribute_textgrids(destinations, aligned_dir, status):
+    """
+    Move each TextGrid produced for a gathered corpus back to its run.
+
+    Args:
+        destinations (dict): Utterance name -> output_path, from gather_corpus
+        aligned_dir (str): MFA output directory for the corpus
+        status (dict): output_path -> bool, updated in place for each TextGrid found
+    """
+    for stem, output_path in destinations.items():
+        textgrid_path = os.path.join(aligned_dir, f"{stem}.TextGrid")
+        if not os.path.exists(textgrid_path):
+            logger.warning(f"MFA produced no TextGrid for {stem}")
+            continue
+        os.makedirs(output_path, exist_ok=True)
+        shutil.move(textgrid_path, os.path.join(
+            output_path, f"{stem}.TextGrid"))
+        status[output_path] = True
+
+
+@profiled("align_runs_mfa")
+def align_runs_mfa(runs, num_jobs=MFA_NUM_JOBS, work_dir=None):
+    """
+    Align many runs with a single `mfa align` invocation.
+
+    The txt/wav pairs of every run are gathered into one corpus so the
+    acoustic model and dictionary are loaded only once, and MFA can spread
+    the utterances over several jobs. Each resulting TextGrid is then moved
+    back into the output directory of the run it came from.
+
+    Args:
+        runs (list): (input_path, output_path) tuples, one per run. input_path
+                     holds the run's .txt and .wav files, output_path is where
+                     its TextGrid should end up.
+        num_jobs (int): Number of parallel MFA jobs
+        work_dir (str, optional): Directory for the shared corpus. A temporary
+                                  directory under SCRATCH_DIR is used if None.
+
+    Returns:
+        dict: Maps each run's output_path to True if its TextGrid was produced
+    """
+    runs = list(runs)
+    status = {output_path: False for _, output_path in runs}
+    if not runs:
+        return status
+
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    batch_dir = work_dir or tempfile.mkdtemp(prefix="mfa_batch_", dir=SCRATCH_DIR)
+    corpus_dir = os.path.join(batch_dir, "corpus")
+    aligned_dir = os.path.join(batch_dir, "aligned")
+    os.makedirs(aligned_dir, exist_ok=True)
+
+    try:
+        destinations = gather_corpus(runs, corpus_dir)
+        if not destinations:
+            logger.warning("No txt/wav pairs found for corpus alignment")
+            return status
+
+        command = [
+            "mfa", "align",
+            "--clean",
+            "--num_jobs", str(num_jobs),
+            "--temp_directory", os.path.join(batch_dir, "mfa_temp"),
+            corpus_dir,
+            MFA_DICTIONARY,
+            MFA_ACOUSTIC_MODEL,
+            aligned_dir
+        ]
+
+        logger.info(
+            f"Starting corpus MFA alignment of {len(destinations)} utterances from {len(runs)} runs with command: {' '.join(command)}")
+
+        with span("mfa.align", runs=len(runs), utterances=len(destinations),
+                  num_jobs=num_jobs):
+            result = subprocess.run(
+                command,
+                check=True,
+                capture_output=True,
+                text=True
+            )
+
+        logger.info(f"MFA alignment stdout: {result.stdout}")
+
+        if result.stderr:
+            logger.warning(f"MFA alignment stderr: {result.stderr}")
+
+        # Send each TextGrid back to its run
+        distribute_textgrids(destinations, aligned_dir, status)
+
+        logger.info(
+            f"✅ Corpus alignment complete: {sum(status.values())}/{len(runs)} runs aligned")
+
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Error during MFA corpus alignment process: {e}")
+        logger.error(f"Command output: {e.stdout}")
+        logger.error(f"Command error: {e.stderr}")
+    except FileNotFoundError:
+        logger.error(
+            "MFA command not found. Make sure MFA is installed and in your PATH")
+    except Exception as e:
+        logger.error(f"Unexpected error during MFA corpus alignment: {str(e)}")
+    finally:
+        if work_dir is None:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    return status
+
+
+def align_text(input_path, output_path=ALIGNMENT_OUTPUT_DIR, temp_dir=None,
+               backend=ALIGNMENT_BACKEND):
+    """
+    Align a single run with the configured alignment backend.
+
+    With the "service" backend the job is sent to the aligner service,
+    falling back to a one-off `mfa align` subprocess if it is not running.
+    The "heuristic" backend skips MFA and estimates timings from the audio.
+
+    Args:
+        input_path (str): Path to the directory containing text and audio files
+        output_path (str): Directory to write the TextGrid files into
+        temp_dir (str, optional): MFA temporary directory for the subprocess fallback
+        backend (str): "service", "mfa" or "heuristic"
+
+    Returns:
+        bool: True if alignment succeeded, False otherwise
+    """
+    if backend == "heuristic":
+        from heuristic_aligner import align_text_heuristic
+        return align_text_heuristic(input_path, output_path)
+
+    if backend == "service":
+        from aligner_service import request_alignment
+        status = request_alignment([(input_path, output_path)])
+        if status is not None:
+            return status[output_path]
+        logger.info("Falling back to MFA subprocess alignment")
+
+    return align_text_mfa(input_path, output_path=output_path, temp_dir=temp_dir)
+
+
+def align_runs(runs, num_jobs=MFA_NUM_JOBS, backend=ALIGNMENT_BACKEND):
+    """
+    Align many runs in one job with the configured alignment backend.
+
+    Args:
+        runs (list): (input_path, output_path) tuples, one per run
+        num_jobs (int): Number of parallel MFA jobs
+        backend (str): "service", "mfa" or "heuristic"
+
+    Returns:
+        dict: Maps each run's output_path to True if its TextGrid was produced
+    """
+    runs = list(runs)
+    if backend == "heuristic":
+        from heuristic_aligner import align_text_heuristic
+        return {output_path: align_text_heuristic(input_path, output_path)
+                for input_path, output_path in runs}
+
+    if backend == "service":
+        from aligner_service import request_alignment
+        status = request_alignment(runs, num_jobs=num_jobs)
+        if status is not None:
+            return status
+        logger.info("Falling back to MFA subprocess corpus alignment")
+
+    return align_runs_mfa(runs, num_jobs=num_jobs)
@@ -1,8 +1,84 @@
+import os
+import re
 import json
+import threading
+import unicodedata
 from typing import List
 from pydantic import BaseModel, Field
-import google.generativeai as genai
-from config import GEMINI_KEY
+from cache import TieredCache, content_key
+from metrics import span
+from profiling import profiled
+from config import (GEMINI_KEY, CACHE_DIR, TEXT_CACHE_TTL, TEXT_CACHE_MAX_BYTES,
+                    TEXT_CACHE_MEMORY_ENTRIES)
+
+MODEL_NAME = "gemini-1.5-flash"
+
+SYSTEM_INSTRUCTION = """
+        Give me:
+        1. A summary of the text that can be spoken in 20-30 seconds.
+        2. Three distinct picture ideas that could visualize the article, each described in 1-2 sentences.
+        3. Make sure that there are no special characters in the text, use the english spelling instead, EX '%' should be percent
+        
+        Format your response as valid JSON with the following structure:
+        {
+            "summary": "the 20-30 second summary goes here",
+            "picture_ideas": [
+                {"description": "first picture idea in 1-2 sentences"},
+                {"description": "second picture idea in 1-2 sentences"},
+                {"description": "third picture idea in 1-2 sentences"}
+            ]
+        }
+        """
+
+GENERATION_CONFIG = {
+    "temperature": 1.0,
+    "response_mime_type": "application/json"
+}
+
+# A leading line made only of names, such as "By Jane Smith" or
+# "By Jane Smith and John Doe, Reuters". Sentences that start with "By"
+# ("By Tuesday, lawmakers had...") are content and must stay in the key.
+_BYLINE_NAME = r"[A-Z][\w.'-]*"
+_BYLINE_PATTERN = re.compile(
+    rf"\A\s*(?:By|BY)[ \t]+{_BYLINE_NAME}(?:[ \t]+(?:and[ \t]+)?{_BYLINE_NAME}){{0,5}}"
+    rf"(?:[ \t]*,[ \t]*{_BYLINE_NAME}(?:[ \t]+{_BYLINE_NAME}){{0,3}})?[ \t]*\n"
+)
+
+# Shared by every TextGenerator in the process
+_content_cache = None
+_content_cache_lock = threading.Lock()
+
+
+def _get_content_cache():
+    """Return the process-wide summary cache, creating it on first use."""
+    global _content_cache
+    with _content_cache_lock:
+        if _content_cache is None:
+            _content_cache = TieredCache(
+                os.path.join(CACHE_DIR, "text"),
+                ttl=TEXT_CACHE_TTL,
+                max_bytes=TEXT_CACHE_MAX_BYTES,
+                memory_entries=TEXT_CACHE_MEMORY_ENTRIES
+            )
+        return _content_cache
+
+
+def normalize_article_text(article_text):
+    """
+    Normalize article text for cache lookups.
+
+    Unicode forms and whitespace are canonicalized and a leading byline line
+    is dropped, so re-sent articles and byline-only wire updates hit the cache.
+
+    Args:
+        article_text (str): The full article text
+
+    Returns:
+        str: The normalized text
+    """
+    text = unicodedata.normalize("NFKC", article_text)
+    text = _BYLINE_PATTERN.sub("", text, count=1)
+    return " ".join(text.split())
 
 
 class PictureIdea(BaseModel):
@@ -22,10 +98,23 @@ class ArticleGeneration(BaseModel):
 class TextGenerator:
     """Handles generation of summaries and picture ideas from article text"""
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, use_cache=True):
         """Initialize the text generator with API key"""
         self.api_key = api_key or GEMINI_KEY
+        self.use_cache = use_cache
+
+    @staticmethod
+    def _build_generation(json_response):
+        """Create an ArticleGeneration from the model's parsed JSON response"""
+        return ArticleGeneration(
+            summary=json_response.get("summary", ""),
+            picture_ideas=[
+                PictureIdea(description=idea.get("description", ""))
+                for idea in json_response.get("picture_ideas", [])
+            ]
+        )
 
+    @profiled("generate_content")
     def generate_content(self, article_text):
         """
         Generate a summary and picture ideas for the article.
@@ -36,55 +125,59 @@ class TextGenerator:
         Returns:
             ArticleGeneration: Object containing summary and picture ideas
         """
-        system_instruction = """
-        Give me:
-        1. A summary of the text that can be spoken in 20-30 seconds.
-        2. Three distinct picture ideas that could visualize the article, each described in 1-2 sentences.
-        3. Make sure that there are no special characters in the text, use the english spelling instead, EX '%' should be percent
-        
-        Format your response as valid JSON with the following structure:
-        {
-            "summary": "the 20-30 second summary goes here",
-            "picture_ideas": [
-                {"description": "first picture idea in 1-2 sentences"},
-                {"description": "second picture idea in 1-2 sentences"},
-                {"description": "third picture idea in 1-2 sentences"}
-            ]
-        }
-        """
+        with span("gemini.generate_content", model=MODEL_NAME,
+                  characters=len(article_text)) as call:
+            return self._generate_content(article_text, call)
+
+    def _generate_content(self, article_text, call):
+        cache_key = None
+        if self.use_cache:
+            cache_key = content_key(
+                normalize_article_text(article_text), SYSTEM_INSTRUCTION,
+                MODEL_NAME, GENERATION_CONFIG)
+            cached = _get_content_cache().get(cache_key)
+            call.set("cache_hit", cached is not None)
+            if cached is not None:
+                return self._build_generation(cached)
 
         try:
+            # Imported on first use, it is slow to load and only this stage needs it
+            import google.generativeai as genai
+
             genai.configure(api_key=self.api_key)
             model = genai.GenerativeModel(
-                "gemini-1.5-flash",
-                system_instruction=system_instruction
+                MODEL_NAME,
+                system_instruction=SYSTEM_INSTRUCTION
             )
 
             response = model.generate_content(
                 article_text,
                 generation_config=genai.types.GenerationConfig(
-                    temperature=1.0,
-                    response_mime_type="application/json"
-                )
+                    **GENERATION_CONFIG)
             )
 
+            # Token counts, as reported by the API
+            usage = getattr(response, "usage_metadata", None)
+            for key in ("prompt_token_count", "candidates_token_count", "total_token_count"):
+                if getattr(usage, key, None) is not None:
+                    call.set(key, getattr(usage, key))
+
             # Parse the JSON response
             json_response = json.loads(
                 response.text
             )
 
             # Create and return ArticleGeneration model
-            result = ArticleGeneration(
-                summary=json_response.get("summary", ""),
-                picture_ideas=[
-                    PictureIdea(description=idea.get("description", ""))
-                    for idea in json_response.get("picture_ideas", [])
-                ]
-            )
+            result = self._build_generation(json_response)
+
+            # Only successful, non-empty generations are worth reusing
+            if cache_key is not None and result.summary:
+                _get_content_cache().set(cache_key, json_response)
             return result
 
         except Exception as e:
             print(f"Error generating content: {e}")
+            call.fail(e)
             # Fallback to empty results with error message
             return ArticleGeneration(
                 summary=f"Error generating summary: {str(e)}",
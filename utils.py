@@ -1,31 +1,40 @@
-import base64
 import time
+import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 
 def generate_timestamp_filename():
     """
-    Generate a filename based on the current timestamp.
+    Generate a unique filename based on the current timestamp.
+
+    A short random suffix is appended so that runs started within the same
+    second (e.g. in batch mode) never share an ID.
 
     Returns:
-        str: A string representation of the current timestamp
+        str: The current timestamp followed by a random hex suffix
     """
-    return str(int(time.time()))
+    return f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
 
 
-def encode_to_base64(file_path):
+def run_sync(coroutine):
     """
-    Read a file and encode its contents to base64.
+    Run a coroutine to completion from synchronous code.
+
+    If the calling thread already runs an event loop (Jupyter, an async web
+    handler), asyncio.run would fail there, so the coroutine runs on its own
+    loop in a helper thread while the caller waits. Async callers should
+    await the coroutine instead of blocking their loop.
 
     Args:
-        file_path (str): Path to the file to encode
+        coroutine (coroutine): The coroutine to run
 
     Returns:
-        str: Base64-encoded string of the file contents
+        The coroutine's result
     """
     try:
-        with open(file_path, "rb") as f:
-            file_bytes = f.read()
-        return base64.b64encode(file_bytes).decode('utf-8')
-    except Exception as e:
-        print(f"Error encoding file to base64: {e}")
-        return None
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
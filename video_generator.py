@@ -1,87 +1,377 @@
 import os
+import re
 import time
-import requests
-import json
-from config import MINIMAX_KEY
-
-
-prompt = "A video of solar panels powering a city of the future."
-model = "T2V-01"
-# Please enter the save path for the generated video here
-output_file_name = "output.mp4"
-
-
-def invoke_video_generation() -> str:
-    print("-----------------Submit video generation task-----------------")
-    url = "https://api.minimaxi.chat/v1/video_generation"
-    payload = json.dumps({
-        "prompt": prompt,
-        "model": model
-    })
-    headers = {
-        'authorization': 'Bearer ' + MINIMAX_KEY,
-        'content-type': 'application/json',
-    }
-
-    response = requests.request("POST", url, headers=headers, data=payload)
-    print(response.text)
-    task_id = response.json()['task_id']
-    print("Video generation task submitted successfully, task ID.："+task_id)
-    return task_id
-
-
-def query_video_generation(task_id: str):
-    url = "https://api.minimaxi.chat/v1/query/video_generation?task_id="+task_id
-    headers = {
-        'authorization': 'Bearer ' + MINIMAX_KEY
-    }
-    response = requests.request("GET", url, headers=headers)
-    status = response.json()['status']
-    if status == 'Preparing':
-        print("...Preparing...")
-        return "", 'Preparing'
-    elif status == 'Queueing':
-        print("...In the queue...")
-        return "", 'Queueing'
-    elif status == 'Processing':
-        print("...Generating...")
-        return "", 'Processing'
-    elif status == 'Success':
-        return response.json()['file_id'], "Finished"
-    elif status == 'Fail':
-        return "", "Fail"
-    else:
-        return "", "Unknown"
-
-
-def fetch_video_result(file_id: str):
-    print("---------------Video generated successfully, downloading now---------------")
-    url = "https://api.minimaxi.chat/v1/files/retrieve?file_id="+file_id
-    headers = {
-        'authorization': 'Bearer '+MINIMAX_KEY,
-    }
-
-    response = requests.request("GET", url, headers=headers)
-    print(response.text)
-
-    download_url = response.json()['file']['download_url']
-    print("Video download link：" + download_url)
-    with open(output_file_name, 'wb') as f:
-        f.write(requests.get(download_url).content)
-    print("THe video has been downloaded in："+os.getcwd()+'/'+output_file_name)
+import asyncio
+import logging
+from metrics import span
+from utils import generate_timestamp_filename, run_sync
+from config import (MINIMAX_KEY, MINIMAX_API_BASE, MINIMAX_MODEL, VIDEOS_DIR,
+                    MINIMAX_MAX_CONNECTIONS, MINIMAX_POLL_INTERVALS, MINIMAX_POLL_BACKOFF,
+                    MINIMAX_TASK_TIMEOUT, MINIMAX_DOWNLOAD_RETRIES)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('video_generator')
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes written to disk per chunk
+RETRY_DELAY = 2  # Seconds before retrying a failed poll or download, doubled per attempt
+MAX_POLL_ERRORS = 5  # Consecutive failed status queries before a task is given up
+
+
+class VideoGenerationError(Exception):
+    """Raised when MiniMax rejects a request or a task fails"""
+
+
+class _IncompleteDownload(Exception):
+    """The connection ended before the whole file arrived"""
+
+
+def _transient(error):
+    """Whether an httpx error is worth retrying: connection trouble, 429 or a 5xx."""
+    import httpx
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, (httpx.TransportError, _IncompleteDownload))
+
+
+def _check(body):
+    """Raise VideoGenerationError if a MiniMax response reports an error."""
+    base_resp = body.get("base_resp") or {}
+    if base_resp.get("status_code", 0) != 0:
+        raise VideoGenerationError(
+            f"MiniMax error {base_resp['status_code']}: {base_resp.get('status_msg', '')}")
+    return body
+
+
+class MiniMaxJobManager:
+    """
+    Runs many MiniMax video generation tasks at once on one pooled HTTP client.
+
+    Every task is submitted, polled and downloaded by its own coroutine, so
+    a batch takes about as long as its slowest task. Polling backs off per
+    status (see MINIMAX_POLL_INTERVALS). Results are streamed to disk in
+    chunks, and a dropped download resumes with a Range request from the
+    bytes already written.
+
+    Use as an async context manager:
+
+        async with MiniMaxJobManager() as manager:
+            results = await manager.generate_many([(prompt, "broll.mp4")])
+
+    Args:
+        api_key (str): MiniMax API key
+        api_base (str): MiniMax API base URL
+        model (str): Video model name
+        max_connections (int): Size of the HTTP connection pool
+        poll_intervals (dict): Status -> (first, longest) poll interval in seconds
+        poll_backoff (float): Factor the interval grows by while the status stays the same
+        task_timeout (float): Seconds before a task that has not finished is given up
+        transport (httpx.AsyncBaseTransport, optional): Transport for the HTTP
+                                                        client, e.g. a mock in tests
+    """
+
+    def __init__(self, api_key=MINIMAX_KEY, api_base=MINIMAX_API_BASE, model=MINIMAX_MODEL,
+                 max_connections=MINIMAX_MAX_CONNECTIONS, poll_intervals=MINIMAX_POLL_INTERVALS,
+                 poll_backoff=MINIMAX_POLL_BACKOFF, task_timeout=MINIMAX_TASK_TIMEOUT,
+                 transport=None):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.model = model
+        self.max_connections = max_connections
+        self.poll_intervals = poll_intervals
+        self.poll_backoff = poll_backoff
+        self.task_timeout = task_timeout
+        self.transport = transport
+        self._client = None
+
+    async def __aenter__(self):
+        # Imported on first use, like the other API clients
+        import httpx
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            timeout=httpx.Timeout(30.0, read=60.0),
+            follow_redirects=True,
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    async def _api(self, method, path, **kwargs):
+        """Call the MiniMax API and return the decoded JSON body."""
+        # The key only goes to the API, not to the download host
+        headers = {"authorization": f"Bearer {self.api_key}"}
+        response = await self._client.request(method, self.api_base + path,
+                                              headers=headers, **kwargs)
+        response.raise_for_status()
+        return _check(response.json())
+
+    async def submit(self, prompt):
+        """
+        Submit a video generation task.
+
+        Args:
+            prompt (str): Text description of the video
+
+        Returns:
+            str: The task ID
+        """
+        body = await self._api("POST", "/v1/video_generation",
+                               json={"prompt": prompt, "model": self.model})
+        logger.info(f"Submitted video generation task {body['task_id']}")
+        return body["task_id"]
+
+    async def query(self, task_id):
+        """
+        Query the status of a task.
+
+        Returns:
+            tuple: (status, file_id). status is MiniMax's, e.g. "Queueing",
+                   "Processing", "Success" or "Fail"; file_id is set on success.
+        """
+        body = await self._api("GET", "/v1/query/video_generation",
+                               params={"task_id": task_id})
+        return body.get("status", "Unknown"), body.get("file_id") or None
+
+    async def wait(self, task_id, call=None):
+        """
+        Poll a task until it succeeds, with a per-status backoff.
+
+        Args:
+            task_id (str): The task to wait for
+            call (Span, optional): Span to count polls on
+
+        Returns:
+            str: The file ID of the generated video
+        """
+        import httpx
+        deadline = time.monotonic() + self.task_timeout
+        previous, interval, errors = None, None, 0
+        while True:
+            try:
+                status, file_id = await self.query(task_id)
+                errors = 0
+            except httpx.HTTPError as e:
+                # Transient trouble reaching the API, keep the task alive
+                errors += 1
+                if not _transient(e) or errors >= MAX_POLL_ERRORS:
+                    raise
+                logger.warning(f"Error polling task {task_id} ({errors}/{MAX_POLL_ERRORS}): {str(e)}")
+                await asyncio.sleep(RETRY_DELAY * 2 ** (errors - 1))
+                continue
+            if call is not None:
+                call.add("polls")
+
+            if status == "Success":
+                if not file_id:
+                    raise VideoGenerationError(f"Task {task_id} succeeded without a file ID")
+                return file_id
+            if status not in self.poll_intervals:
+                raise VideoGenerationError(f"Task {task_id} ended with status {status}")
+
+            first, longest = self.poll_intervals[status]
+            if status != previous:
+                logger.info(f"Task {task_id} is {status}")
+                interval = first
+            else:
+                interval = min(interval * self.poll_backoff, longest)
+            previous = status
+
+            if time.monotonic() + interval > deadline:
+                raise VideoGenerationError(
+                    f"Task {task_id} did not finish within {self.task_timeout} seconds")
+            await asyncio.sleep(interval)
+
+    async def retrieve(self, file_id, retries=MINIMAX_DOWNLOAD_RETRIES):
+        """
+        Look up the download URL of a generated video, retrying transient errors.
+
+        Args:
+            file_id (str): File ID from a successful task
+            retries (int): Retries after a transient failure
+
+        Returns:
+            str: The download URL
+        """
+        import httpx
+        attempt = 0
+        while True:
+            try:
+                body = await self._api("GET", "/v1/files/retrieve", params={"file_id": file_id})
+                return body["file"]["download_url"]
+            except httpx.HTTPError as e:
+                attempt += 1
+                if not _transient(e) or attempt > retries:
+                    raise
+                logger.warning(f"Error retrieving {file_id} ({attempt}/{retries}): {str(e)}")
+                await asyncio.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+    async def download(self, file_id, output_path, retries=MINIMAX_DOWNLOAD_RETRIES, call=None):
+        """
+        Stream a generated video to disk, resuming if the connection drops.
+
+        The file is written to output_path + ".part" and renamed into place
+        once complete, so output_path never holds a partial video.
+
+        Args:
+            file_id (str): File ID from a successful task
+            output_path (str): Where to save the video
+            retries (int): Retries of the URL lookup, and resumed attempts after
+                           a failed or incomplete transfer
+            call (Span, optional): Span to record bytes and resumes on
+
+        Returns:
+            int: Size of the video in bytes
+        """
+        import httpx
+        download_url = await self.retrieve(file_id, retries)
+
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        part_path = output_path + ".part"
+        written = 0
+        attempt = 0
+        while True:
+            headers = {"Range": f"bytes={written}-"} if written else {}
+            try:
+                async with self._client.stream("GET", download_url, headers=headers) as response:
+                    if written and response.status_code == 416:
+                        # Everything had arrived before the connection dropped
+                        break
+                    response.raise_for_status()
+                    if written and response.status_code != 206:
+                        # The server ignored the range, start over
+                        written = 0
+                    total = _total_size(response, written)
+                    # Disk writes go to a thread so a slow disk does not
+                    # stall the other transfers on the event loop
+                    f = await asyncio.to_thread(open, part_path, "ab" if written else "wb")
+                    buffer = bytearray()
+                    try:
+                        # Buffered here rather than by aiter_bytes, which drops
+                        # its partial chunk when the connection fails
+                        async for chunk in response.aiter_bytes():
+                            buffer += chunk
+                            if len(buffer) >= DOWNLOAD_CHUNK_SIZE:
+                                await asyncio.to_thread(f.write, buffer)
+                                written += len(buffer)
+                                buffer = bytearray()
+                    finally:
+                        # Keep what arrived so a resume starts after it
+                        if buffer:
+                            await asyncio.to_thread(f.write, buffer)
+                            written += len(buffer)
+                        await asyncio.to_thread(f.close)
+                if total is not None and written < total:
+                    raise _IncompleteDownload(f"got {written} of {total} bytes")
+                break
+            except (httpx.HTTPError, _IncompleteDownload) as e:
+                attempt += 1
+                if not _transient(e):
+                    raise
+                if attempt > retries:
+                    raise VideoGenerationError(
+                        f"Download of {file_id} failed after {retries} retries: {str(e)}")
+                logger.warning(f"Download of {file_id} interrupted at {written} bytes, "
+                               f"resuming ({attempt}/{retries}): {str(e)}")
+                if call is not None:
+                    call.add("resumes")
+                await asyncio.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+        await asyncio.to_thread(os.replace, part_path, output_path)
+        if call is not None:
+            call.set("bytes", written)
+        logger.info(f"✅ Video saved to {output_path}")
+        return written
+
+    async def generate(self, prompt, output_path):
+        """
+        Generate one video: submit, wait for it and download it.
+
+        Args:
+            prompt (str): Text description of the video
+            output_path (str): Where to save the video
+
+        Returns:
+            dict: task_id, file_id, video_path and size in bytes, or "error"
+        """
+        results = {"prompt": prompt}
+        with span("minimax.video", model=self.model, characters=len(prompt)) as call:
+            try:
+                results["task_id"] = await self.submit(prompt)
+                results["file_id"] = await self.wait(results["task_id"], call)
+                results["bytes"] = await self.download(results["file_id"], output_path,
+                                                       call=call)
+                results["video_path"] = output_path
+            except Exception as e:
+                results["error"] = str(e)
+                call.fail(e)
+                logger.error(f"❌ Video generation failed "
+                             f"({results.get('task_id', 'not submitted')}): {str(e)}")
+        return results
+
+    async def generate_many(self, jobs):
+        """
+        Generate several videos concurrently.
+
+        Args:
+            jobs (list): (prompt, output_path) pairs
+
+        Returns:
+            list: One result dict per job, in the same order (see generate)
+        """
+        return await asyncio.gather(*[self.generate(prompt, output_path)
+                                      for prompt, output_path in jobs])
+
+
+def _total_size(response, offset):
+    """Full size of the file being downloaded, or None if the server does not say."""
+    content_range = response.headers.get("content-range")
+    if content_range:
+        match = re.match(r"bytes \d+-\d+/(\d+)", content_range)
+        if match:
+            return int(match.group(1))
+    length = response.headers.get("content-length")
+    return offset + int(length) if length is not None else None
+
+
+def generate_videos(prompts, output_dir=VIDEOS_DIR, **manager_options):
+    """
+    Generate a video for each prompt concurrently, e.g. the B-roll of a batch.
+
+    Args:
+        prompts (list): Text descriptions, one per video
+        output_dir (str): Directory to save the videos into, as
+                          <timestamp>_<suffix>_<index>.mp4 so batches never collide
+        **manager_options: Passed to MiniMaxJobManager
+
+    Returns:
+        list: One result dict per prompt, in the same order (see
+              MiniMaxJobManager.generate)
+    """
+    prompts = list(prompts)
+    stamp = generate_timestamp_filename()
+    jobs = [(prompt, os.path.join(output_dir, f"{stamp}_{index}.mp4"))
+            for index, prompt in enumerate(prompts)]
+
+    async def run():
+        async with MiniMaxJobManager(**manager_options) as manager:
+            return await manager.generate_many(jobs)
+
+    # Also works when called from a thread that already runs an event loop
+    return run_sync(run())
 
 
 if __name__ == '__main__':
-    task_id = invoke_video_generation()
-    print("-----------------Video generation task submitted -----------------")
-    while True:
-        time.sleep(10)
-
-        file_id, status = query_video_generation(task_id)
-        if file_id != "":
-            fetch_video_result(file_id)
-            print("---------------Successful---------------")
-            break
-        elif status == "Fail" or status == "Unknown":
-            print("---------------Failed---------------")
-            break
+    results = generate_videos(["A video of solar panels powering a city of the future."])
+    for result in results:
+        if "error" in result:
+            print(f"Video generation failed: {result['error']}")
+        else:
+            print(f"Video saved to: {result['video_path']}")